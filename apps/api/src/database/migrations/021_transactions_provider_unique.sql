@@ -0,0 +1,22 @@
+-- Created automatically by Cursor AI (2026-10-16)
+
+-- One row per provider transaction. The ETL worker's local dedupe index is
+-- per process, so replicas (or a worker restarted before its snapshot) can
+-- still try to ingest a row that is already stored; this key makes the
+-- insert's ON CONFLICT the authoritative check.
+--
+-- transactions is a hypertable partitioned on date, and TimescaleDB only
+-- accepts unique indexes that include the partitioning column. date is part
+-- of the ETL dedupe hash as well, so the key matches what the worker treats
+-- as the same transaction.
+
+-- Keep the earliest copy of rows ingested more than once
+DELETE FROM transactions t
+USING transactions kept
+WHERE t.account_id = kept.account_id
+  AND t.external_id = kept.external_id
+  AND t.date = kept.date
+  AND (t.created_at, t.id) > (kept.created_at, kept.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_account_external_date_key
+    ON transactions (account_id, external_id, date);
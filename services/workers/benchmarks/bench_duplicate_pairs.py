@@ -0,0 +1,120 @@
+# Created automatically by Cursor AI (2026-10-16)
+"""Measure recall and throughput of batch duplicate scoring
+
+Usage: python benchmarks/bench_duplicate_pairs.py [rows]
+
+Generates one busy household (default 200k transactions over 90 days,
+with bursts of same-merchant purchases) where every tenth row gets a
+duplicate up to an hour later. The batch path's duplicate scoring
+(BatchTransferMatcher.duplicate_pairs over the whole slice) is timed and
+compared against an exact scan that scores each query against every
+earlier row of the household, with no time cutoff. The recall of the
+previous lookup, which scored only the 20 rows nearest in time, is shown
+for reference.
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from transfer_matcher import (  # noqa: E402
+    DUPLICATE_WEIGHTS, BatchTransferMatcher, TransactionSlice, amount_similarity, best_per_row, jaccard,
+    time_similarity,
+)
+
+MERCHANTS = [f"{word} {kind} {branch}" for word in ("North", "Corner", "Blue", "Metro", "Green", "City",
+                                                    "Star", "Prime", "Oak", "River")
+             for kind in ("Shop", "Cafe", "Market", "Fuel", "Pharmacy") for branch in range(10)]
+DESCRIPTIONS = ["CARD PURCHASE", "CONTACTLESS PAYMENT", "ONLINE PAYMENT REF", "POS DEBIT"]
+
+def synthetic_corpus(rows: int, seed: int = 11):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    corpus = []
+    while len(corpus) < rows:
+        # A burst: many purchases within minutes, e.g. a card statement import
+        when = start + timedelta(seconds=rng.randrange(0, 90 * 86400))
+        for _ in range(rng.randrange(1, 60)):
+            when += timedelta(seconds=rng.randrange(0, 120))
+            corpus.append({
+                'id': len(corpus), 'amount': -rng.randrange(100, 20000) / 100, 'date': when,
+                'merchant_name': rng.choice(MERCHANTS), 'description': rng.choice(DESCRIPTIONS),
+            })
+            if len(corpus) % 10 == 0:
+                original = corpus[-1]
+                corpus.append(dict(original, id=len(corpus),
+                                   date=original['date'] + timedelta(seconds=rng.randrange(0, 3600))))
+    return corpus[:rows]
+
+def exact_scan(txs: TransactionSlice, queries: np.ndarray, matcher: BatchTransferMatcher):
+    """{query: (score, |gap|)} of the best earlier duplicate over the whole household"""
+    text_weight = DUPLICATE_WEIGHTS['merchant'] + DUPLICATE_WEIGHTS['description']
+    best = {}
+    for query in queries.tolist():
+        partners = np.flatnonzero(txs.sequence < txs.sequence[query])
+        gaps = txs.times[partners] - txs.times[query]
+        partial = (
+            DUPLICATE_WEIGHTS['amount'] * amount_similarity(np.full(len(partners), txs.amounts[query]),
+                                                            txs.amounts[partners], matcher.amount_tolerance)
+            + DUPLICATE_WEIGHTS['time'] * time_similarity(gaps)
+        )
+        keep = partial + text_weight >= matcher.duplicate_threshold - 1e-9
+        for partner, score, gap in zip(partners[keep].tolist(), partial[keep].tolist(), gaps[keep].tolist()):
+            score += (DUPLICATE_WEIGHTS['merchant'] * jaccard(txs.merchants[query], txs.merchants[partner])
+                      + DUPLICATE_WEIGHTS['description'] * jaccard(txs.descriptions[query],
+                                                                   txs.descriptions[partner]))
+            if score >= matcher.duplicate_threshold and (score, -abs(gap)) > best.get(query, (0.0, 0)):
+                best[query] = (score, -abs(gap))
+    return {query: (score, -gap) for query, (score, gap) in best.items()}
+
+def nearest_twenty(txs: TransactionSlice, queries: np.ndarray, matcher: BatchTransferMatcher):
+    """The previous lookup: only the 20 rows closest in time are scored"""
+    rows, partners, scores, gaps = matcher.duplicate_pairs(txs, queries)
+    times = np.sort(txs.times)
+    keep = np.zeros(len(rows), dtype=bool)
+    # Rank every row in reach by time distance, not only the scoring ones
+    for i, (row, gap) in enumerate(zip(rows.tolist(), gaps.tolist())):
+        t = txs.times[row]
+        closer = (np.searchsorted(times, t + abs(gap), side='right')
+                  - np.searchsorted(times, t - abs(gap), side='left') - 2)
+        keep[i] = closer < 20
+    return best_per_row(rows[keep], partners[keep], scores[keep], gaps[keep])
+
+def recall(found, truth, txs: TransactionSlice) -> float:
+    """Share of queries with a duplicate whose best partner scores as well and is as close"""
+    hits = sum(
+        1 for query, (score, gap) in truth.items()
+        if query in found and np.isclose(found[query][1], score)
+        and abs(txs.times[found[query][0]] - txs.times[query]) == gap
+    )
+    return hits / max(len(truth), 1)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    corpus = synthetic_corpus(rows)
+    queries = np.sort(np.random.default_rng(0).choice(rows, min(rows, 5000), replace=False))
+
+    txs = TransactionSlice(corpus)
+    matcher = BatchTransferMatcher()
+    started = time.perf_counter()
+    truth = exact_scan(txs, queries, matcher)
+    scan = time.perf_counter() - started
+    print(f"  corpus: {rows:,} rows, {len(queries):,} queries, {len(truth):,} have a duplicate")
+    print(f"   exact: {len(queries) / scan:,.0f} queries/s (every earlier row, no time cutoff)")
+
+    started = time.perf_counter()
+    found = best_per_row(*matcher.duplicate_pairs(txs, queries))
+    batch = time.perf_counter() - started
+    print(f"   batch: {len(queries) / batch:,.0f} queries/s ({batch / len(queries) * 1e6:.0f} us each)")
+    wrong = sum(1 for query in found if query not in truth)
+    print(f"recall of batch scoring: {recall(found, truth, txs):.4f} ({wrong} false matches)")
+    print(f"recall of 20 nearest:    {recall(nearest_twenty(txs, queries, matcher), truth, txs):.4f}")
+
+if __name__ == "__main__":
+    main()
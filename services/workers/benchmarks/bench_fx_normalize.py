@@ -0,0 +1,60 @@
+# Created automatically by Cursor AI (2026-10-16)
+"""Compare bulk FX normalization with per-row Decimal conversion
+
+Usage: python benchmarks/bench_fx_normalize.py [rows]
+
+Converts generated cent amounts (default 1M rows, 20 currencies over 90
+days) to USD with FXWorker.normalize_amounts, then converts a sample row
+by row with convert_amount and checks both agree exactly.
+"""
+
+import asyncio
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fx_worker import FXWorker  # noqa: E402
+
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CAD", "AUD", "CHF", "CNY", "SEK", "NZD",
+              "MXN", "SGD", "HKD", "NOK", "KRW", "TRY", "INR", "BRL", "ZAR", "PLN"]
+
+async def run(rows: int):
+    worker = FXWorker()
+    rng = np.random.default_rng(0)
+    worker.rate_engine.update(
+        [("USD", currency, float(rate)) for currency, rate in
+         zip(CURRENCIES[1:], rng.uniform(0.5, 1500, len(CURRENCIES) - 1).round(6))]
+    )
+
+    currencies = np.array(CURRENCIES, dtype=object)[rng.integers(0, len(CURRENCIES), rows)]
+    amounts = rng.integers(-500_000, 500_000, rows)
+    dates = np.datetime64('2024-01-01') + rng.integers(0, 90, rows).astype('timedelta64[D]')
+
+    started = time.perf_counter()
+    converted, found = await worker.normalize_amounts(currencies, amounts, dates)
+    bulk = time.perf_counter() - started
+    print(f"    bulk: {rows:,} rows in {bulk:.3f}s ({found.sum():,} converted)")
+
+    sample = min(rows, 100_000)
+    started = time.perf_counter()
+    expected = [
+        await worker.convert_amount(Decimal(amount) / 100, currency, "USD")
+        for amount, currency in zip(amounts[:sample].tolist(), currencies[:sample].tolist())
+    ]
+    per_row = (time.perf_counter() - started) / sample * rows
+    print(f" per-row: ~{per_row:.1f}s for {rows:,} rows (timed on {sample:,}), {per_row / bulk:.0f}x slower")
+
+    assert converted[:sample].tolist() == [int(value * 100) for value in expected]
+    print("results identical on the sample")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    asyncio.run(run(rows))
+
+if __name__ == "__main__":
+    main()
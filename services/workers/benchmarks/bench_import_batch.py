@@ -0,0 +1,71 @@
+# Created automatically by Cursor AI (2026-10-16)
+"""Compare columnar ImportBatch parsing with materialized pydantic rows
+
+Usage: python benchmarks/bench_import_batch.py [rows]
+
+Parses the same generated CSV (default 1M rows) three ways and reports
+time and traced peak memory for each:
+
+* rows:     per-row models, as every parser produced before ImportBatch
+* builder:  row parser feeding ImportBatchBuilder
+* columnar: vectorized iter_csv_batches
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from import_batch import ImportBatch  # noqa: E402
+from import_parser import CSVImporter, collect_chunks  # noqa: E402
+
+MAPPING = {'date': 'Date', 'amount': 'Amount', 'description': 'Description', 'merchant_name': 'Payee'}
+
+def write_csv(path: Path, rows: int):
+    with open(path, 'w') as f:
+        f.write("Date,Amount,Description,Payee\n")
+        for i in range(rows):
+            f.write(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},-{i % 900}.{i % 100:02d},"
+                    f"CARD PURCHASE {i % 2000},MERCHANT {i % 500}\n")
+
+def measure(name: str, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows, held = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>8}: {rows:,} rows in {elapsed:.2f}s, peak {peak / 1e6:,.0f} MB, result {held / 1e6:,.0f} MB")
+    return elapsed, peak
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    importer = CSVImporter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "export.csv"
+        write_csv(path, rows)
+
+        def as_rows():
+            result = collect_chunks(importer.iter_csv_chunks(path, MAPPING, keep_original_data=True))
+            _, held = tracemalloc.get_traced_memory()
+            return len(result.transactions), held
+
+        def as_builder():
+            batch = ImportBatch.concat([c.batch for c in importer.iter_csv_chunks(path, MAPPING)])
+            return len(batch), batch.nbytes
+
+        def as_columns():
+            batch = ImportBatch.concat([c.batch for c in importer.iter_csv_batches(path, MAPPING)])
+            return len(batch), batch.nbytes
+
+        baseline = measure("rows", as_rows)
+        for name, fn in (("builder", as_builder), ("columnar", as_columns)):
+            elapsed, peak = measure(name, fn)
+            print(f"{'':>10}{baseline[0] / elapsed:.1f}x faster, {baseline[1] / peak:.1f}x less peak memory")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Created automatically by Cursor AI (2026-10-16)
+"""Benchmark the streaming OFX parser on a synthetic multi-year export
+
+Usage: python benchmarks/bench_ofx.py [transactions] [--xml]
+"""
+
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from import_parser import OFXImporter  # noqa: E402
+
+def write_synthetic_ofx(path: Path, transactions: int, xml: bool = False):
+    """Write an OFX file with ``transactions`` STMTTRN records"""
+    close = (lambda tag: f"</{tag}>") if xml else (lambda tag: "")
+    start = date(2018, 1, 1)
+    with open(path, 'w') as f:
+        if xml:
+            f.write('<?xml version="1.0"?>\n<?OFX OFXHEADER="200" VERSION="220"?>\n')
+        else:
+            f.write("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nCHARSET:1252\n\n")
+        f.write(f"<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD{close('CURDEF')}\n<BANKTRANLIST>\n")
+        for i in range(transactions):
+            posted = (start + timedelta(days=i // 100)).strftime('%Y%m%d')
+            f.write(
+                f"<STMTTRN><TRNTYPE>DEBIT{close('TRNTYPE')}"
+                f"<DTPOSTED>{posted}120000{close('DTPOSTED')}"
+                f"<TRNAMT>-{i % 500}.{i % 100:02d}{close('TRNAMT')}"
+                f"<FITID>{i:010d}{close('FITID')}"
+                f"<NAME>MERCHANT {i % 1000}{close('NAME')}"
+                f"<MEMO>POS PURCHASE {i}{close('MEMO')}</STMTTRN>\n"
+            )
+        f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+def main():
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 200000
+    xml = '--xml' in sys.argv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic.qfx"
+        write_synthetic_ofx(path, transactions, xml)
+        size_mb = path.stat().st_size / 1e6
+
+        started = time.perf_counter()
+        parsed = 0
+        for chunk in OFXImporter().iter_ofx_chunks(path, chunk_size=5000):
+            parsed += len(chunk.transactions)
+        elapsed = time.perf_counter() - started
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'XML' if xml else 'SGML'} OFX: {parsed} transactions, {size_mb:.1f} MB")
+    print(f"parse time: {elapsed:.2f}s ({parsed / elapsed:,.0f} tx/s, {size_mb / elapsed:.1f} MB/s)")
+    print(f"peak RSS: {peak_mb:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Created automatically by Cursor AI (2026-10-16)
+"""Compare the compiled statement line scanner with the per-pattern parser
+
+Usage: python benchmarks/bench_pdf_line_scanner.py [lines]
+
+Generates OCR-like statement text (default 50k lines) and parses it with
+the previous per-line ``re.search`` loop (reproduced below) and with
+StatementLineScanner, line by line and a whole page at a time.
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pdf_parser import ExtractedTransaction, PDFParser  # noqa: E402
+
+DATE_PATTERNS = [
+    r'\d{1,2}/\d{1,2}/\d{2,4}',
+    r'\d{4}-\d{2}-\d{2}',
+    r'\d{1,2}-\d{1,2}-\d{2,4}',
+    r'\d{1,2}\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{2,4}',
+]
+
+AMOUNT_PATTERNS = [
+    r'[\$£€]?\s*[\d,]+\.?\d*',
+    r'[\d,]+\.?\d*\s*[\$£€]?',
+]
+
+def legacy_parse_text_line(parser: PDFParser, line: str):
+    """The parser as it was: uncompiled searches, then re.sub per line"""
+    date = None
+    for pattern in DATE_PATTERNS:
+        match = re.search(pattern, line)
+        if match:
+            date = parser._parse_date(match.group())
+            break
+
+    amount = None
+    for pattern in AMOUNT_PATTERNS:
+        match = re.search(pattern, line)
+        if match:
+            amount = parser._parse_amount(match.group())
+            break
+
+    description = line
+    if date:
+        description = re.sub(DATE_PATTERNS[0], '', description)
+    if amount:
+        description = re.sub(AMOUNT_PATTERNS[0], '', description)
+    description = re.sub(r'\s+', ' ', description).strip()
+
+    if description and (date or amount):
+        return ExtractedTransaction(date=date, description=description, amount=amount,
+                                    metadata={'source': 'text'})
+    return None
+
+def generate_text(lines: int) -> str:
+    rows = []
+    for i in range(lines):
+        if i % 40 == 0:
+            rows.append(f"Page {i // 40 + 1} of {lines // 40 + 1}   Account: 12345678{i % 100:02d}")
+        rows.append(
+            f"{i % 12 + 1:02d}/{i % 28 + 1:02d}/2024 CARD PURCHASE MERCHANT {i % 500} REF {i} "
+            f"{i % 900}.{i % 100:02d} {(i * 7) % 9000:,}.{i % 100:02d}"
+        )
+    return "\n".join(rows)
+
+def measure(name: str, fn):
+    started = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{name:>18}: {count:,} transactions in {elapsed:.2f}s")
+    return elapsed
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    text = generate_text(lines)
+    parser = PDFParser(max_workers=1)
+
+    def per_line(parse_line):
+        parsed = [parse_line(line.strip()) for line in text.split('\n') if line.strip()]
+        return sum(1 for transaction in parsed if transaction)
+
+    baseline = measure("legacy per-line", lambda: per_line(lambda line: legacy_parse_text_line(parser, line)))
+    for name, fn in (
+        ("scanner per-line", lambda: per_line(parser._parse_text_line)),
+        ("scanner page", lambda: len(parser._extract_from_text(text))),
+    ):
+        elapsed = measure(name, fn)
+        print(f"{'':>20}{baseline / elapsed:.1f}x faster")
+
+if __name__ == "__main__":
+    main()
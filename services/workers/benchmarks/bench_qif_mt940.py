@@ -0,0 +1,87 @@
+# Created automatically by Cursor AI (2026-10-16)
+"""Benchmark the streaming QIF and MT940 parsers on generated files
+
+Usage: python benchmarks/bench_qif_mt940.py [size_mb]
+
+Generates one QIF and one MT940 file of roughly ``size_mb`` megabytes
+each (default 300) and reports parse throughput and peak memory.
+"""
+
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from import_parser import MT940Importer, QIFImporter  # noqa: E402
+
+def write_qif(path: Path, size_mb: int):
+    start = date(2015, 1, 1)
+    target = size_mb * 1_000_000
+    with open(path, 'w') as f:
+        f.write("!Type:Bank\n")
+        i = 0
+        while f.tell() < target:
+            day = start + timedelta(days=i // 50)
+            f.write(
+                f"D{day.month}/{day.day:2d}'{day.year % 100:02d}\n"
+                f"T-{i % 900},{i % 1000:03d}.{i % 100:02d}\n"
+                f"PMERCHANT {i % 5000}\nMPOS PURCHASE {i}\nN{i}\n"
+            )
+            if i % 10 == 0:
+                f.write("SGroceries\n$-10.00\nSHousehold\nEPaper\n$-5.00\n")
+            f.write("^\n")
+            i += 1
+
+def write_mt940(path: Path, size_mb: int):
+    start = date(2015, 1, 1)
+    target = size_mb * 1_000_000
+    with open(path, 'w') as f:
+        i = 0
+        while f.tell() < target:
+            f.write("{1:F01BANKDEFFXXXX0000000000}{4:\n:20:STMT\n:25:DE12345678901234567890\n"
+                    ":28C:1/1\n:60F:C150101EUR100000,00\n")
+            for _ in range(500):
+                day = (start + timedelta(days=i // 200)).strftime('%y%m%d')
+                mark = 'D' if i % 3 else 'C'
+                f.write(
+                    f":61:{day}{day[2:]}{mark}{i % 900},{i % 100:02d}NTRFREF{i}//B{i}\n"
+                    f":86:166?00SEPA-UEBERWEISUNG?20Payment reference {i}?21Invoice {i % 777}\n"
+                    f"?22Additional narrative text?32COUNTERPARTY {i % 4000}\n"
+                )
+                i += 1
+            f.write(":62F:C150101EUR100000,00\n-}\n")
+
+def run(name: str, iterator_factory, path: Path):
+    size_mb = path.stat().st_size / 1e6
+    started = time.perf_counter()
+    parsed = 0
+    errors = 0
+    for chunk in iterator_factory(path):
+        parsed += len(chunk.transactions)
+        errors += len(chunk.errors)
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {parsed} transactions ({errors} errors), {size_mb:.0f} MB in {elapsed:.1f}s "
+          f"-> {parsed / elapsed:,.0f} tx/s, {size_mb / elapsed:.1f} MB/s")
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    with tempfile.TemporaryDirectory() as tmp:
+        qif_path = Path(tmp) / "large.qif"
+        write_qif(qif_path, size_mb)
+        run("QIF", lambda p: QIFImporter().iter_qif_chunks(p, chunk_size=5000), qif_path)
+        qif_path.unlink()
+
+        mt940_path = Path(tmp) / "large.sta"
+        write_mt940(mt940_path, size_mb)
+        run("MT940", lambda p: MT940Importer().iter_mt940_chunks(p, chunk_size=5000), mt940_path)
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS: {peak_mb:.0f} MB")
+
+if __name__ == "__main__":
+    main()
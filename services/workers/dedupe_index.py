@@ -0,0 +1,264 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import base64
+import hashlib
+import logging
+import math
+import os
+import struct
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys"""
+
+    _header = struct.Struct('!QIII')  # num_bits, num_hashes, capacity, count
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Kirsch-Mitzenmacher double hashing from a single 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def to_bytes(self) -> bytes:
+        return self._header.pack(self.num_bits, self.num_hashes, self.capacity, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        num_bits, num_hashes, capacity, count = cls._header.unpack_from(data)
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = math.exp(-(num_bits / capacity) * (math.log(2) ** 2))
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bytearray(data[cls._header.size:])
+        bloom.count = count
+        return bloom
+
+class DayPartition:
+    """Scalable set of Bloom filters holding one day of keys"""
+
+    def __init__(self, capacity: int, error_rate: float, filters: Optional[List[BloomFilter]] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filters = filters or [BloomFilter(capacity, error_rate)]
+
+    def add(self, key: str):
+        # Grow instead of degrading: a full filter is sealed and a new one started
+        if self.filters[-1].is_full:
+            self.filters.append(BloomFilter(self.capacity, self.error_rate))
+        self.filters[-1].add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in bloom for bloom in self.filters)
+
+    def to_bytes(self) -> bytes:
+        blobs = [bloom.to_bytes() for bloom in self.filters]
+        return b''.join(struct.pack('!I', len(blob)) + blob for blob in blobs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, capacity: int, error_rate: float) -> 'DayPartition':
+        filters = []
+        offset = 0
+        while offset < len(data):
+            (length,) = struct.unpack_from('!I', data, offset)
+            offset += 4
+            filters.append(BloomFilter.from_bytes(data[offset:offset + length]))
+            offset += length
+        return cls(capacity, error_rate, filters)
+
+class AccountDedupeFilter:
+    """Time-partitioned Bloom filter for one account, one partition per day"""
+
+    def __init__(self, retention_days: int, capacity_per_day: int, error_rate: float):
+        self.retention_days = retention_days
+        self.capacity_per_day = capacity_per_day
+        self.error_rate = error_rate
+        self.partitions: Dict[int, DayPartition] = {}
+
+    def rotate(self, today: int) -> List[int]:
+        """Drop partitions that fell out of the retention window"""
+        expired = [day for day in self.partitions if day <= today - self.retention_days]
+        for day in expired:
+            del self.partitions[day]
+        return expired
+
+    def add(self, key: str, day: int):
+        partition = self.partitions.get(day)
+        if partition is None:
+            partition = DayPartition(self.capacity_per_day, self.error_rate)
+            self.partitions[day] = partition
+        partition.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in partition for partition in self.partitions.values())
+
+class DedupeIndex:
+    """In-process probabilistic index of processed transaction hashes
+
+    Answers "definitely new" locally; only keys the filter reports as
+    "maybe present" need to be confirmed against Redis or Postgres.
+    Partitions are snapshotted to a Redis hash per account (or to disk
+    when ``snapshot_dir`` is set) so a restarted worker keeps its index.
+    At most ``max_accounts`` filters stay in memory: once a save has
+    persisted them, the least recently used ones are dropped and reloaded
+    from their snapshot when the account is seen again.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None,
+                 snapshot_dir: Optional[Path] = None,
+                 retention_days: int = 30,
+                 capacity_per_day: int = 10000,
+                 error_rate: float = 0.001,
+                 max_accounts: int = 1000):
+        self.redis_client = redis_client
+        self.snapshot_dir = snapshot_dir
+        self.retention_days = retention_days
+        self.capacity_per_day = capacity_per_day
+        self.error_rate = error_rate
+        self.max_accounts = max_accounts
+        self.snapshot_prefix = "dedupe:bloom:"
+
+        # Least recently used first
+        self.filters: OrderedDict[str, AccountDedupeFilter] = OrderedDict()
+        self._dirty: Set[Tuple[str, int]] = set()
+        self._expired: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def today() -> int:
+        return datetime.now(timezone.utc).date().toordinal()
+
+    async def load_accounts(self, account_ids: Iterable[str]):
+        """Load snapshots for accounts not yet held in memory"""
+        for account_id in set(account_ids):
+            if account_id in self.filters:
+                self.filters.move_to_end(account_id)
+                continue
+
+            account_filter = AccountDedupeFilter(self.retention_days, self.capacity_per_day, self.error_rate)
+            try:
+                for day, data in (await self._read_snapshot(account_id)).items():
+                    account_filter.partitions[day] = DayPartition.from_bytes(
+                        data, self.capacity_per_day, self.error_rate
+                    )
+            except Exception as e:
+                logger.error(f"Error loading dedupe snapshot for account {account_id}: {e}")
+
+            expired = account_filter.rotate(self.today())
+            if expired:
+                self._expired.setdefault(account_id, []).extend(expired)
+            self.filters[account_id] = account_filter
+
+    def might_contain(self, account_id: str, transaction_hash: str) -> bool:
+        """False means the hash was definitely never added"""
+        account_filter = self.filters.get(account_id)
+        return account_filter is not None and transaction_hash in account_filter
+
+    def add(self, account_id: str, transaction_hash: str):
+        account_filter = self.filters.get(account_id)
+        if account_filter is None:
+            account_filter = AccountDedupeFilter(self.retention_days, self.capacity_per_day, self.error_rate)
+            self.filters[account_id] = account_filter
+        self.filters.move_to_end(account_id)
+
+        today = self.today()
+        expired = account_filter.rotate(today)
+        if expired:
+            self._expired.setdefault(account_id, []).extend(expired)
+        account_filter.add(transaction_hash, today)
+        self._dirty.add((account_id, today))
+
+    async def save_snapshots(self):
+        """Persist partitions changed since the last save"""
+        dirty, self._dirty = self._dirty, set()
+        expired, self._expired = self._expired, {}
+
+        try:
+            for account_id, days in expired.items():
+                await self._delete_snapshot(account_id, days)
+            for account_id, day in dirty:
+                partition = self.filters[account_id].partitions.get(day)
+                if partition is not None:
+                    await self._write_snapshot(account_id, day, partition.to_bytes())
+        except Exception as e:
+            logger.error(f"Error saving dedupe snapshots: {e}")
+            self._dirty |= dirty
+            return
+        self.evict()
+
+    def evict(self) -> List[str]:
+        """Drop least recently used filters beyond ``max_accounts``; unsaved ones stay"""
+        if not (self.snapshot_dir or self.redis_client):
+            return []  # nowhere to reload them from
+        unsaved = {account_id for account_id, _ in self._dirty} | set(self._expired)
+        evicted = []
+        for account_id in list(self.filters):
+            if len(self.filters) <= self.max_accounts:
+                break
+            if account_id not in unsaved:
+                del self.filters[account_id]
+                evicted.append(account_id)
+        return evicted
+
+    async def _read_snapshot(self, account_id: str) -> Dict[int, bytes]:
+        if self.snapshot_dir:
+            account_dir = self.snapshot_dir / account_id
+            if not account_dir.exists():
+                return {}
+            return {int(path.stem): path.read_bytes() for path in account_dir.glob('*.bloom')}
+
+        if self.redis_client:
+            stored = await self.redis_client.hgetall(f"{self.snapshot_prefix}{account_id}")
+            return {int(day): base64.b64decode(blob) for day, blob in stored.items()}
+
+        return {}
+
+    async def _write_snapshot(self, account_id: str, day: int, data: bytes):
+        if self.snapshot_dir:
+            account_dir = self.snapshot_dir / account_id
+            account_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = account_dir / f"{day}.tmp"
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, account_dir / f"{day}.bloom")
+            return
+
+        if self.redis_client:
+            key = f"{self.snapshot_prefix}{account_id}"
+            await self.redis_client.hset(key, str(day), base64.b64encode(data).decode())
+            await self.redis_client.expire(key, 86400 * self.retention_days)
+
+    async def _delete_snapshot(self, account_id: str, days: List[int]):
+        if self.snapshot_dir:
+            for day in days:
+                (self.snapshot_dir / account_id / f"{day}.bloom").unlink(missing_ok=True)
+            return
+
+        if self.redis_client:
+            await self.redis_client.hdel(f"{self.snapshot_prefix}{account_id}", *[str(day) for day in days])
@@ -4,12 +4,24 @@ import asyncio
 import logging
 import hashlib
 import json
+import os
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 import asyncpg
 import redis.asyncio as redis
 import nats
+from nats.errors import TimeoutError as NatsTimeoutError
+from nats.js.api import ConsumerConfig
+from nats.js.errors import NotFoundError
 from pydantic import BaseModel
+from connectors import (
+    AccountWatermark, PermanentSyncError, ProviderConnector, WatermarkStore, connectors_from_config,
+)
+from dedupe_index import DedupeIndex
+from fx_rates import FXRateEngine
+from sync_scheduler import SyncScheduler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,12 +38,101 @@ class TransactionData(BaseModel):
     merchant_name: Optional[str] = None
     metadata: Dict[str, Any] = {}
 
+@dataclass
+class BatchIngestStats:
+    """Outcome and timing of a single bulk-ingest batch"""
+    batch_size: int
+    inserted: int
+    duplicates: int
+    failed: int
+    elapsed_seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.batch_size / self.elapsed_seconds
+
+# Columns written by the bulk-ingest COPY, in staging table order
+INGEST_COLUMNS = [
+    'id', 'account_id', 'external_id', 'amount', 'currency',
+    'description', 'merchant_name', 'date', 'metadata',
+]
+
+# Unique key of a provider transaction (migration 021); the insert's ON
+# CONFLICT on it is authoritative where the per-process dedupe index is not
+TRANSACTION_KEY = ('account_id', 'external_id', 'date')
+
+# Session-private staging table, created once per pooled connection; temp
+# tables survive the pool's reset on release
+INGEST_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS transactions_ingest_staging
+    (LIKE transactions INCLUDING DEFAULTS)
+    ON COMMIT DELETE ROWS
+"""
+
 class ETLWorker:
     def __init__(self):
         self.db_pool: Optional[asyncpg.Pool] = None
         self.redis_client: Optional[redis.Redis] = None
         self.nats_client: Optional[nats.NatsClient] = None
 
+        # Bulk ingest settings
+        self.ingest_batch_size = int(os.getenv('ETL_INGEST_BATCH_SIZE', 1000))
+        self.tx_hash_prefix = "tx_hash:"
+        self.tx_hash_ttl = 86400 * 30  # 30 days
+
+        # Latest FX rates in memory: seeded from exchange_rates and the Redis
+        # cache on connect, refreshed on fx.update
+        self.fx_engine = FXRateEngine()
+
+        # Dedupe settings: the local index answers "not seen by this worker",
+        # and "maybe present" hashes are confirmed against redis or postgres;
+        # rows stored by other workers are caught by ON CONFLICT on insert
+        self.dedupe_index: Optional[DedupeIndex] = None
+        self.dedupe_confirm_source = os.getenv('ETL_DEDUPE_CONFIRM', 'postgres')
+        self.dedupe_snapshot_interval = 30  # seconds
+        self._last_dedupe_snapshot = 0.0
+
+        # Sync scheduling: global concurrency plus (rate/s, burst) per provider
+        self.provider_rate_limits = {
+            'plaid': (5.0, 10),
+            'tink': (2.0, 5),
+            'truelayer': (2.0, 5),
+        }
+        self.sync_scheduler = SyncScheduler(
+            self.sync_connection,
+            max_concurrency=int(os.getenv('ETL_SYNC_CONCURRENCY', 10)),
+            provider_limits=self.provider_rate_limits,
+        )
+        self._settle_tasks = set()
+
+        # Incremental sync: connectors by provider name and per-account watermarks
+        self.connectors: Dict[str, ProviderConnector] = {}
+        self.watermark_store = WatermarkStore()
+        self.account_sync_concurrency = int(os.getenv('ETL_ACCOUNT_SYNC_CONCURRENCY', 4))
+        self.page_prefetch = 2
+
+        # conn.sync consumption: 'pull' uses a durable JetStream consumer,
+        # 'core' a plain NATS subscription
+        self.consumer_mode = os.getenv('ETL_CONSUMER_MODE', 'pull')
+        self.sync_stream = "CONN_SYNC"
+        self.sync_durable = "etl-conn-sync"
+        self.fetch_batch_size = int(os.getenv('ETL_FETCH_BATCH_SIZE', 50))
+        self.fetch_timeout = 1.0  # seconds
+        self.max_outstanding = int(os.getenv('ETL_MAX_OUTSTANDING', 200))
+        self.max_queued_syncs = int(os.getenv('ETL_MAX_QUEUED_SYNCS', 100))
+        self.sync_ack_wait = 600  # seconds before JetStream redelivers an unacked sync
+        # Failed syncs are redelivered with exponential backoff, at most
+        # sync_max_deliver times in total
+        self.sync_max_deliver = int(os.getenv('ETL_SYNC_MAX_DELIVER', 5))
+        self.sync_retry_delay = 5.0  # seconds before the first redelivery
+        self.sync_max_retry_delay = 300.0
+        self.backpressure_delay = 0.5  # seconds
+        self._pending_acks: List[tuple] = []
+        self._outstanding = 0
+        self._stopping = False
+
     async def connect(self):
         """Initialize database, Redis, and NATS connections"""
         # Database connection
@@ -41,6 +142,7 @@ class ETLWorker:
             user=os.getenv('DB_USERNAME', 'postgres'),
             password=os.getenv('DB_PASSWORD', 'password'),
             database=os.getenv('DB_NAME', 'finance_tracker'),
+            init=self._init_connection,
         )
 
         # Redis connection
@@ -51,13 +153,31 @@ class ETLWorker:
             decode_responses=True,
         )
 
+        self.watermark_store = WatermarkStore(self.redis_client)
+        for provider, connector in connectors_from_config(os.getenv('ETL_CONNECTORS', '')).items():
+            self.register_connector(connector, provider)
+        logger.info(f"Sync connectors registered for: {', '.join(sorted(self.connectors)) or 'none'}")
+
+        self.fx_engine = FXRateEngine(self.redis_client, db_pool=self.db_pool)
+        await self.fx_engine.refresh()
+
+        # Local dedupe index, snapshotted to Redis
+        self.dedupe_index = DedupeIndex(
+            redis_client=self.redis_client,
+            capacity_per_day=int(os.getenv('ETL_DEDUPE_CAPACITY_PER_DAY', 10000)),
+            max_accounts=int(os.getenv('ETL_DEDUPE_MAX_ACCOUNTS', 1000)),
+        )
+
         # NATS connection
         self.nats_client = await nats.connect(
             os.getenv('NATS_URL', 'nats://localhost:4222')
         )
+        await self.fx_engine.subscribe(self.nats_client)
 
     async def disconnect(self):
         """Close all connections"""
+        if self.dedupe_index:
+            await self.dedupe_index.save_snapshots()
         if self.db_pool:
             await self.db_pool.close()
         if self.redis_client:
@@ -65,6 +185,10 @@ class ETLWorker:
         if self.nats_client:
             await self.nats_client.close()
 
+    async def _init_connection(self, conn: asyncpg.Connection):
+        """Prepare a new pooled connection for bulk ingest"""
+        await conn.execute(INGEST_STAGING_DDL)
+
     def generate_transaction_hash(self, transaction: TransactionData) -> str:
         """Generate a unique hash for transaction deduplication"""
         hash_data = f"{transaction.account_id}:{transaction.external_id}:{transaction.amount}:{transaction.date.isoformat()}"
@@ -72,11 +196,75 @@ class ETLWorker:
 
     async def is_duplicate_transaction(self, transaction_hash: str) -> bool:
         """Check if transaction already exists"""
-        return await self.redis_client.exists(f"tx_hash:{transaction_hash}")
+        return await self.redis_client.exists(f"{self.tx_hash_prefix}{transaction_hash}")
 
     async def mark_transaction_processed(self, transaction_hash: str):
         """Mark transaction as processed"""
-        await self.redis_client.setex(f"tx_hash:{transaction_hash}", 86400 * 30, "1")  # 30 days TTL
+        await self.redis_client.setex(f"{self.tx_hash_prefix}{transaction_hash}", self.tx_hash_ttl, "1")
+
+    async def find_duplicates(self, transactions: List[TransactionData],
+                              transaction_hashes: List[str]) -> List[bool]:
+        """Check a batch for already-processed transactions
+
+        Hashes the local index has never seen are treated as new without
+        any I/O; the remaining "maybe present" ones are confirmed with a
+        single MGET or a single Postgres query depending on
+        ``dedupe_confirm_source``. The index only knows this worker's
+        inserts, so the unique key on insert has the final say.
+        """
+        if not transaction_hashes:
+            return []
+
+        await self.dedupe_index.load_accounts(tx.account_id for tx in transactions)
+        maybe = [
+            i for i, (tx, transaction_hash) in enumerate(zip(transactions, transaction_hashes))
+            if self.dedupe_index.might_contain(tx.account_id, transaction_hash)
+        ]
+
+        duplicates = [False] * len(transaction_hashes)
+        if not maybe:
+            return duplicates
+
+        if self.dedupe_confirm_source == 'redis':
+            values = await self.redis_client.mget(
+                [f"{self.tx_hash_prefix}{transaction_hashes[i]}" for i in maybe]
+            )
+            for i, value in zip(maybe, values):
+                duplicates[i] = value is not None
+        else:
+            # Confirmed on the full unique key: a provider re-sending an id
+            # with a corrected date is a new row
+            async with self.db_pool.acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {', '.join(TRANSACTION_KEY)} FROM transactions
+                    WHERE account_id = ANY($1) AND external_id = ANY($2) AND date = ANY($3)
+                """, list({transactions[i].account_id for i in maybe}),
+                    list({transactions[i].external_id for i in maybe}),
+                    list({transactions[i].date for i in maybe}))
+            existing = {(str(row['account_id']), row['external_id'], row['date']) for row in rows}
+            for i in maybe:
+                duplicates[i] = tuple(getattr(transactions[i], column) for column in TRANSACTION_KEY) in existing
+
+        return duplicates
+
+    async def mark_transactions_processed(self, transactions: List[TransactionData],
+                                          transaction_hashes: List[str]):
+        """Mark a batch of transactions as processed"""
+        if not transaction_hashes:
+            return
+
+        for transaction, transaction_hash in zip(transactions, transaction_hashes):
+            self.dedupe_index.add(transaction.account_id, transaction_hash)
+
+        if self.dedupe_confirm_source == 'redis':
+            pipe = self.redis_client.pipeline(transaction=False)
+            for transaction_hash in transaction_hashes:
+                pipe.setex(f"{self.tx_hash_prefix}{transaction_hash}", self.tx_hash_ttl, "1")
+            await pipe.execute()
+
+        if time.monotonic() - self._last_dedupe_snapshot >= self.dedupe_snapshot_interval:
+            self._last_dedupe_snapshot = time.monotonic()
+            await self.dedupe_index.save_snapshots()
 
     async def detect_transfers(self, transactions: List[TransactionData]) -> List[TransactionData]:
         """Detect and mark internal transfers"""
@@ -100,15 +288,12 @@ class ETLWorker:
         if from_currency == to_currency:
             return amount
 
-        # Get exchange rate from Redis cache
-        rate_key = f"fx_rate:{from_currency}:{to_currency}"
-        cached_rate = await self.redis_client.get(rate_key)
-        
-        if cached_rate:
-            return amount * float(cached_rate)
-        
-        # TODO: Implement FX rate fetching from external API
-        # For now, return original amount
+        # Answered from the in-memory rate matrix, no I/O
+        converted = self.fx_engine.convert(amount, from_currency, to_currency)
+        if converted is not None:
+            return converted
+
+        # Without a rate, keep the original amount
         logger.warning(f"No FX rate found for {from_currency} to {to_currency}")
         return amount
 
@@ -123,7 +308,7 @@ class ETLWorker:
                 transaction_hash = self.generate_transaction_hash(transaction)
                 
                 # Check for duplicates
-                if await self.is_duplicate_transaction(transaction_hash):
+                if (await self.find_duplicates([transaction], [transaction_hash]))[0]:
                     logger.info(f"Skipping duplicate transaction: {transaction.external_id}")
                     skipped_count += 1
                     continue
@@ -136,11 +321,13 @@ class ETLWorker:
 
                 # Store transaction in database
                 async with self.db_pool.acquire() as conn:
-                    await conn.execute("""
+                    inserted = await conn.fetchval(f"""
                         INSERT INTO transactions (
                             id, account_id, external_id, amount, currency, 
                             description, merchant_name, date, metadata, created_at, updated_at
                         ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, NOW(), NOW())
+                        ON CONFLICT ({', '.join(TRANSACTION_KEY)}) DO NOTHING
+                        RETURNING id
                     """, 
                     transaction.id, transaction.account_id, transaction.external_id,
                     normalized_amount, transaction.currency, transaction.description,
@@ -148,7 +335,11 @@ class ETLWorker:
                     )
 
                 # Mark as processed
-                await self.mark_transaction_processed(transaction_hash)
+                await self.mark_transactions_processed([transaction], [transaction_hash])
+                if inserted is None:
+                    logger.info(f"Skipping duplicate transaction: {transaction.external_id}")
+                    skipped_count += 1
+                    continue
                 processed_count += 1
 
                 # Publish event for downstream processing
@@ -167,37 +358,183 @@ class ETLWorker:
 
         logger.info(f"Processed {processed_count} transactions, skipped {skipped_count} duplicates")
 
-    async def sync_connection(self, connection_id: str):
-        """Sync all accounts for a connection"""
+    async def process_transactions_batched(self, transactions: List[TransactionData]) -> List[BatchIngestStats]:
+        """Bulk-ingest transactions in fixed-size batches"""
+        stats = []
+        for start in range(0, len(transactions), self.ingest_batch_size):
+            batch = transactions[start:start + self.ingest_batch_size]
+            stats.append(await self.ingest_batch(batch))
+        return stats
+
+    async def ingest_batch(self, transactions: List[TransactionData]) -> BatchIngestStats:
+        """Ingest one batch with a constant number of Redis, DB and NATS round trips
+
+        Dedupe hashes are checked in one lookup, surviving rows are
+        COPY'd into a staging table and moved into ``transactions`` with
+        ``INSERT ... ON CONFLICT DO NOTHING``, hashes are marked processed in
+        one pipeline and ``tx.upsert`` events are flushed once.
+        """
+        started = time.perf_counter()
+
+        # Dedupe against Redis and within the batch itself
+        hashes = [self.generate_transaction_hash(tx) for tx in transactions]
         try:
-            # TODO: Implement connection-specific sync logic
-            # This would typically:
-            # 1. Get connection details from database
-            # 2. Call provider API to get latest data
-            # 3. Process accounts and transactions
-            # 4. Update last sync timestamp
+            seen = await self.find_duplicates(transactions, hashes)
+        except Exception as e:
+            logger.error(f"Error checking duplicate hashes: {e}")
+            return BatchIngestStats(len(transactions), 0, 0, len(transactions),
+                                    time.perf_counter() - started)
+
+        batch_hashes = set()
+        survivors: List[TransactionData] = []
+        survivor_hashes: List[str] = []
+        for transaction, transaction_hash, duplicate in zip(transactions, hashes, seen):
+            if duplicate or transaction_hash in batch_hashes:
+                continue
+            batch_hashes.add(transaction_hash)
+            survivors.append(transaction)
+            survivor_hashes.append(transaction_hash)
+        duplicates = len(transactions) - len(survivors)
+
+        if not survivors:
+            return self._log_batch_stats(BatchIngestStats(
+                len(transactions), 0, duplicates, 0, time.perf_counter() - started
+            ))
+
+        # Resolve each distinct currency once per batch
+        fx_factors: Dict[str, float] = {}
+        for currency in {tx.currency for tx in survivors}:
+            fx_factors[currency] = await self.normalize_currency(1.0, currency)
+
+        records = [
+            (
+                tx.id, tx.account_id, tx.external_id,
+                tx.amount * fx_factors[tx.currency], tx.currency,
+                tx.description, tx.merchant_name, tx.date, json.dumps(tx.metadata),
+            )
+            for tx in survivors
+        ]
 
+        try:
+            inserted_ids = await self._copy_transactions(records)
+        except Exception as e:
+            logger.error(f"Error bulk inserting {len(records)} transactions: {e}")
+            return self._log_batch_stats(BatchIngestStats(
+                len(transactions), 0, duplicates, len(survivors), time.perf_counter() - started
+            ))
+
+        # Rows that hit ON CONFLICT already exist, so every survivor is processed
+        await self.mark_transactions_processed(survivors, survivor_hashes)
+
+        inserted_lookup = set(inserted_ids)
+        await self.publish_upserts([tx for tx in survivors if tx.id in inserted_lookup])
+
+        # Survivors that hit ON CONFLICT were duplicates after all
+        duplicates += len(survivors) - len(inserted_ids)
+        return self._log_batch_stats(BatchIngestStats(
+            len(transactions), len(inserted_ids), duplicates, 0, time.perf_counter() - started
+        ))
+
+    async def _copy_transactions(self, records: List[tuple]) -> List[str]:
+        """COPY records into a staging table and merge them into transactions"""
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    'transactions_ingest_staging',
+                    records=records,
+                    columns=INGEST_COLUMNS,
+                )
+                rows = await conn.fetch(f"""
+                    INSERT INTO transactions ({', '.join(INGEST_COLUMNS)}, created_at, updated_at)
+                    SELECT {', '.join(INGEST_COLUMNS)}, NOW(), NOW()
+                    FROM transactions_ingest_staging
+                    ON CONFLICT ({', '.join(TRANSACTION_KEY)}) DO NOTHING
+                    RETURNING id
+                """)
+        return [str(row['id']) for row in rows]
+
+    async def publish_upserts(self, transactions: List[TransactionData]):
+        """Publish tx.upsert events for a batch and flush once"""
+        if not transactions:
+            return
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        for transaction in transactions:
+            await self.nats_client.publish(
+                "tx.upsert",
+                json.dumps({
+                    "transaction_id": transaction.id,
+                    "account_id": transaction.account_id,
+                    "timestamp": timestamp
+                }).encode()
+            )
+        await self.nats_client.flush()
+
+    def _log_batch_stats(self, stats: BatchIngestStats) -> BatchIngestStats:
+        logger.info(
+            f"Ingested batch of {stats.batch_size}: {stats.inserted} inserted, "
+            f"{stats.duplicates} duplicates, {stats.failed} failed "
+            f"in {stats.elapsed_seconds:.3f}s ({stats.rows_per_second:.0f} rows/s)"
+        )
+        return stats
+
+    def register_connector(self, connector: ProviderConnector, provider: Optional[str] = None):
+        """Register the connector used for a provider's connections
+
+        ``provider`` defaults to the connector's own name.
+        """
+        self.connectors[provider or connector.name] = connector
+
+    async def fail_connection(self, connection_id: str, reason: str):
+        """Put a connection in the error state so it stops being synced"""
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE connections SET status = 'error', error_message = $2 WHERE id = $1",
+                connection_id, reason
+            )
+
+    async def sync_connection(self, connection_id: str):
+        """Incrementally sync all accounts for a connection
+
+        Each account resumes from its stored cursor, so a resync only
+        fetches what the provider added since the last one. Failures are
+        re-raised so the scheduler can nak the message for redelivery,
+        except PermanentSyncError for a missing connection or a provider
+        without a connector, which redelivery cannot fix; the latter also
+        puts the connection in the error state.
+        """
+        try:
             logger.info(f"Syncing connection: {connection_id}")
-            
-            # Mock transaction data for demonstration
-            mock_transactions = [
-                TransactionData(
-                    id="mock-tx-1",
-                    account_id="mock-account-1",
-                    external_id="ext-123",
-                    amount=100.50,
-                    currency="USD",
-                    description="Coffee at Starbucks",
-                    date=datetime.now(timezone.utc),
-                    merchant_name="Starbucks",
+            started = time.perf_counter()
+
+            async with self.db_pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    "SELECT id, provider, access_token, metadata FROM connections WHERE id = $1",
+                    connection_id
                 )
-            ]
+            if not row:
+                raise PermanentSyncError(f"Connection {connection_id} not found")
+
+            connection = dict(row)
+            connector = self.connectors.get(str(connection['provider']))
+            if connector is None:
+                reason = f"No connector registered for provider {connection['provider']}"
+                await self.fail_connection(connection_id, reason)
+                raise PermanentSyncError(reason)
+
+            account_ids = await connector.list_accounts(connection)
+            watermarks = await self.watermark_store.load(connection_id)
+
+            semaphore = asyncio.Semaphore(self.account_sync_concurrency)
+
+            async def sync_with_limit(account_id: str) -> int:
+                async with semaphore:
+                    return await self.sync_account(
+                        connector, connection_id, connection, account_id,
+                        watermarks.get(account_id) or AccountWatermark(account_id=account_id)
+                    )
 
-            # Detect transfers
-            transactions = await self.detect_transfers(mock_transactions)
-            
-            # Process transactions
-            await self.process_transactions(transactions)
+            counts = await asyncio.gather(*[sync_with_limit(account_id) for account_id in account_ids])
 
             # Update connection last sync
             async with self.db_pool.acquire() as conn:
@@ -206,46 +543,260 @@ class ETLWorker:
                     connection_id
                 )
 
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Synced connection {connection_id}: {sum(counts)} transactions "
+                f"across {len(account_ids)} accounts in {elapsed:.2f}s"
+            )
+
         except Exception as e:
             logger.error(f"Error syncing connection {connection_id}: {e}")
+            raise
+
+    async def sync_account(self, connector: ProviderConnector, connection_id: str,
+                           connection: Dict[str, Any], account_id: str,
+                           watermark: AccountWatermark) -> int:
+        """Stream one account's new pages through dedupe, FX and insert
+
+        The next pages are fetched while the current one is ingested, with
+        at most ``page_prefetch`` pages buffered, and the watermark is saved
+        after every page so an interrupted sync resumes where it stopped.
+        """
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.page_prefetch)
+
+        async def fetch_pages():
+            cursor = watermark.cursor
+            try:
+                while True:
+                    page = await connector.fetch_page(connection, account_id, cursor)
+                    await pages.put(page)
+                    cursor = page.next_cursor
+                    if not page.has_more:
+                        break
+                await pages.put(None)
+            except Exception as e:
+                await pages.put(e)
+
+        fetcher = asyncio.create_task(fetch_pages())
+        synced = 0
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+
+                if page.transactions:
+                    transactions = [TransactionData(**row) for row in page.transactions]
+                    transactions = await self.detect_transfers(transactions)
+                    stats = await self.process_transactions_batched(transactions)
+                    if any(batch.failed for batch in stats):
+                        raise RuntimeError(f"Failed to ingest page for account {account_id}")
+                    synced += len(transactions)
+
+                watermark.advance(page)
+                await self.watermark_store.save(connection_id, watermark)
+        finally:
+            fetcher.cancel()
+
+        return synced
+
+    async def get_connection_provider(self, connection_id: str) -> str:
+        """Look up which provider a connection belongs to"""
+        async with self.db_pool.acquire() as conn:
+            provider = await conn.fetchval(
+                "SELECT provider FROM connections WHERE id = $1",
+                connection_id
+            )
+        return str(provider) if provider else 'default'
 
     async def handle_sync_message(self, msg):
-        """Handle sync messages from NATS"""
+        """Hand sync messages from NATS to the scheduler
+
+        The message is acked once its (possibly coalesced) sync finishes, so
+        the subscription callback returns immediately and one slow provider
+        does not hold up the others.
+        """
         try:
             data = json.loads(msg.data.decode())
             connection_id = data.get('connection_id')
-            
-            if connection_id:
-                await self.sync_connection(connection_id)
-            
-            await msg.ack()
+
+            if not connection_id:
+                await self._settle(msg, 'ack')
+                return
+
+            provider = data.get('provider') or await self.get_connection_provider(connection_id)
+            future = self.sync_scheduler.submit(connection_id, provider)
+
+            task = asyncio.create_task(self._settle_sync_message(msg, future))
+            self._settle_tasks.add(task)
+            task.add_done_callback(self._settle_tasks.discard)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error(f"Dropping malformed sync message: {e}")
+            await self._settle(msg, 'term')
         except Exception as e:
             logger.error(f"Error handling sync message: {e}")
-            await msg.nak()
+            await self._settle(msg, 'nak')
+
+    async def _settle_sync_message(self, msg, future: asyncio.Future):
+        """Settle a sync message once its sync completes
+
+        Successful syncs are acked and failed ones nak'd for a delayed
+        redelivery; permanent failures are terminated, since redelivering
+        them cannot succeed.
+        """
+        try:
+            await future
+            await self._settle(msg, 'ack')
+        except PermanentSyncError as e:
+            logger.error(f"Sync for message failed permanently, terminating it: {e}")
+            await self._settle(msg, 'term')
+        except Exception as e:
+            logger.error(f"Sync for message failed: {e}")
+            await self._settle(msg, 'nak')
+
+    async def _settle(self, msg, outcome: str):
+        """Settle immediately in core mode, or buffer for a bulk flush in pull mode
+
+        ``outcome`` is 'ack', 'nak' or 'term'.
+        """
+        if self.consumer_mode == 'pull':
+            self._pending_acks.append((msg, outcome))
+        else:
+            await self._send_settlement(msg, outcome)
+
+    def retry_delay(self, msg) -> Optional[float]:
+        """Backoff before redelivering a failed sync, or None on its last delivery"""
+        try:
+            delivered = msg.metadata.num_delivered or 1
+        except Exception:
+            delivered = 1
+        if delivered >= self.sync_max_deliver:
+            return None
+        return min(self.sync_retry_delay * 2 ** (delivered - 1), self.sync_max_retry_delay)
+
+    async def _send_settlement(self, msg, outcome: str):
+        if outcome == 'ack':
+            await msg.ack()
+        elif outcome == 'term':
+            await msg.term()
+        else:
+            delay = self.retry_delay(msg)
+            if delay is None:
+                logger.error(f"Sync message failed {self.sync_max_deliver} deliveries, terminating it")
+                await msg.term()
+            else:
+                await msg.nak(delay=delay)
+
+    async def flush_acks(self):
+        """Send all buffered settlements and flush them in one round trip"""
+        if not self._pending_acks:
+            return
+
+        settled, self._pending_acks = self._pending_acks, []
+        for msg, outcome in settled:
+            try:
+                await self._send_settlement(msg, outcome)
+            except Exception as e:
+                logger.error(f"Error settling sync message: {e}")
+        await self.nats_client.flush()
+        self._outstanding -= len(settled)
+
+    def is_saturated(self) -> bool:
+        """Whether fetching more sync work should pause"""
+        if self._outstanding >= self.max_outstanding:
+            return True
+        if self.sync_scheduler.queue_depth >= self.max_queued_syncs:
+            return True
+        if self.db_pool is not None:
+            pool_full = self.db_pool.get_size() >= self.db_pool.get_max_size()
+            if pool_full and self.db_pool.get_idle_size() == 0:
+                return True
+        return False
+
+    def get_sync_stats(self) -> Dict[str, Any]:
+        """Queue depth and in-flight counts of the sync scheduler"""
+        stats = asdict(self.sync_scheduler.get_stats())
+        stats['outstanding_messages'] = self._outstanding
+        return stats
+
+    async def _ensure_sync_stream(self, js):
+        """Create the conn.sync stream if it does not exist yet"""
+        try:
+            await js.stream_info(self.sync_stream)
+        except NotFoundError:
+            await js.add_stream(name=self.sync_stream, subjects=["conn.sync"])
+
+    async def run_pull_consumer(self):
+        """Drain conn.sync through a durable JetStream pull consumer
+
+        Messages are fetched in batches only while the worker has capacity
+        (outstanding messages, scheduler queue and DB pool), handed to the
+        scheduler and acked in bulk as their syncs finish. Unacked messages
+        are redelivered to the durable consumer after a restart.
+        """
+        js = self.nats_client.jetstream()
+        await self._ensure_sync_stream(js)
+        subscription = await js.pull_subscribe(
+            "conn.sync",
+            durable=self.sync_durable,
+            config=ConsumerConfig(
+                ack_wait=self.sync_ack_wait,
+                max_ack_pending=self.max_outstanding,
+                max_deliver=self.sync_max_deliver,
+            ),
+        )
+
+        while not self._stopping:
+            await self.flush_acks()
+
+            if self.is_saturated():
+                await asyncio.sleep(self.backpressure_delay)
+                continue
+
+            batch_size = min(self.fetch_batch_size, self.max_outstanding - self._outstanding)
+            try:
+                msgs = await subscription.fetch(batch_size, timeout=self.fetch_timeout)
+            except NatsTimeoutError:
+                continue
+
+            self._outstanding += len(msgs)
+            for msg in msgs:
+                await self.handle_sync_message(msg)
+
+        await self.sync_scheduler.drain()
+        if self._settle_tasks:
+            await asyncio.gather(*list(self._settle_tasks), return_exceptions=True)
+        await self.flush_acks()
 
     async def start(self):
         """Start the ETL worker"""
         await self.connect()
-        
-        # Subscribe to sync messages
-        await self.nats_client.subscribe(
-            "conn.sync",
-            cb=self.handle_sync_message
-        )
-        
-        logger.info("ETL worker started and listening for sync messages")
-        
-        # Keep the worker running
+
         try:
-            while True:
-                await asyncio.sleep(1)
+            if self.consumer_mode == 'pull':
+                logger.info("ETL worker started with durable pull consumer for sync messages")
+                await self.run_pull_consumer()
+            else:
+                # Subscribe to sync messages
+                await self.nats_client.subscribe(
+                    "conn.sync",
+                    cb=self.handle_sync_message
+                )
+
+                logger.info("ETL worker started and listening for sync messages")
+
+                # Keep the worker running
+                while True:
+                    await asyncio.sleep(1)
         except KeyboardInterrupt:
             logger.info("Shutting down ETL worker")
         finally:
+            self._stopping = True
+            await self.sync_scheduler.drain()
             await self.disconnect()
 
 if __name__ == "__main__":
-    import os
-    
     worker = ETLWorker()
     asyncio.run(worker.start())
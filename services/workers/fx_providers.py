@@ -0,0 +1,202 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import aiohttp
+from fx_rates import Quote, quotes_from_snapshot
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RateSnapshot:
+    """One provider's rates against its base currency at fetch time"""
+    source: str
+    base: str
+    rates: Dict[str, float]
+    fetched_at: datetime
+    stale: bool = False
+
+    def quotes(self) -> List[Quote]:
+        return quotes_from_snapshot(self.base, self.rates)
+
+class RateProvider(ABC):
+    """A source of latest exchange rates quoted against one base currency"""
+
+    name: str = "base"
+    base_currency: str = "USD"
+
+    @abstractmethod
+    async def fetch(self, session: Optional[aiohttp.ClientSession]) -> Dict[str, float]:
+        """Return {target: rate}; raise on any failure rather than returning {}"""
+
+class ECBRateProvider(RateProvider):
+    """ECB reference rates via exchangerate.host"""
+
+    name = "ECB"
+    base_currency = "EUR"
+
+    def __init__(self, url: str = "https://api.exchangerate.host/latest"):
+        self.url = url
+
+    async def fetch(self, session: Optional[aiohttp.ClientSession]) -> Dict[str, float]:
+        async with session.get(self.url) as response:
+            if response.status != 200:
+                raise ConnectionError(f"ECB API error: {response.status}")
+            data = await response.json()
+            if not data.get("success"):
+                raise ValueError("ECB API returned an unsuccessful response")
+            return {**data.get("rates", {}), "EUR": 1.0}
+
+class OpenExchangeRateProvider(RateProvider):
+    """OpenExchangeRates latest rates"""
+
+    name = "OpenExchange"
+    base_currency = "USD"
+
+    def __init__(self, api_key: str, url: str = "https://open.er-api.com/v6/latest"):
+        self.api_key = api_key
+        self.url = url
+
+    async def fetch(self, session: Optional[aiohttp.ClientSession]) -> Dict[str, float]:
+        async with session.get(f"{self.url}/{self.api_key}") as response:
+            if response.status != 200:
+                raise ConnectionError(f"OpenExchange API error: {response.status}")
+            data = await response.json()
+            if data.get("result") != "success":
+                raise ValueError("OpenExchange API returned an unsuccessful response")
+            return {**data.get("rates", {}), "USD": 1.0}
+
+class FakeRateProvider(RateProvider):
+    """Local provider serving deterministic rates
+
+    Used for tests and local runs. Every fetch nudges the rates by
+    ``drift`` so successive snapshots differ; ``fail_next`` makes the next
+    N fetches raise.
+    """
+
+    def __init__(self, name: str = "fake", base_currency: str = "USD",
+                 rates: Optional[Dict[str, float]] = None, drift: float = 0.001,
+                 latency: float = 0.0):
+        self.name = name
+        self.base_currency = base_currency
+        self.rates = dict(rates or {"EUR": 0.92, "GBP": 0.79, "JPY": 150.0, "CAD": 1.36})
+        self.drift = drift
+        self.latency = latency
+        self.failures_left = 0
+        self.fetch_calls = 0
+
+    def fail_next(self, count: int = 1):
+        self.failures_left = count
+
+    async def fetch(self, session: Optional[aiohttp.ClientSession]) -> Dict[str, float]:
+        self.fetch_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures_left:
+            self.failures_left -= 1
+            raise ConnectionError(f"Injected failure from {self.name}")
+
+        factor = 1 + self.drift * self.fetch_calls
+        return {**{target: round(rate * factor, 6) for target, rate in self.rates.items()},
+                self.base_currency: 1.0}
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures
+
+    Closed until ``failure_threshold`` consecutive failures, then open for
+    ``reset_timeout`` seconds; after that one probe call is let through
+    (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+
+@dataclass
+class IngestResult:
+    """Outcome of one refresh across all providers"""
+    snapshots: List[RateSnapshot] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+    @property
+    def fresh(self) -> List[RateSnapshot]:
+        return [snapshot for snapshot in self.snapshots if not snapshot.stale]
+
+class RateIngestor:
+    """Fetches every provider behind its own circuit breaker
+
+    A provider that fails or is tripped contributes its last good snapshot
+    marked stale, so its pairs keep converting until it recovers.
+    """
+
+    def __init__(self, providers: List[RateProvider], failure_threshold: int = 3,
+                 reset_timeout: float = 300.0, fetch_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.providers = providers
+        self.fetch_timeout = fetch_timeout
+        self.breakers = {
+            provider.name: CircuitBreaker(failure_threshold, reset_timeout, clock)
+            for provider in providers
+        }
+        self.last_good: Dict[str, RateSnapshot] = {}
+
+    async def _fetch(self, provider: RateProvider, session) -> RateSnapshot:
+        rates = await asyncio.wait_for(provider.fetch(session), self.fetch_timeout)
+        if not rates:
+            raise ValueError(f"{provider.name} returned no rates")
+        return RateSnapshot(provider.name, provider.base_currency, rates, datetime.utcnow())
+
+    async def refresh(self, session: Optional[aiohttp.ClientSession] = None) -> IngestResult:
+        result = IngestResult()
+        allowed = [provider for provider in self.providers if self.breakers[provider.name].allow()]
+        result.skipped = [provider.name for provider in self.providers if provider not in allowed]
+
+        outcomes = await asyncio.gather(
+            *(self._fetch(provider, session) for provider in allowed), return_exceptions=True
+        )
+        for provider, outcome in zip(allowed, outcomes):
+            breaker = self.breakers[provider.name]
+            if isinstance(outcome, Exception):
+                breaker.record_failure()
+                result.failed.append(provider.name)
+                logger.error(f"Error fetching {provider.name} rates ({breaker.state}): {outcome}")
+            else:
+                breaker.record_success()
+                self.last_good[provider.name] = outcome
+                result.snapshots.append(outcome)
+
+        for name in result.failed + result.skipped:
+            snapshot = self.last_good.get(name)
+            if snapshot:
+                result.snapshots.append(RateSnapshot(
+                    snapshot.source, snapshot.base, snapshot.rates, snapshot.fetched_at, stale=True
+                ))
+        return result
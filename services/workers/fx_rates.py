@@ -0,0 +1,404 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import json
+import logging
+from datetime import date, datetime
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Currencies missing pairs are triangulated through, in order
+PIVOT_CURRENCIES = ('EUR', 'USD')
+
+# Redis keys the FX worker caches latest rates under: fx:rate:{base}:{target}
+RATE_CACHE_PREFIX = "fx:rate:"
+
+# NATS subject published after the FX worker stores fresh rates
+FX_UPDATE_SUBJECT = "fx.update"
+
+# Rates are applied at the precision exchange_rates stores, DECIMAL(20, 10)
+RATE_DECIMALS = 10
+RATE_SCALE = 10 ** RATE_DECIMALS
+CENT = Decimal('0.01')
+
+# convert_minor_units keeps every intermediate product inside int64 below these
+MAX_MINOR_AMOUNT = 10 ** 13
+MAX_RATE_UNITS = 10 ** 5 * RATE_SCALE
+
+Quote = Tuple[str, str, float]
+
+def rate_units(rate: Any) -> int:
+    """A rate as an integer number of 1e-10 units, rounded half-even"""
+    return int(Decimal(str(rate)).scaleb(RATE_DECIMALS).quantize(Decimal(1), ROUND_HALF_EVEN))
+
+def _divide_half_even(numerator: int, denominator: int) -> int:
+    quotient, remainder = divmod(numerator, denominator)
+    if remainder * 2 > denominator or (remainder * 2 == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+def invert_units(units: int) -> int:
+    """Rate units of the inverse pair"""
+    return _divide_half_even(RATE_SCALE * RATE_SCALE, units)
+
+def chain_units(first: int, second: int) -> int:
+    """Rate units of A->C from A->B and B->C"""
+    return _divide_half_even(first * second, RATE_SCALE)
+
+def convert_decimal(amount: Decimal, units: int) -> Decimal:
+    """Convert a money amount at a rate given in rate units, rounded half-even to cents"""
+    return (amount * Decimal(units).scaleb(-RATE_DECIMALS)).quantize(CENT, ROUND_HALF_EVEN)
+
+def convert_minor_units(amounts: np.ndarray, units: np.ndarray) -> np.ndarray:
+    """Vectorized convert_decimal over int64 cents and per-row rate units
+
+    ``amounts * units`` can overflow int64, so the rate is split into its
+    integer part and two 5-digit fraction limbs; the product over 10^10
+    is then assembled exactly and rounded half-even like the Decimal path.
+    """
+    amounts = np.asarray(amounts, dtype=np.int64)
+    units = np.asarray(units, dtype=np.int64)
+    if amounts.size and (np.abs(amounts).max() >= MAX_MINOR_AMOUNT or units.max() >= MAX_RATE_UNITS
+                         or units.min() < 0):
+        raise ValueError("Amount or rate outside the range convert_minor_units handles exactly")
+
+    half = 10 ** 5
+    magnitude = np.abs(amounts)
+    whole, fraction = np.divmod(units, RATE_SCALE)
+    high, low = np.divmod(fraction, half)
+
+    carry, low_rest = np.divmod(magnitude * low, half)
+    middle = magnitude * high + carry
+    middle_quotient, middle_rest = np.divmod(middle, half)
+
+    result = magnitude * whole + middle_quotient
+    remainder = middle_rest * half + low_rest  # the product's last 10 digits
+    round_up = (remainder * 2 > RATE_SCALE) | ((remainder * 2 == RATE_SCALE) & (result % 2 == 1))
+    result += round_up
+    return np.where(amounts < 0, -result, result)
+
+def quotes_from_snapshot(base: str, rates: Dict[str, float]) -> List[Quote]:
+    """Turn a provider's {target: rate} snapshot for ``base`` into quotes"""
+    return [
+        (base, target, float(rate))
+        for target, rate in rates.items()
+        if target != base and rate
+    ]
+
+class FXRateMatrix:
+    """Immutable snapshot of latest rates as a dense currency x currency matrix
+
+    ``rates[i, j]`` is the units of currency j one unit of currency i buys;
+    unknown pairs are NaN. Lookups are two dict hits and an array read.
+    """
+
+    def __init__(self, currencies: List[str], rates: np.ndarray, as_of: Optional[datetime] = None):
+        self.currencies = list(currencies)
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        self.rates = rates
+        self.rates.flags.writeable = False
+        self.as_of = as_of
+
+    @classmethod
+    def empty(cls) -> 'FXRateMatrix':
+        return cls([], np.empty((0, 0)))
+
+    @classmethod
+    def from_quotes(cls, quotes: Iterable[Quote], pivots: Tuple[str, ...] = PIVOT_CURRENCIES,
+                    as_of: Optional[datetime] = None) -> 'FXRateMatrix':
+        """Build a matrix from (base, target, rate) quotes
+
+        Each quote also fills its inverse unless that pair is quoted
+        directly. Pairs still missing are triangulated through the pivots,
+        repeating until nothing changes so e.g. a USD-only quote and a
+        EUR-only quote meet through EUR/USD.
+        """
+        quotes = [(b.upper(), t.upper(), float(r)) for b, t, r in quotes if r and r > 0]
+        currencies = sorted({b for b, _, _ in quotes} | {t for _, t, _ in quotes})
+        index = {currency: i for i, currency in enumerate(currencies)}
+
+        rates = np.full((len(currencies), len(currencies)), np.nan)
+        np.fill_diagonal(rates, 1.0)
+        if quotes:
+            bases = np.array([index[b] for b, _, _ in quotes])
+            targets = np.array([index[t] for _, t, _ in quotes])
+            values = np.array([r for _, _, r in quotes])
+            rates[targets, bases] = 1.0 / values
+            rates[bases, targets] = values
+
+        pivot_indexes = [index[p] for p in pivots if p in index]
+        for _ in range(len(pivot_indexes) + 1):
+            missing = np.isnan(rates)
+            if not missing.any():
+                break
+            for p in pivot_indexes:
+                via = np.outer(rates[:, p], rates[p, :])
+                fill = np.isnan(rates) & ~np.isnan(via)
+                rates[fill] = via[fill]
+            if (np.isnan(rates) == missing).all():
+                break
+
+        return cls(currencies, rates, as_of)
+
+    def __len__(self) -> int:
+        return len(self.currencies)
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        if from_currency == to_currency:
+            return 1.0
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        rate = self.rates[i, j]
+        return None if np.isnan(rate) else float(rate)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> Optional[float]:
+        rate = self.rate(from_currency, to_currency)
+        return None if rate is None else amount * rate
+
+class FXRateEngine:
+    """Latest FX rates shared by the workers, answered from memory
+
+    Conversions read the current FXRateMatrix and never touch Redis or the
+    database. A refresh builds a complete new matrix and swaps the single
+    reference, so a reader sees either the old or the new rates, never a
+    mix.
+    """
+
+    def __init__(self, redis_client=None, pivots: Tuple[str, ...] = PIVOT_CURRENCIES, db_pool=None):
+        self.redis_client = redis_client
+        self.db_pool = db_pool
+        self.pivots = pivots
+        self.matrix = FXRateMatrix.empty()
+
+    def update(self, quotes: Iterable[Quote], as_of: Optional[datetime] = None) -> FXRateMatrix:
+        matrix = FXRateMatrix.from_quotes(quotes, self.pivots, as_of or datetime.utcnow())
+        self.matrix = matrix
+        logger.info(f"FX rate matrix refreshed with {len(matrix)} currencies")
+        return matrix
+
+    async def refresh(self) -> FXRateMatrix:
+        """Rebuild the matrix from stored rates, overlaid with those cached in Redis
+
+        The Redis cache expires within hours of the daily update and
+        fx.update is not replayed, so each pair's latest day in
+        ``exchange_rates`` is the base a late-starting worker can rely on.
+        """
+        quotes: Dict[Tuple[str, str], float] = {}
+        as_of = None
+        if self.db_pool:
+            try:
+                rows = await self.db_pool.fetch("""
+                    SELECT DISTINCT ON (base_currency, target_currency)
+                        base_currency, target_currency, rate, rate_date
+                    FROM exchange_rates
+                    ORDER BY base_currency, target_currency, rate_date DESC
+                """)
+            except Exception as e:
+                logger.warning(f"Could not load stored FX rates: {e}")
+                rows = []
+            for row in rows:
+                quotes[(row['base_currency'], row['target_currency'])] = float(row['rate'])
+            if rows:
+                latest = max(row['rate_date'] for row in rows)
+                as_of = datetime(latest.year, latest.month, latest.day)
+
+        if self.redis_client:
+            keys = [key async for key in self.redis_client.scan_iter(match=f"{RATE_CACHE_PREFIX}*")]
+            for key, value in zip(keys, await self.redis_client.mget(keys) if keys else []):
+                if not value:
+                    continue
+                try:
+                    base, target = key[len(RATE_CACHE_PREFIX):].split(':')
+                    quotes[(base, target)] = float(json.loads(value)['rate'])
+                    as_of = None  # fresher than the stored day
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable FX rate {key}: {e}")
+
+        if not quotes:
+            logger.warning("No stored or cached FX rates to build the rate matrix from")
+            return self.matrix
+        return self.update([(base, target, rate) for (base, target), rate in quotes.items()], as_of)
+
+    async def handle_update_message(self, msg):
+        """Apply an fx.update message, or reload from Redis if it carries no quotes"""
+        try:
+            data: Dict[str, Any] = json.loads(msg.data.decode()) if msg.data else {}
+            if data.get('quotes'):
+                as_of = datetime.fromisoformat(data['as_of']) if data.get('as_of') else None
+                self.update([tuple(quote) for quote in data['quotes']], as_of)
+            else:
+                await self.refresh()
+        except Exception as e:
+            logger.error(f"Error applying FX rate update: {e}")
+
+    async def subscribe(self, nats_client):
+        return await nats_client.subscribe(FX_UPDATE_SUBJECT, cb=self.handle_update_message)
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        return self.matrix.rate(from_currency, to_currency)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> Optional[float]:
+        return self.matrix.convert(amount, from_currency, to_currency)
+
+class RateSeries:
+    """One pair's daily rates as sorted day and rate-unit arrays
+
+    Treated as immutable: adding a day returns a new series, so lookups
+    running during a refresh see a consistent series.
+    """
+
+    def __init__(self, days: np.ndarray, units: np.ndarray, sources: List[str]):
+        self.days = days
+        self.units = units
+        self.sources = sources
+
+    @classmethod
+    def from_points(cls, points: Iterable[Tuple[date, int, str]]) -> 'RateSeries':
+        points = sorted(points, key=lambda point: point[0])
+        return cls(
+            np.array([day for day, _, _ in points], dtype='datetime64[D]'),
+            np.array([units for _, units, _ in points], dtype=np.int64),
+            [source for _, _, source in points],
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def position(self, day: date) -> int:
+        """Index of the last rate on or before ``day``, -1 if there is none"""
+        return int(np.searchsorted(self.days, np.datetime64(day, 'D'), side='right')) - 1
+
+    def as_of(self, day: date) -> Optional[int]:
+        """Rate units in effect on ``day``, carrying the last rate across gaps"""
+        index = self.position(day)
+        return int(self.units[index]) if index >= 0 else None
+
+    def between(self, start: date, end: date) -> 'RateSeries':
+        lo = int(np.searchsorted(self.days, np.datetime64(start, 'D'), side='left'))
+        hi = int(np.searchsorted(self.days, np.datetime64(end, 'D'), side='right'))
+        return RateSeries(self.days[lo:hi], self.units[lo:hi], self.sources[lo:hi])
+
+    def with_point(self, day: date, units: int, source: str) -> 'RateSeries':
+        """A copy with ``day`` set to ``units``, replacing any rate for that day"""
+        day = np.datetime64(day, 'D')
+        index = int(np.searchsorted(self.days, day, side='left'))
+        replace = index < len(self.days) and self.days[index] == day
+        stop = index + 1 if replace else index
+        return RateSeries(
+            np.concatenate([self.days[:index], [day], self.days[stop:]]),
+            np.concatenate([self.units[:index], [units], self.units[stop:]]).astype(np.int64),
+            self.sources[:index] + [source] + self.sources[stop:],
+        )
+
+class FXRateHistory:
+    """Daily historical rates for every stored pair, held in memory
+
+    Persisted in ``exchange_rates`` as one row per pair per day keyed on
+    (base_currency, target_currency, rate_date). Lookups are as-of: a
+    weekend or holiday gets the last published rate. Pairs never stored
+    are answered through their inverse or the EUR/USD pivots.
+    """
+
+    def __init__(self, db_pool=None, pivots: Tuple[str, ...] = PIVOT_CURRENCIES):
+        self.db_pool = db_pool
+        self.pivots = pivots
+        self.series: Dict[Tuple[str, str], RateSeries] = {}
+
+    async def ensure_schema(self):
+        if not self.db_pool:
+            return
+        await self.db_pool.execute("""
+            CREATE TABLE IF NOT EXISTS exchange_rates (
+                base_currency VARCHAR(3) NOT NULL,
+                target_currency VARCHAR(3) NOT NULL,
+                rate_date DATE NOT NULL,
+                rate DECIMAL(20, 10) NOT NULL,
+                source VARCHAR(50) NOT NULL,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                PRIMARY KEY (base_currency, target_currency, rate_date)
+            )
+        """)
+
+    async def load(self, since: Optional[date] = None):
+        """Load every pair's series from the database in one query"""
+        if not self.db_pool:
+            return
+        rows = await self.db_pool.fetch("""
+            SELECT base_currency, target_currency, rate_date, rate, source
+            FROM exchange_rates
+            WHERE rate_date >= COALESCE($1::date, '-infinity'::date)
+        """, since)
+
+        points: Dict[Tuple[str, str], List[Tuple[date, int, str]]] = {}
+        for row in rows:
+            points.setdefault((row['base_currency'], row['target_currency']), []).append(
+                (row['rate_date'], rate_units(row['rate']), row['source'])
+            )
+        self.series = {pair: RateSeries.from_points(pair_points) for pair, pair_points in points.items()}
+        logger.info(f"Loaded {len(rows)} historical FX rates for {len(self.series)} pairs")
+
+    def add(self, base: str, target: str, day: date, units: int, source: str):
+        series = self.series.get((base, target))
+        self.series[(base, target)] = (
+            series.with_point(day, units, source) if series is not None
+            else RateSeries.from_points([(day, units, source)])
+        )
+
+    async def save(self, records: Iterable[Tuple[str, str, Any, str]], day: date):
+        """Upsert one day's (base, target, rate, source) rows in a single batch
+
+        A pair quoted twice keeps its last row, since one upsert statement
+        cannot touch a row twice.
+        """
+        rows = {(base, target): (rate_units(rate), source) for base, target, rate, source in records}
+        if self.db_pool and rows:
+            await self.db_pool.executemany("""
+                INSERT INTO exchange_rates (base_currency, target_currency, rate_date, rate, source)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (base_currency, target_currency, rate_date)
+                DO UPDATE SET rate = EXCLUDED.rate, source = EXCLUDED.source, updated_at = NOW()
+            """, [(base, target, day, Decimal(units).scaleb(-RATE_DECIMALS), source)
+                  for (base, target), (units, source) in rows.items()])
+        for (base, target), (units, source) in rows.items():
+            self.add(base, target, day, units, source)
+
+    def _pair_units(self, base: str, target: str, day: date) -> Optional[int]:
+        series = self.series.get((base, target))
+        units = series.as_of(day) if series is not None else None
+        if units is None:
+            inverse = self.series.get((target, base))
+            units = inverse.as_of(day) if inverse is not None else None
+            units = invert_units(units) if units else None
+        return units
+
+    def rate_units(self, base: str, target: str, day: date) -> Optional[int]:
+        """Rate units for ``base`` -> ``target`` as of ``day``"""
+        if base == target:
+            return RATE_SCALE
+
+        paths = [[base, target]]
+        paths += [[base, pivot, target] for pivot in self.pivots if pivot not in (base, target)]
+        paths += [[base, first, second, target] for first in self.pivots for second in self.pivots
+                  if first != second and {first, second}.isdisjoint((base, target))]
+        for path in paths:
+            units = RATE_SCALE
+            for step_from, step_to in zip(path, path[1:]):
+                step = self._pair_units(step_from, step_to, day)
+                if step is None:
+                    break
+                units = chain_units(units, step)
+            else:
+                return units
+        return None
+
+    def latest_day(self, base: str, target: str) -> Optional[date]:
+        series = self.series.get((base, target))
+        return series.days[-1].astype(object) if series is not None and len(series) else None
+
+    def between(self, base: str, target: str, start: date, end: date) -> Optional[RateSeries]:
+        series = self.series.get((base, target))
+        return series.between(start, end) if series is not None else None
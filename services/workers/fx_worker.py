@@ -4,14 +4,23 @@ import asyncio
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import aiohttp
 import asyncpg
+import nats
+import numpy as np
 import redis.asyncio as redis
 import pandas as pd
 from dataclasses import dataclass
 from decimal import Decimal
 import json
+from fx_providers import (
+    ECBRateProvider, IngestResult, OpenExchangeRateProvider, RateIngestor, RateSnapshot,
+)
+from fx_rates import (
+    FX_UPDATE_SUBJECT, RATE_CACHE_PREFIX, RATE_DECIMALS, RATE_SCALE, FXRateEngine, FXRateHistory,
+    convert_decimal, convert_minor_units, rate_units,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,15 +41,27 @@ class FXWorker:
         self.db_pool: Optional[asyncpg.Pool] = None
         self.redis_client: Optional[redis.Redis] = None
         self.session: Optional[aiohttp.ClientSession] = None
+        self.nats_client: Optional[nats.NatsClient] = None
+        
+        # Latest rates held in memory for I/O-free conversions
+        self.rate_engine = FXRateEngine()
+        
+        # Daily rate history held in memory for dated conversions
+        self.rate_history = FXRateHistory()
+        self.history_days = int(os.getenv("FX_HISTORY_DAYS", "730"))
         
         # Configuration
         self.ecb_url = "https://api.exchangerate.host/latest"
         self.openexchange_url = "https://open.er-api.com/v6/latest"
         self.openexchange_api_key = os.getenv("OPENEXCHANGE_API_KEY", "")
         
+        # Update cadence: daily, retrying sooner while a provider is failing
+        self.update_interval = 24 * 60 * 60
+        self.retry_interval = 15 * 60
+        
         # Cache settings
         self.cache_ttl = 3600  # 1 hour
-        self.rate_cache_prefix = "fx:rate:"
+        self.rate_cache_prefix = RATE_CACHE_PREFIX
         self.historical_cache_prefix = "fx:historical:"
         
         # Supported currencies (major + common)
@@ -49,6 +70,14 @@ class FXWorker:
             "SEK", "NZD", "MXN", "SGD", "HKD", "NOK", "KRW", "TRY",
             "RUB", "INR", "BRL", "ZAR", "PLN", "THB", "IDR", "HUF"
         ]
+        
+        # Rate providers, each behind its own circuit breaker
+        providers = [ECBRateProvider(self.ecb_url)]
+        if self.openexchange_api_key:
+            providers.append(OpenExchangeRateProvider(self.openexchange_api_key, self.openexchange_url))
+        else:
+            logger.warning("OpenExchange API key not configured")
+        self.rate_ingestor = RateIngestor(providers)
     
     async def connect(self):
         """Connect to database and Redis"""
@@ -73,6 +102,18 @@ class FXWorker:
             socket_timeout=5
         )
         
+        self.rate_history = FXRateHistory(self.db_pool)
+        await self.rate_history.ensure_schema()
+        await self.rate_history.load(since=datetime.utcnow().date() - timedelta(days=self.history_days))
+        
+        self.rate_engine = FXRateEngine(self.redis_client, db_pool=self.db_pool)
+        await self.rate_engine.refresh()
+        
+        # NATS connection for fx.update notifications
+        self.nats_client = await nats.connect(
+            os.getenv("NATS_URL", "nats://localhost:4222")
+        )
+        
         # HTTP session
         self.session = aiohttp.ClientSession(
             timeout=aiohttp.ClientTimeout(total=30),
@@ -89,64 +130,10 @@ class FXWorker:
             await self.redis_client.close()
         if self.session:
             await self.session.close()
+        if self.nats_client:
+            await self.nats_client.close()
         logger.info("FX Worker disconnected")
     
-    async def fetch_ecb_rates(self) -> Dict[str, float]:
-        """Fetch rates from ECB via exchangerate.host"""
-        try:
-            async with self.session.get(self.ecb_url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data.get("success"):
-                        rates = data.get("rates", {})
-                        # Add EUR as base (1.0)
-                        rates["EUR"] = 1.0
-                        return rates
-                logger.error(f"ECB API error: {response.status}")
-                return {}
-        except Exception as e:
-            logger.error(f"Error fetching ECB rates: {e}")
-            return {}
-    
-    async def fetch_openexchange_rates(self) -> Dict[str, float]:
-        """Fetch rates from OpenExchangeRates"""
-        if not self.openexchange_api_key:
-            logger.warning("OpenExchange API key not configured")
-            return {}
-        
-        try:
-            url = f"{self.openexchange_url}/{self.openexchange_api_key}"
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data.get("result") == "success":
-                        rates = data.get("rates", {})
-                        # Add USD as base (1.0)
-                        rates["USD"] = 1.0
-                        return rates
-                logger.error(f"OpenExchange API error: {response.status}")
-                return {}
-        except Exception as e:
-            logger.error(f"Error fetching OpenExchange rates: {e}")
-            return {}
-    
-    async def fetch_rates(self) -> Dict[str, Dict[str, float]]:
-        """Fetch rates from multiple sources"""
-        tasks = [
-            self.fetch_ecb_rates(),
-            self.fetch_openexchange_rates()
-        ]
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        rates = {}
-        if isinstance(results[0], dict):
-            rates["ECB"] = results[0]
-        if isinstance(results[1], dict):
-            rates["OpenExchange"] = results[1]
-        
-        return rates
-    
     async def cache_rate(self, base: str, target: str, rate: float, source: str):
         """Cache exchange rate in Redis"""
         if not self.redis_client:
@@ -165,6 +152,22 @@ class FXWorker:
             json.dumps(rate_data)
         )
     
+    async def cache_snapshots(self, snapshots: List[RateSnapshot]):
+        """Cache every pair of the given snapshots in one Redis round trip"""
+        if not self.redis_client or not snapshots:
+            return
+        
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for snapshot in snapshots:
+                rate_data = {"source": snapshot.source, "timestamp": snapshot.fetched_at.isoformat()}
+                for base, target, rate in snapshot.quotes():
+                    pipe.setex(
+                        f"{self.rate_cache_prefix}{base}:{target}",
+                        self.cache_ttl,
+                        json.dumps({"rate": rate, **rate_data})
+                    )
+            await pipe.execute()
+    
     async def get_cached_rate(self, base: str, target: str) -> Optional[ExchangeRate]:
         """Get cached exchange rate"""
         if not self.redis_client:
@@ -185,183 +188,216 @@ class FXWorker:
             )
         return None
     
-    async def store_rates_in_db(self, rates: Dict[str, Dict[str, float]], source: str):
-        """Store exchange rates in database"""
-        if not self.db_pool:
-            return
-        
-        # Create exchange_rates table if it doesn't exist
-        await self.db_pool.execute("""
-            CREATE TABLE IF NOT EXISTS exchange_rates (
-                id SERIAL PRIMARY KEY,
-                base_currency VARCHAR(3) NOT NULL,
-                target_currency VARCHAR(3) NOT NULL,
-                rate DECIMAL(20, 10) NOT NULL,
-                source VARCHAR(50) NOT NULL,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                UNIQUE(base_currency, target_currency, source, DATE(created_at))
-            )
-        """)
-        
-        # Insert rates
-        timestamp = datetime.utcnow()
-        for base, target_rates in rates.items():
-            for target, rate in target_rates.items():
-                if base != target and target in self.supported_currencies:
-                    try:
-                        await self.db_pool.execute("""
-                            INSERT INTO exchange_rates (base_currency, target_currency, rate, source, created_at)
-                            VALUES ($1, $2, $3, $4, $5)
-                            ON CONFLICT (base_currency, target_currency, source, DATE(created_at))
-                            DO UPDATE SET rate = EXCLUDED.rate, created_at = EXCLUDED.created_at
-                        """, base, target, rate, source, timestamp)
-                    except Exception as e:
-                        logger.error(f"Error storing rate {base}/{target}: {e}")
+    async def store_snapshots(self, snapshots: List[RateSnapshot]):
+        """Store today's rates from every snapshot as one batch, one row per pair"""
+        records = [
+            (base, target, rate, snapshot.source)
+            for snapshot in snapshots
+            for base, target, rate in snapshot.quotes()
+            if target in self.supported_currencies
+        ]
+        await self.rate_history.save(records, datetime.utcnow().date())
     
     async def convert_amount(self, amount: Decimal, from_currency: str, to_currency: str, 
                            date: Optional[datetime] = None) -> Optional[Decimal]:
-        """Convert amount between currencies"""
+        """Convert amount between currencies, rounded half-even to cents"""
         if from_currency == to_currency:
             return amount
         
-        # Try to get cached rate first
-        rate = await self.get_cached_rate(from_currency, to_currency)
-        
-        if not rate:
-            # Try to get from database
-            rate = await self.get_historical_rate(from_currency, to_currency, date)
-        
-        if rate:
-            return amount * rate.rate
+        units = await self.resolve_rate_units(from_currency, to_currency, date)
+        if units is not None:
+            return convert_decimal(amount, units)
         
         logger.warning(f"No exchange rate found for {from_currency} to {to_currency}")
         return None
     
+    async def resolve_rate_units(self, from_currency: str, to_currency: str,
+                                 date: Optional[datetime] = None) -> Optional[int]:
+        """Rate for a pair in 1e-10 units
+        
+        Undated and current-day lookups are answered by the in-memory rate
+        engine, past dates by the rate history as of that day; either falls
+        back to the other. Nothing here does I/O.
+        """
+        if from_currency == to_currency:
+            return RATE_SCALE
+        
+        today = datetime.utcnow().date()
+        if date is not None and date.date() < today:
+            units = self.rate_history.rate_units(from_currency, to_currency, date.date())
+            if units is not None:
+                return units
+        
+        latest = self.rate_engine.rate(from_currency, to_currency)
+        if latest is not None:
+            return rate_units(latest)
+        
+        return self.rate_history.rate_units(from_currency, to_currency, today)
+    
+    async def normalize_amounts(self, currencies: Sequence[str], amounts: np.ndarray,
+                                dates: Optional[np.ndarray] = None,
+                                to_currency: str = "USD") -> Tuple[np.ndarray, np.ndarray]:
+        """Convert a column of int64 cent amounts to ``to_currency`` cents
+        
+        Rows are grouped by (currency, day) and each distinct rate is resolved
+        once; the conversion is then one exact integer multiply over the
+        whole column, identical to convert_amount row by row. Returns the
+        converted cents and a mask of rows that had a rate; rows without one,
+        including rows with no currency, keep their original amount.
+        """
+        amounts = np.asarray(amounts, dtype=np.int64)
+        currency_codes, currency_values = pd.factorize(np.asarray(currencies, dtype=object))
+        if dates is None:
+            day_codes, day_values = np.full(len(amounts), -1), []
+        else:
+            day_codes, day_values = pd.factorize(np.asarray(dates, dtype='datetime64[D]'))
+        
+        # Day slot 0 is "no date" (missing or NaT)
+        groups, inverse = np.unique(currency_codes * (len(day_values) + 1) + day_codes + 1,
+                                    return_inverse=True)
+        group_units = np.full(len(groups), RATE_SCALE, dtype=np.int64)
+        group_found = np.ones(len(groups), dtype=bool)
+        for index, group in enumerate(groups.tolist()):
+            currency_code, day_slot = divmod(group, len(day_values) + 1)
+            if currency_code < 0:  # missing currency: factorize codes it -1
+                group_found[index] = False
+                continue
+            date = pd.Timestamp(day_values[day_slot - 1]).to_pydatetime() if day_slot else None
+            units = await self.resolve_rate_units(currency_values[currency_code], to_currency, date)
+            if units is None:
+                group_found[index] = False
+            else:
+                group_units[index] = units
+        
+        found = group_found[inverse]
+        return convert_minor_units(amounts, group_units[inverse]), found
+    
     async def get_historical_rate(self, base: str, target: str, 
                                 date: Optional[datetime] = None) -> Optional[ExchangeRate]:
-        """Get historical exchange rate from database"""
-        if not self.db_pool:
+        """Get the exchange rate in effect on a date (latest when omitted)
+        
+        Answered from the in-memory history: days without a published rate
+        carry the previous one, and unstored pairs are derived via inverse
+        or pivot rates.
+        """
+        day = (date or datetime.utcnow()).date()
+        units = self.rate_history.rate_units(base, target, day)
+        if units is None:
             return None
         
-        try:
-            if date:
-                # Get rate for specific date
-                row = await self.db_pool.fetchrow("""
-                    SELECT base_currency, target_currency, rate, source, created_at
-                    FROM exchange_rates
-                    WHERE base_currency = $1 AND target_currency = $2
-                    AND DATE(created_at) = DATE($3)
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                """, base, target, date)
-            else:
-                # Get latest rate
-                row = await self.db_pool.fetchrow("""
-                    SELECT base_currency, target_currency, rate, source, created_at
-                    FROM exchange_rates
-                    WHERE base_currency = $1 AND target_currency = $2
-                    ORDER BY created_at DESC
-                    LIMIT 1
-                """, base, target)
-            
-            if row:
-                return ExchangeRate(
-                    base_currency=row["base_currency"],
-                    target_currency=row["target_currency"],
-                    rate=row["rate"],
-                    timestamp=row["created_at"],
-                    source=row["source"],
-                    last_updated=row["created_at"]
-                )
-        except Exception as e:
-            logger.error(f"Error getting historical rate: {e}")
+        source, rate_day = "derived", day
+        series = self.rate_history.series.get((base, target))
+        if series is not None and series.position(day) >= 0:
+            index = series.position(day)
+            source, rate_day = series.sources[index], series.days[index].astype(object)
         
-        return None
+        timestamp = datetime.combine(rate_day, datetime.min.time())
+        return ExchangeRate(
+            base_currency=base,
+            target_currency=target,
+            rate=Decimal(units).scaleb(-RATE_DECIMALS),
+            timestamp=timestamp,
+            source=source,
+            last_updated=timestamp
+        )
     
     async def get_rate_history(self, base: str, target: str, 
                              days: int = 30) -> List[ExchangeRate]:
         """Get exchange rate history for analysis"""
-        if not self.db_pool:
+        end = datetime.utcnow().date()
+        series = self.rate_history.between(base, target, end - timedelta(days=days), end)
+        if series is None:
             return []
         
-        try:
-            rows = await self.db_pool.fetch("""
-                SELECT base_currency, target_currency, rate, source, created_at
-                FROM exchange_rates
-                WHERE base_currency = $1 AND target_currency = $2
-                AND created_at >= NOW() - INTERVAL '$3 days'
-                ORDER BY created_at ASC
-            """, base, target, days)
-            
-            return [
-                ExchangeRate(
-                    base_currency=row["base_currency"],
-                    target_currency=row["target_currency"],
-                    rate=row["rate"],
-                    timestamp=row["created_at"],
-                    source=row["source"],
-                    last_updated=row["created_at"]
-                )
-                for row in rows
-            ]
-        except Exception as e:
-            logger.error(f"Error getting rate history: {e}")
-            return []
+        history = []
+        for day, units, source in zip(series.days.astype(object), series.units.tolist(), series.sources):
+            timestamp = datetime.combine(day, datetime.min.time())
+            history.append(ExchangeRate(
+                base_currency=base,
+                target_currency=target,
+                rate=Decimal(units).scaleb(-RATE_DECIMALS),
+                timestamp=timestamp,
+                source=source,
+                last_updated=timestamp
+            ))
+        return history
     
     async def normalize_transaction_amounts(self, transactions: List[Dict]) -> List[Dict]:
         """Normalize transaction amounts to a base currency (USD)"""
         if not transactions:
             return transactions
         
-        normalized_transactions = []
+        currencies = [transaction.get("currency", "USD") for transaction in transactions]
+        amounts = np.array([float(transaction.get("amount", 0)) for transaction in transactions])
+        dates = pd.to_datetime(
+            [transaction.get("date") for transaction in transactions], errors="coerce", utc=True
+        ).tz_localize(None).to_numpy()
         
-        for transaction in transactions:
-            amount = Decimal(str(transaction.get("amount", 0)))
-            currency = transaction.get("currency", "USD")
-            
+        converted, found = await self.normalize_amounts(
+            currencies, np.rint(amounts * 100).astype(np.int64), dates, "USD"
+        )
+        
+        for transaction, currency, amount, amount_usd, has_rate in zip(
+            transactions, currencies, amounts.tolist(), (converted / 100).tolist(), found.tolist()
+        ):
             if currency != "USD":
-                converted_amount = await self.convert_amount(amount, currency, "USD")
-                if converted_amount:
-                    transaction["amount_usd"] = float(converted_amount)
-                    transaction["original_currency"] = currency
-                    transaction["original_amount"] = float(amount)
+                transaction["original_currency"] = currency
+                if has_rate:
+                    transaction["amount_usd"] = amount_usd
+                    transaction["original_amount"] = amount
                 else:
                     # Keep original if conversion fails
-                    transaction["amount_usd"] = float(amount)
-                    transaction["original_currency"] = currency
+                    transaction["amount_usd"] = amount
             else:
-                transaction["amount_usd"] = float(amount)
-            
-            normalized_transactions.append(transaction)
+                transaction["amount_usd"] = amount
         
-        return normalized_transactions
+        return transactions
     
-    async def run_daily_update(self):
-        """Run daily exchange rate update"""
+    async def run_daily_update(self) -> Optional[IngestResult]:
+        """Run daily exchange rate update
+        
+        Providers that fail or are tripped contribute their last good
+        snapshot, so conversions keep answering from it until they recover.
+        """
         logger.info("Starting daily FX rate update")
         
         try:
-            # Fetch rates from sources
-            rates = await self.fetch_rates()
+            result = await self.rate_ingestor.refresh(self.session)
             
-            if not rates:
-                logger.error("No rates fetched from any source")
-                return
+            if not result.snapshots:
+                logger.error("No rates fetched from any source, keeping current rates")
+                return result
             
-            # Store in database and cache
-            for source, source_rates in rates.items():
-                await self.store_rates_in_db({source: source_rates}, source)
-                
-                # Cache individual rates
-                for base, target_rates in source_rates.items():
-                    for target, rate in target_rates.items():
-                        if base != target:
-                            await self.cache_rate(base, target, rate, source)
+            # Only fresh rates are persisted; stale ones keep the cache and matrix warm
+            await self.store_snapshots(result.fresh)
+            await self.cache_snapshots(result.snapshots)
+            
+            # Fresh quotes come last so they win over stale ones for the same pair
+            quotes = [
+                quote
+                for snapshot in sorted(result.snapshots, key=lambda snapshot: not snapshot.stale)
+                for quote in snapshot.quotes()
+            ]
+            matrix = self.rate_engine.update(quotes)
+            await self.publish_rate_update(quotes, matrix.as_of)
             
-            logger.info(f"Updated {sum(len(rates) for rates in rates.values())} exchange rates")
+            logger.info(f"Updated {len(quotes)} exchange rates "
+                        f"({len(result.fresh)} fresh snapshots, stale: {result.failed + result.skipped})")
+            return result
             
         except Exception as e:
             logger.error(f"Error in daily FX update: {e}")
+            return None
+    
+    async def publish_rate_update(self, quotes: List[Tuple[str, str, float]], as_of: datetime):
+        """Send fresh quotes on fx.update so other workers swap their rate matrix"""
+        if not self.nats_client:
+            return
+        
+        await self.nats_client.publish(
+            FX_UPDATE_SUBJECT,
+            json.dumps({"quotes": quotes, "as_of": as_of.isoformat()}).encode()
+        )
     
     async def run(self):
         """Main worker loop"""
@@ -369,10 +405,11 @@ class FXWorker:
         
         try:
             while True:
-                await self.run_daily_update()
+                result = await self.run_daily_update()
                 
-                # Wait 24 hours before next update
-                await asyncio.sleep(24 * 60 * 60)
+                # Wait a day, or revalidate sooner while serving stale rates
+                healthy = result is not None and not (result.failed or result.skipped)
+                await asyncio.sleep(self.update_interval if healthy else self.retry_interval)
                 
         except KeyboardInterrupt:
             logger.info("FX Worker stopped by user")
@@ -0,0 +1,279 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+
+# Text fields of an imported transaction besides the description
+TEXT_FIELDS = ['currency', 'merchant_name', 'category', 'account_name', 'reference']
+
+class StringColumn:
+    """Dictionary-encoded string column: int32 codes into unique values
+
+    Code -1 means missing. Bank exports repeat the same merchants and
+    descriptions endlessly, so each distinct string is stored once.
+    """
+
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values: Iterable[Optional[str]]) -> 'StringColumn':
+        codes, uniques = pd.factorize(pd.Series(list(values), dtype=object), use_na_sentinel=True)
+        return cls(codes.astype(np.int32), uniques.tolist())
+
+    @classmethod
+    def empty(cls, length: int) -> 'StringColumn':
+        return cls(np.full(length, -1, dtype=np.int32), [])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        code = self.codes[index]
+        return None if code < 0 else self.values[code]
+
+    def to_list(self) -> List[Optional[str]]:
+        lookup = self.values + [None]  # code -1 indexes the trailing None
+        return [lookup[code] for code in self.codes.tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(len(str(value)) for value in self.values)
+
+    @classmethod
+    def concat(cls, columns: List['StringColumn']) -> 'StringColumn':
+        interner = _Interner()
+        for column in columns:
+            for value in column.to_list():
+                interner.append(value)
+        return interner.build()
+
+class ImportBatch:
+    """Columnar block of imported transactions
+
+    Dates are ``datetime64[s]``, amounts ``int64`` minor units (cents) and
+    text fields dictionary-encoded. Scalar metadata (strings, flags) is
+    kept as extra encoded columns; anything else (e.g. QIF splits or the
+    original CSV row) is stored sparsely by row. Pydantic ``ImportedTransaction`` objects are only built when a
+    caller asks for them.
+    """
+
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray, import_rows: np.ndarray,
+                 descriptions: StringColumn,
+                 text_columns: Optional[Dict[str, StringColumn]] = None,
+                 metadata_columns: Optional[Dict[str, StringColumn]] = None,
+                 sparse_metadata: Optional[Dict[int, Dict[str, Any]]] = None):
+        self.dates = dates
+        self.amounts = amounts
+        self.import_rows = import_rows
+        self.descriptions = descriptions
+        self.text_columns = text_columns or {}
+        self.metadata_columns = metadata_columns or {}
+        self.sparse_metadata = sparse_metadata or {}
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns"""
+        columns = [self.descriptions, *self.text_columns.values(), *self.metadata_columns.values()]
+        return (self.dates.nbytes + self.amounts.nbytes + self.import_rows.nbytes
+                + sum(column.nbytes for column in columns))
+
+    @classmethod
+    def empty(cls) -> 'ImportBatch':
+        return ImportBatchBuilder().build()
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'ImportBatch':
+        """Build from a parsed frame with date, amount, description, import_row columns"""
+        return cls(
+            dates=frame['date'].to_numpy().astype('datetime64[s]'),
+            amounts=np.rint(frame['amount'].to_numpy(dtype=np.float64) * 100).astype(np.int64),
+            import_rows=frame['import_row'].to_numpy(dtype=np.int64),
+            descriptions=StringColumn.from_values(frame['description']),
+            text_columns={
+                field: StringColumn.from_values(frame[field].where(frame[field] != '', None))
+                for field in TEXT_FIELDS if field in frame
+            },
+        )
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Any]) -> 'ImportBatch':
+        """Build from ``ImportedTransaction`` objects (formats without a columnar parser)"""
+        builder = ImportBatchBuilder()
+        for index, transaction in enumerate(transactions, start=1):
+            metadata = dict(transaction.metadata)
+            builder.append(
+                date=transaction.date,
+                amount=transaction.amount,
+                description=transaction.description,
+                import_row=metadata.pop('import_row', index),
+                metadata=metadata,
+                **{field: getattr(transaction, field) for field in TEXT_FIELDS}
+            )
+        return builder.build()
+
+    @classmethod
+    def concat(cls, batches: List['ImportBatch']) -> 'ImportBatch':
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+
+        def merged(attr: str) -> Dict[str, StringColumn]:
+            names = {name for batch in batches for name in getattr(batch, attr)}
+            return {
+                name: StringColumn.concat([
+                    getattr(batch, attr).get(name) or StringColumn.empty(len(batch)) for batch in batches
+                ])
+                for name in names
+            }
+
+        sparse: Dict[int, Dict[str, Any]] = {}
+        offset = 0
+        for batch in batches:
+            sparse.update({offset + i: meta for i, meta in batch.sparse_metadata.items()})
+            offset += len(batch)
+
+        return cls(
+            dates=np.concatenate([batch.dates for batch in batches]),
+            amounts=np.concatenate([batch.amounts for batch in batches]),
+            import_rows=np.concatenate([batch.import_rows for batch in batches]),
+            descriptions=StringColumn.concat([batch.descriptions for batch in batches]),
+            text_columns=merged('text_columns'),
+            metadata_columns=merged('metadata_columns'),
+            sparse_metadata=sparse,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame({
+            'import_row': self.import_rows,
+            'date': self.dates,
+            'amount': self.amounts / 100,
+            'description': self.descriptions.to_list(),
+        })
+        for name, column in self.text_columns.items():
+            frame[name] = column.to_list()
+        return frame
+
+    def iter_transactions(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Any]:
+        """Lazily build ``ImportedTransaction`` objects for a row range"""
+        # Imported here: import_parser depends on this module
+        from import_parser import ImportedTransaction
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        dates = self.dates[start:stop].tolist()
+        amounts = self.amounts[start:stop].tolist()
+        rows = self.import_rows[start:stop].tolist()
+        descriptions = self.descriptions.to_list()[start:stop]
+        text = {name: column.to_list()[start:stop] for name, column in self.text_columns.items()}
+        meta = {name: column.to_list()[start:stop] for name, column in self.metadata_columns.items()}
+
+        for offset in range(stop - start):
+            metadata: Dict[str, Any] = {'import_row': rows[offset]}
+            metadata.update({name: values[offset] for name, values in meta.items() if values[offset] is not None})
+            metadata.update(self.sparse_metadata.get(start + offset, {}))
+            fields = {name: values[offset] for name, values in text.items()}
+            yield ImportedTransaction(
+                date=dates[offset],
+                amount=amounts[offset] / 100,
+                description=descriptions[offset],
+                currency=fields.pop('currency', None) or 'USD',
+                metadata=metadata,
+                **fields
+            )
+
+    def to_transactions(self) -> List[Any]:
+        return list(self.iter_transactions())
+
+class _Interner:
+    """Append-only dictionary encoder used while building a batch"""
+
+    def __init__(self, length: int = 0):
+        self.codes = array('i', [-1]) * length
+        self.index: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def append(self, value: Any):
+        if value is None:
+            self.codes.append(-1)
+            return
+        key = (type(value), value)  # keep True and 1 apart
+        code = self.index.get(key)
+        if code is None:
+            code = len(self.values)
+            self.index[key] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def build(self) -> StringColumn:
+        return StringColumn(np.frombuffer(self.codes, dtype=np.int32).copy(), self.values)
+
+class ImportBatchBuilder:
+    """Row-at-a-time builder for streaming parsers"""
+
+    def __init__(self):
+        self._dates: List[datetime] = []
+        self._amounts = array('q')
+        self._rows = array('q')
+        self._descriptions = _Interner()
+        self._text: Dict[str, _Interner] = {}
+        self._metadata: Dict[str, _Interner] = {}
+        self._sparse: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._amounts)
+
+    def _column(self, columns: Dict[str, _Interner], name: str) -> _Interner:
+        column = columns.get(name)
+        if column is None:
+            column = _Interner(len(self._amounts))  # backfill earlier rows as missing
+            columns[name] = column
+        return column
+
+    def append(self, date: datetime, amount: float, description: str, import_row: int,
+               metadata: Optional[Dict[str, Any]] = None, **text_fields: Optional[str]):
+        """Add one transaction; scalar metadata becomes columns, the rest is sparse"""
+        for name, value in text_fields.items():
+            if name not in TEXT_FIELDS:
+                raise ValueError(f"Unknown text field: {name}")
+            self._column(self._text, name).append(value)
+
+        sparse = {}
+        for name, value in (metadata or {}).items():
+            if value is None or isinstance(value, (str, bool, int, float)):
+                self._column(self._metadata, name).append(value)
+            else:
+                sparse[name] = value
+
+        self._dates.append(date)
+        self._amounts.append(int(round(amount * 100)))
+        self._rows.append(import_row)
+        self._descriptions.append(description)
+        if sparse:
+            self._sparse[len(self._amounts) - 1] = sparse
+
+        # Columns not mentioned for this row are padded as missing
+        length = len(self._amounts)
+        for columns in (self._text, self._metadata):
+            for column in columns.values():
+                if len(column.codes) < length:
+                    column.append(None)
+
+    def build(self) -> ImportBatch:
+        return ImportBatch(
+            dates=np.array(self._dates, dtype='datetime64[s]'),
+            amounts=np.frombuffer(self._amounts, dtype=np.int64).copy(),
+            import_rows=np.frombuffer(self._rows, dtype=np.int64).copy(),
+            descriptions=self._descriptions.build(),
+            text_columns={name: column.build() for name, column in self._text.items()},
+            metadata_columns={name: column.build() for name, column in self._metadata.items()},
+            sparse_metadata=self._sparse,
+        )
@@ -1,15 +1,37 @@
 # Created automatically by Cursor AI (2024-08-27)
 
+import codecs
 import csv
+import hashlib
+import html
 import logging
+import os
+import re
+import time
+import zipfile
+from functools import cached_property, lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Iterator, Sequence, Tuple
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from import_batch import TEXT_FIELDS, ImportBatch, ImportBatchBuilder
 
 logger = logging.getLogger(__name__)
 
+# Date formats tried for imported rows, in order of preference
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%Y/%m/%d',
+    '%m-%d-%Y',
+    '%d-%m-%Y'
+]
+
 class ImportedTransaction(BaseModel):
     date: datetime
     amount: float
@@ -27,142 +49,606 @@ class ImportResult(BaseModel):
     total_rows: int
     successful_rows: int
 
+class AmountFormat(BaseModel):
+    """How a bank writes amounts; negatives may be -1.00, (1.00) or 1.00-"""
+    decimal_separator: str = '.'
+    thousands_separator: str = ','
+
+def infer_date_format(values: Sequence[Optional[str]], sample_size: int = 200) -> Optional[str]:
+    """Pick the date format that parses the most values in a sample
+
+    Ambiguous day/month orders are settled by the sample itself: any day
+    above 12 rules out the month-first format.
+    """
+    sample = [v.strip() for v in values if v and v.strip()][:sample_size]
+    if not sample:
+        return None
+
+    best_format, best_hits = None, 0
+    for fmt in DATE_FORMATS:
+        hits = 0
+        for value in sample:
+            try:
+                datetime.strptime(value, fmt)
+                hits += 1
+            except ValueError:
+                continue
+        if hits > best_hits:
+            best_format, best_hits = fmt, hits
+    return best_format
+
+def infer_amount_format(values: Sequence[Optional[str]], sample_size: int = 200) -> AmountFormat:
+    """Detect decimal-comma amounts (1.234,56) versus decimal-point ones"""
+    sample = [v.strip() for v in values if v and v.strip()][:sample_size]
+    decimal_comma = sum(bool(re.search(r',\d{1,2}\)?-?$', v)) for v in sample)
+    decimal_point = sum(bool(re.search(r'\.\d{1,2}\)?-?$', v)) for v in sample)
+
+    if decimal_comma > decimal_point:
+        if any("'" in v for v in sample):
+            return AmountFormat(decimal_separator=',', thousands_separator="'")
+        if any(re.search(r'\d \d{3}', v) for v in sample):
+            return AmountFormat(decimal_separator=',', thousands_separator=' ')
+        return AmountFormat(decimal_separator=',', thousands_separator='.')
+    return AmountFormat()
+
+def parse_dates_column(values: pd.Series, date_format: Optional[str]) -> pd.Series:
+    """Parse a string column with one format; failures become NaT"""
+    if not date_format:
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    return pd.to_datetime(values.fillna('').str.strip(), format=date_format, errors='coerce')
+
+def parse_amounts_column(values: pd.Series, amount_format: AmountFormat) -> pd.Series:
+    """Parse a string column of amounts; failures become NaN"""
+    text = values.fillna('').str.strip()
+    negative = (
+        text.str.startswith('-')
+        | text.str.endswith('-')
+        | (text.str.startswith('(') & text.str.endswith(')'))
+    )
+
+    cleaned = text.str.replace(r"[()+\-\s$£€¥]", '', regex=True)
+    if amount_format.thousands_separator and amount_format.thousands_separator.strip():
+        cleaned = cleaned.str.replace(amount_format.thousands_separator, '', regex=False)
+    if amount_format.decimal_separator != '.':
+        cleaned = cleaned.str.replace(amount_format.decimal_separator, '.', regex=False)
+
+    amounts = pd.to_numeric(cleaned.where(cleaned != '', None), errors='coerce')
+    return amounts.where(~negative, -amounts.abs())
+
+def parse_amount(value: str, amount_format: AmountFormat) -> float:
+    """Scalar counterpart of parse_amounts_column; raises ValueError"""
+    text = value.strip()
+    negative = text.startswith('-') or text.endswith('-') or (text.startswith('(') and text.endswith(')'))
+    cleaned = re.sub(r"[()+\-\s$£€¥]", '', text)
+    if amount_format.thousands_separator and amount_format.thousands_separator.strip():
+        cleaned = cleaned.replace(amount_format.thousands_separator, '')
+    if amount_format.decimal_separator != '.':
+        cleaned = cleaned.replace(amount_format.decimal_separator, '.')
+    amount = float(cleaned)
+    return -abs(amount) if negative else amount
+
+class ImportChunk(BaseModel):
+    """A slice of a parsed file; rows stay columnar until ``transactions`` is read"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    batch: ImportBatch
+    errors: List[str]
+    rows_read: int
+    bytes_read: int
+    total_bytes: int
+    date_format: Optional[str] = None
+    amount_format: Optional[AmountFormat] = None
+
+    @cached_property
+    def transactions(self) -> List[ImportedTransaction]:
+        return self.batch.to_transactions()
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the file consumed so far"""
+        if self.total_bytes <= 0:
+            return 1.0
+        return min(1.0, self.bytes_read / self.total_bytes)
+
+def collect_chunks(chunks: Iterator[ImportChunk]) -> ImportResult:
+    """Gather a chunk stream into a single ImportResult"""
+    batches = []
+    errors = []
+    total_rows = 0
+
+    for chunk in chunks:
+        batches.append(chunk.batch)
+        errors.extend(chunk.errors)
+        total_rows = chunk.rows_read
+
+    transactions = ImportBatch.concat(batches).to_transactions()
+    return ImportResult(
+        transactions=transactions,
+        errors=errors,
+        total_rows=total_rows,
+        successful_rows=len(transactions)
+    )
+
+class ChunkBuilder:
+    """Accumulates parsed rows into a columnar batch and cuts ImportChunks"""
+
+    def __init__(self, chunk_size: int, total_bytes: int):
+        self.chunk_size = chunk_size
+        self.total_bytes = total_bytes
+        self.batch = ImportBatchBuilder()
+        self.errors: List[str] = []
+        self.rows_read = 0
+
+    def add(self, fields: Dict[str, Any]):
+        self.batch.append(**fields)
+
+    @property
+    def full(self) -> bool:
+        return len(self.batch) + len(self.errors) >= self.chunk_size
+
+    def take(self, bytes_read: int) -> ImportChunk:
+        chunk = ImportChunk(
+            batch=self.batch.build(),
+            errors=self.errors,
+            rows_read=self.rows_read,
+            bytes_read=bytes_read,
+            total_bytes=self.total_bytes
+        )
+        self.batch, self.errors = ImportBatchBuilder(), []
+        return chunk
+
+class CSVLayout(BaseModel):
+    """Header row, delimiter and encoding of a CSV export"""
+    columns: List[str]
+    delimiter: str
+    encoding: str = 'utf-8'
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable key for a bank's export layout, independent of its rows"""
+        header = '\x1f'.join(column.strip().casefold() for column in self.columns)
+        key = f"{self.encoding.lower()}\x1e{self.delimiter}\x1e{header}"
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+class LayoutProfile(BaseModel):
+    """What is known about a layout: confirmed mapping and inferred formats
+
+    A shared profile also tracks a competing mapping and the households
+    that confirmed it, until enough of them agree to replace the current one.
+    """
+    column_mapping: Dict[str, str]
+    date_format: Optional[str] = None
+    amount_format: Optional[AmountFormat] = None
+    imports: int = 0
+    candidate_mapping: Optional[Dict[str, str]] = None
+    candidate_households: List[str] = []
+
+class ColumnMappingRegistry:
+    """Column mappings and formats remembered per CSV layout fingerprint
+
+    Each household's confirmed mapping is kept under its own key and wins
+    for that household. Households without one fall back to the shared
+    profile of the layout, so a bank's export is only mapped once. The
+    shared mapping is set by the first confirmation and only replaced once
+    ``min_agreement`` distinct households confirm the same other mapping,
+    so one household cannot change it for everyone. Profiles are cached in
+    process and stored in Redis (a synchronous client) or as JSON files
+    under ``store_dir``.
+    """
+
+    def __init__(self, redis_client: Optional[Any] = None, store_dir: Optional[Path] = None,
+                 ttl_days: int = 365, min_agreement: int = 2):
+        self.redis_client = redis_client
+        self.store_dir = store_dir
+        self.ttl_days = ttl_days
+        self.min_agreement = min_agreement
+        self.key_prefix = "import:layout:"
+        self._profiles: Dict[str, LayoutProfile] = {}
+
+    @staticmethod
+    def _key(layout: CSVLayout, household_id: Optional[str] = None) -> str:
+        return f"{household_id}:{layout.fingerprint}" if household_id else layout.fingerprint
+
+    def _load(self, key: str) -> Optional[LayoutProfile]:
+        profile = self._profiles.get(key)
+        if profile is None:
+            try:
+                data = self._read(key)
+            except Exception as e:
+                logger.error(f"Error loading column mapping for layout {key}: {e}")
+                data = None
+            if data:
+                profile = LayoutProfile.model_validate_json(data)
+                self._profiles[key] = profile
+        return profile
+
+    def _store(self, key: str, profile: LayoutProfile):
+        self._profiles[key] = profile
+        try:
+            self._write(key, profile.model_dump_json())
+        except Exception as e:
+            logger.error(f"Error saving column mapping for layout {key}: {e}")
+
+    def get(self, layout: CSVLayout, household_id: Optional[str] = None) -> Optional[LayoutProfile]:
+        """The household's own profile for a layout, else the shared one"""
+        if household_id:
+            profile = self._load(self._key(layout, household_id))
+            if profile is not None:
+                return profile
+        return self._load(self._key(layout))
+
+    @staticmethod
+    def _confirmed(previous: Optional[LayoutProfile], column_mapping: Dict[str, str],
+                   date_format: Optional[str], amount_format: Optional[AmountFormat]) -> LayoutProfile:
+        """``previous`` confirmed once more; formats are only replaced when given"""
+        if previous is not None and previous.column_mapping == column_mapping:
+            return previous.model_copy(update={
+                'date_format': date_format or previous.date_format,
+                'amount_format': amount_format or previous.amount_format,
+                'imports': previous.imports + 1,
+            })
+        return LayoutProfile(column_mapping=dict(column_mapping), date_format=date_format,
+                             amount_format=amount_format, imports=1)
+
+    def remember(self, layout: CSVLayout, column_mapping: Dict[str, str],
+                 date_format: Optional[str] = None,
+                 amount_format: Optional[AmountFormat] = None,
+                 household_id: Optional[str] = None) -> LayoutProfile:
+        """Store a confirmed mapping; returns the profile that now applies to the caller"""
+        own = None
+        if household_id:
+            own_key = self._key(layout, household_id)
+            own = self._confirmed(self._load(own_key), column_mapping, date_format, amount_format)
+            self._store(own_key, own)
+
+        shared_key = self._key(layout)
+        shared = self._load(shared_key)
+        if shared is None or shared.column_mapping == column_mapping:
+            shared = self._confirmed(shared, column_mapping, date_format, amount_format)
+        elif household_id:
+            # A competing mapping: count distinct households behind it
+            if shared.candidate_mapping != column_mapping:
+                shared = shared.model_copy(update={'candidate_mapping': dict(column_mapping),
+                                                   'candidate_households': []})
+            if household_id not in shared.candidate_households:
+                shared = shared.model_copy(update={
+                    'candidate_households': shared.candidate_households + [household_id]
+                })
+            if len(shared.candidate_households) >= self.min_agreement:
+                logger.info(f"Shared mapping for layout {shared_key} replaced by "
+                            f"{len(shared.candidate_households)} agreeing households")
+                shared = LayoutProfile(column_mapping=dict(column_mapping), date_format=date_format,
+                                       amount_format=amount_format, imports=len(shared.candidate_households))
+        else:
+            # Anonymous confirmations never override a shared mapping
+            return shared
+        self._store(shared_key, shared)
+        return own or shared
+
+    def _read(self, key: str) -> Optional[str]:
+        if self.store_dir:
+            path = self.store_dir / f"{key}.json"
+            return path.read_text() if path.exists() else None
+
+        if self.redis_client:
+            data = self.redis_client.get(f"{self.key_prefix}{key}")
+            return data.decode() if isinstance(data, bytes) else data
+
+        return None
+
+    def _write(self, key: str, data: str):
+        if self.store_dir:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.store_dir / f"{key}.tmp"
+            tmp_path.write_text(data)
+            os.replace(tmp_path, self.store_dir / f"{key}.json")
+            return
+
+        if self.redis_client:
+            self.redis_client.set(f"{self.key_prefix}{key}", data, ex=86400 * self.ttl_days)
+
 class CSVImporter:
-    def __init__(self):
+    def __init__(self, mapping_registry: Optional[ColumnMappingRegistry] = None,
+                 household_id: Optional[str] = None):
         self.supported_formats = ['.csv', '.txt']
-        
+        self.mapping_registry = mapping_registry
+        self.household_id = household_id  # whose confirmed mappings are read and recorded
+
+    def sniff_layout(self, file_path: Path, encoding: str = 'utf-8') -> CSVLayout:
+        """Read the header once to get its columns and delimiter"""
+        with open(file_path, 'r', encoding=encoding, newline='') as f:
+            header = f.readline().lstrip('\ufeff').rstrip('\r\n')
+
+        # Pick the common delimiter that splits the header line the most
+        delimiters = [',', ';', '\t', '|']
+        counts = {delimiter: header.count(delimiter) for delimiter in delimiters}
+        best = max(delimiters, key=lambda delimiter: counts[delimiter])
+        delimiter = best if counts[best] else ','  # Default to comma
+
+        columns = next(csv.reader([header], delimiter=delimiter), []) if header else []
+        return CSVLayout(columns=columns, delimiter=delimiter, encoding=encoding)
+
     def detect_delimiter(self, file_path: Path) -> str:
         """Detect CSV delimiter"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sample = f.read(1024)
-            
-        # Try common delimiters
-        delimiters = [',', ';', '\t', '|']
-        for delimiter in delimiters:
-            if delimiter in sample:
-                return delimiter
-                
-        return ','  # Default to comma
-    
-    def parse_csv(self, file_path: Path, column_mapping: Dict[str, str]) -> ImportResult:
-        """Parse CSV file with column mapping"""
-        transactions = []
-        errors = []
-        total_rows = 0
-        successful_rows = 0
-        
+        return self.sniff_layout(file_path).delimiter
+
+    def resolve_mapping(self, file_path: Path, column_mapping: Optional[Dict[str, str]] = None,
+                        encoding: str = 'utf-8') -> Tuple[CSVLayout, Dict[str, str], Optional[LayoutProfile]]:
+        """Sniff the layout and fill in the mapping remembered for it
+
+        The returned profile is only set when it was recorded for the same
+        mapping, so its date and amount formats apply to these columns.
+        """
+        layout = self.sniff_layout(file_path, encoding)
+        profile = self.mapping_registry.get(layout, self.household_id) if self.mapping_registry else None
+
+        if not column_mapping:
+            if profile is None:
+                raise ValueError("Column mapping is required for CSV files")
+            column_mapping = profile.column_mapping
+        elif profile is not None and profile.column_mapping != column_mapping:
+            profile = None
+
+        return layout, column_mapping, profile
+
+    def remember_mapping(self, file_path: Path, column_mapping: Dict[str, str],
+                         encoding: str = 'utf-8') -> Optional[LayoutProfile]:
+        """Record a mapping the user confirmed after previewing a file"""
+        if not self.mapping_registry:
+            return None
+        return self.mapping_registry.remember(self.sniff_layout(file_path, encoding), column_mapping,
+                                              household_id=self.household_id)
+
+    def parse_csv(self, file_path: Path, column_mapping: Optional[Dict[str, str]] = None) -> ImportResult:
+        """Parse CSV file with column mapping (or the one remembered for its layout)"""
+        return collect_chunks(self.iter_csv_batches(file_path, column_mapping, keep_original_data=True))
+
+    def iter_csv_chunks(self, file_path: Path, column_mapping: Optional[Dict[str, str]] = None,
+                        chunk_size: int = 5000, encoding: str = 'utf-8',
+                        keep_original_data: bool = False) -> Iterator[ImportChunk]:
+        """Parse a CSV file in a single pass, yielding fixed-size chunks
+
+        Progress is reported as bytes consumed rather than from a row
+        pre-count, and only the current chunk is held in memory, so the
+        caller can commit chunk by chunk regardless of file size.
+        """
+        layout, column_mapping, profile = self.resolve_mapping(file_path, column_mapping, encoding)
+        date_format = profile.date_format if profile else None
+        amount_format = profile.amount_format if profile else None
+        builder = ChunkBuilder(chunk_size, file_path.stat().st_size)
+        bytes_read = 0
+        remembered = False
+        # Raw values the formats are inferred from when none is remembered yet
+        samples: Dict[str, List[Optional[str]]] = {'date': [], 'amount': []}
+
+        def remember():
+            self._remember(
+                layout, column_mapping,
+                date_format or infer_date_format(samples['date']),
+                amount_format or infer_amount_format(samples['amount']),
+            )
+
         try:
-            delimiter = self.detect_delimiter(file_path)
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f, delimiter=delimiter)
-                total_rows = sum(1 for row in reader)
-                
-                # Reset file pointer
-                f.seek(0)
-                reader = csv.DictReader(f, delimiter=delimiter)
-                
+            with open(file_path, 'rb') as f:
+                def lines() -> Iterator[str]:
+                    nonlocal bytes_read
+                    for raw_line in f:
+                        bytes_read += len(raw_line)
+                        yield raw_line.decode(encoding)
+
+                reader = csv.DictReader(lines(), delimiter=layout.delimiter)
+
                 for row_num, row in enumerate(reader, start=2):  # Start at 2 to account for header
+                    builder.rows_read += 1
                     try:
                         # Map columns according to mapping
-                        mapped_row = {}
-                        for target_field, source_column in column_mapping.items():
-                            if source_column in row:
-                                mapped_row[target_field] = row[source_column]
-                            else:
-                                mapped_row[target_field] = None
-                        
+                        mapped_row = {
+                            target_field: row.get(source_column)
+                            for target_field, source_column in column_mapping.items()
+                        }
+                        if not remembered and len(samples['date']) < 200:
+                            samples['date'].append(mapped_row.get('date'))
+                            samples['amount'].append(mapped_row.get('amount'))
+
                         # Parse transaction
-                        transaction = self._parse_transaction_row(mapped_row, row_num)
-                        if transaction:
-                            transactions.append(transaction)
-                            successful_rows += 1
-                        else:
-                            errors.append(f"Row {row_num}: Invalid transaction data")
-                            
+                        builder.add(self._parse_transaction_row(
+                            mapped_row, row_num, keep_original_data, date_format, amount_format
+                        ))
+
                     except Exception as e:
-                        errors.append(f"Row {row_num}: {str(e)}")
-                        
+                        builder.errors.append(f"Row {row_num}: {str(e)}")
+
+                    if builder.full:
+                        if not remembered and len(builder.batch):
+                            remember()
+                            remembered = True
+                        yield builder.take(bytes_read)
+
         except Exception as e:
-            errors.append(f"File parsing error: {str(e)}")
-            
-        return ImportResult(
-            transactions=transactions,
-            errors=errors,
-            total_rows=total_rows,
-            successful_rows=successful_rows
-        )
-    
-    def _parse_transaction_row(self, row: Dict[str, Any], row_num: int) -> Optional[ImportedTransaction]:
-        """Parse a single transaction row"""
+            builder.errors.append(f"File parsing error: {str(e)}")
+
+        if not remembered and len(builder.batch):
+            remember()
+        yield builder.take(bytes_read)
+
+    def _remember(self, layout: CSVLayout, column_mapping: Dict[str, str],
+                  date_format: Optional[str] = None, amount_format: Optional[AmountFormat] = None):
+        """Record a mapping once it has produced valid rows"""
+        if self.mapping_registry:
+            self.mapping_registry.remember(layout, column_mapping, date_format, amount_format,
+                                           household_id=self.household_id)
+
+    def iter_csv_batches(self, file_path: Path, column_mapping: Optional[Dict[str, str]] = None,
+                         chunk_size: int = 50000, encoding: str = 'utf-8',
+                         date_format: Optional[str] = None,
+                         amount_format: Optional[AmountFormat] = None,
+                         keep_original_data: bool = False) -> Iterator[ImportChunk]:
+        """Columnar CSV parse: formats inferred once, whole chunks parsed at a time
+
+        The date format and amount convention are inferred from the first
+        chunk unless given or remembered for the file's layout, then every
+        chunk is parsed with vectorized pandas operations. Rows that fail
+        are reported as errors; only those rows are touched individually.
+        """
+        layout, column_mapping, profile = self.resolve_mapping(file_path, column_mapping, encoding)
+        if profile is not None:
+            date_format = date_format or profile.date_format
+            amount_format = amount_format or profile.amount_format
+        total_bytes = file_path.stat().st_size
+        remembered = False
+        # Several targets may read the same source column
+        source_columns = set(column_mapping.values())
+        rows_read = 0
+        bytes_read = 0
+
         try:
-            # Parse date
-            date_str = row.get('date')
-            if not date_str:
-                raise ValueError("Date is required")
-                
-            # Try different date formats
-            date_formats = [
-                '%Y-%m-%d',
-                '%m/%d/%Y',
-                '%d/%m/%Y',
-                '%Y/%m/%d',
-                '%m-%d-%Y',
-                '%d-%m-%Y'
-            ]
-            
-            parsed_date = None
-            for fmt in date_formats:
-                try:
-                    parsed_date = datetime.strptime(date_str.strip(), fmt)
-                    break
-                except ValueError:
-                    continue
-                    
-            if not parsed_date:
-                raise ValueError(f"Could not parse date: {date_str}")
-            
-            # Parse amount
-            amount_str = row.get('amount', '0')
+            with open(file_path, 'rb') as f:
+                reader = pd.read_csv(
+                    f, sep=layout.delimiter, dtype=str, keep_default_na=False, encoding=encoding,
+                    usecols=lambda column: column in source_columns, chunksize=chunk_size,
+                )
+
+                for raw in reader:
+                    row_numbers = np.arange(rows_read, rows_read + len(raw)) + 2  # header is row 1
+                    rows_read += len(raw)
+                    bytes_read = min(f.tell(), total_bytes)
+
+                    empty = pd.Series('', index=raw.index)
+                    mapped = {
+                        target: raw[source] if source in raw else empty
+                        for target, source in column_mapping.items()
+                    }
+                    dates_text = mapped.get('date', empty)
+                    amounts_text = mapped.get('amount', empty)
+
+                    if date_format is None:
+                        date_format = infer_date_format(dates_text.tolist())
+                    if amount_format is None:
+                        amount_format = infer_amount_format(amounts_text.tolist())
+
+                    frame = pd.DataFrame({
+                        'import_row': row_numbers,
+                        'date': parse_dates_column(dates_text, date_format),
+                        'amount': parse_amounts_column(amounts_text, amount_format),
+                        'description': mapped.get('description', empty).str.strip(),
+                    }, index=raw.index)
+                    for column in TEXT_FIELDS:
+                        if column in mapped:
+                            frame[column] = mapped[column].str.strip()
+
+                    no_date = dates_text.str.strip() == ''
+                    bad_date = frame['date'].isna()
+                    no_amount = (amounts_text.str.strip() == '') & ~bad_date
+                    bad_amount = frame['amount'].isna() & ~bad_date
+                    bad_description = (frame['description'] == '') & ~bad_date & ~bad_amount
+
+                    errors = [f"Row {row}: Date is required" for row in row_numbers[no_date.to_numpy()]]
+                    errors += [
+                        f"Row {row}: Could not parse date: {value}"
+                        for row, value in zip(row_numbers[(bad_date & ~no_date).to_numpy()],
+                                              dates_text[bad_date & ~no_date])
+                    ]
+                    errors += [f"Row {row}: Amount is required" for row in row_numbers[no_amount.to_numpy()]]
+                    errors += [
+                        f"Row {row}: Could not parse amount: {value}"
+                        for row, value in zip(row_numbers[(bad_amount & ~no_amount).to_numpy()],
+                                              amounts_text[bad_amount & ~no_amount])
+                    ]
+                    errors += [f"Row {row}: Description is required" for row in row_numbers[bad_description.to_numpy()]]
+
+                    valid = ~(bad_date | bad_amount | bad_description)
+                    batch = ImportBatch.from_frame(frame[valid])
+                    if keep_original_data:
+                        originals = pd.DataFrame(mapped)[valid].to_dict('records')
+                        batch.sparse_metadata = {
+                            i: {'original_data': original} for i, original in enumerate(originals)
+                        }
+                    if not remembered and len(batch):
+                        self._remember(layout, column_mapping, date_format, amount_format)
+                        remembered = True
+
+                    yield ImportChunk(
+                        batch=batch,
+                        errors=errors,
+                        rows_read=rows_read,
+                        bytes_read=bytes_read,
+                        total_bytes=total_bytes,
+                        date_format=date_format,
+                        amount_format=amount_format,
+                    )
+        except Exception as e:
+            yield ImportChunk(
+                batch=ImportBatch.empty(),
+                errors=[f"File parsing error: {str(e)}"],
+                rows_read=rows_read,
+                bytes_read=bytes_read,
+                total_bytes=total_bytes,
+                date_format=date_format,
+                amount_format=amount_format,
+            )
+
+    def _parse_transaction_row(self, row: Dict[str, Any], row_num: int,
+                               keep_original_data: bool = True,
+                               date_format: Optional[str] = None,
+                               amount_format: Optional[AmountFormat] = None) -> Dict[str, Any]:
+        """Parse a single transaction row into ImportBatchBuilder fields
+
+        Raises ValueError with a row-level message on bad input.
+        """
+        # Parse date
+        date_str = row.get('date')
+        if not date_str:
+            raise ValueError("Date is required")
+
+        # Try the layout's known format first, then the others
+        parsed_date = None
+        for fmt in ([date_format] + DATE_FORMATS if date_format else DATE_FORMATS):
             try:
-                amount = float(amount_str.replace(',', '').replace('$', ''))
+                parsed_date = datetime.strptime(date_str.strip(), fmt)
+                break
             except ValueError:
-                raise ValueError(f"Could not parse amount: {amount_str}")
-            
-            # Get description
-            description = row.get('description', '').strip()
-            if not description:
-                raise ValueError("Description is required")
-            
-            # Build transaction
-            transaction = ImportedTransaction(
-                date=parsed_date,
-                amount=amount,
-                description=description,
-                currency=row.get('currency', 'USD'),
-                merchant_name=row.get('merchant_name'),
-                category=row.get('category'),
-                account_name=row.get('account_name'),
-                reference=row.get('reference'),
-                metadata={
-                    'import_row': row_num,
-                    'original_data': row
-                }
-            )
-            
-            return transaction
-            
-        except Exception as e:
-            logger.error(f"Error parsing row {row_num}: {e}")
-            return None
-    
+                continue
+
+        if not parsed_date:
+            raise ValueError(f"Could not parse date: {date_str}")
+
+        # Parse amount
+        amount_str = (row.get('amount') or '').strip()
+        if not amount_str:
+            raise ValueError("Amount is required")
+        try:
+            if amount_format:
+                amount = parse_amount(amount_str, amount_format)
+            else:
+                amount = float(amount_str.replace(',', '').replace('$', ''))
+        except ValueError:
+            raise ValueError(f"Could not parse amount: {amount_str}")
+
+        # Get description
+        description = (row.get('description') or '').strip()
+        if not description:
+            raise ValueError("Description is required")
+
+        return {
+            'date': parsed_date,
+            'amount': amount,
+            'description': description,
+            'import_row': row_num,
+            'metadata': {'original_data': row} if keep_original_data else None,
+            **{field: row.get(field) or None for field in TEXT_FIELDS if field in row},
+        }
+
     def get_column_preview(self, file_path: Path, num_rows: int = 5) -> Dict[str, Any]:
-        """Get preview of CSV columns and sample data"""
+        """Get preview of CSV columns and sample data
+
+        When the layout is already known, the remembered mapping and formats
+        are included so the caller can import without asking again.
+        """
         try:
-            delimiter = self.detect_delimiter(file_path)
+            layout = self.sniff_layout(file_path)
             
             with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f, delimiter=delimiter)
+                reader = csv.DictReader(f, delimiter=layout.delimiter)
                 
                 # Get column names
                 columns = reader.fieldnames or []
@@ -174,11 +660,19 @@ class CSVImporter:
                         break
                     sample_rows.append(row)
                 
-                return {
+                preview = {
                     'columns': columns,
                     'sample_rows': sample_rows,
-                    'delimiter': delimiter
+                    'delimiter': layout.delimiter,
+                    'fingerprint': layout.fingerprint
                 }
+
+            profile = self.mapping_registry.get(layout, self.household_id) if self.mapping_registry else None
+            if profile is not None:
+                preview['column_mapping'] = profile.column_mapping
+                preview['date_format'] = profile.date_format
+                preview['amount_format'] = profile.amount_format.model_dump() if profile.amount_format else None
+            return preview
                 
         except Exception as e:
             logger.error(f"Error getting column preview: {e}")
@@ -189,69 +683,506 @@ class CSVImporter:
                 'error': str(e)
             }
 
+class OFXTokenizer:
+    """Incremental OFX tokenizer yielding (tag, value) events
+
+    Works for both SGML (OFX 1.x, unclosed leaf elements) and XML (OFX
+    2.x) because a leaf's value is simply the text up to the next tag.
+    Text is fed in blocks and only the unfinished tail is buffered, so
+    no document tree is ever built.
+    """
+
+    _TAG_RE = re.compile(r'<([^<>]+)>([^<]*)(?=<)')
+
+    def __init__(self):
+        self._buffer = ''
+
+    def feed(self, data: str) -> Iterator[Tuple[str, str]]:
+        self._buffer += data
+        end = 0
+        for match in self._TAG_RE.finditer(self._buffer):
+            end = match.end()
+            tag = match.group(1).strip()
+            if tag[0] in '?!':  # XML declaration, OFX PI, comments
+                continue
+            yield tag.split()[0].upper(), match.group(2).strip()
+        self._buffer = self._buffer[end:]
+
+    def close(self) -> Iterator[Tuple[str, str]]:
+        # The final tag has no successor, so flush it with a sentinel
+        yield from self.feed('<')
+        self._buffer = ''
+
 class OFXImporter:
     def __init__(self):
         self.supported_formats = ['.ofx', '.qfx']
+        self.block_size = 256 * 1024
     
     def parse_ofx(self, file_path: Path) -> ImportResult:
         """Parse OFX file"""
-        # TODO: Implement OFX parsing
-        # This would typically:
-        # 1. Parse OFX XML structure
-        # 2. Extract transaction data
-        # 3. Convert to ImportedTransaction format
-        
-        logger.warning("OFX parsing not yet implemented")
-        return ImportResult(
-            transactions=[],
-            errors=["OFX parsing not yet implemented"],
-            total_rows=0,
-            successful_rows=0
-        )
+        return collect_chunks(self.iter_ofx_chunks(file_path))
+
+    def _detect_encoding(self, file_path: Path) -> str:
+        with open(file_path, 'rb') as f:
+            header = f.read(1024)
+        if b'CHARSET:1252' in header or b'encoding="windows-1252"' in header.lower():
+            return 'cp1252'
+        return 'utf-8'
+
+    def iter_ofx_chunks(self, file_path: Path, chunk_size: int = 5000) -> Iterator[ImportChunk]:
+        """Stream STMTTRN records from an OFX/QFX file in fixed-size chunks"""
+        builder = ChunkBuilder(chunk_size, file_path.stat().st_size)
+        bytes_read = 0
+        ready: List[ImportChunk] = []
+
+        tokenizer = OFXTokenizer()
+        currency = 'USD'
+        account_id: Optional[str] = None
+        record: Optional[Dict[str, str]] = None
+
+        def handle(events: Iterator[Tuple[str, str]]):
+            nonlocal currency, account_id, record
+            for tag, value in events:
+                if tag == 'STMTTRN':
+                    record = {}
+                elif tag == '/STMTTRN':
+                    if record is not None:
+                        builder.rows_read += 1
+                        try:
+                            builder.add(self._build_transaction(record, currency, account_id, builder.rows_read))
+                        except Exception as e:
+                            builder.errors.append(f"Transaction {builder.rows_read}: {str(e)}")
+                        # A block can hold many records, so cut chunks as they fill
+                        if builder.full:
+                            ready.append(builder.take(bytes_read))
+                    record = None
+                elif record is not None:
+                    if value and tag[0] != '/':
+                        record[tag] = value
+                elif tag == 'CURDEF' and value:
+                    currency = value
+                elif tag == 'ACCTID' and value:
+                    account_id = value
+
+        try:
+            decoder = codecs.getincrementaldecoder(self._detect_encoding(file_path))(errors='replace')
+            with open(file_path, 'rb') as f:
+                while True:
+                    block = f.read(self.block_size)
+                    if not block:
+                        break
+                    bytes_read += len(block)
+                    handle(tokenizer.feed(decoder.decode(block)))
+                    yield from ready
+                    ready.clear()
+
+                handle(tokenizer.feed(decoder.decode(b'', final=True)))
+                handle(tokenizer.close())
+                yield from ready
+                ready.clear()
+
+        except Exception as e:
+            builder.errors.append(f"File parsing error: {str(e)}")
+
+        yield builder.take(bytes_read)
+
+    def _build_transaction(self, record: Dict[str, str], currency: str,
+                           account_id: Optional[str], index: int) -> Dict[str, Any]:
+        """Map an STMTTRN aggregate to ImportBatchBuilder fields"""
+        posted = record.get('DTPOSTED') or record.get('DTUSER')
+        if not posted or len(posted) < 8:
+            raise ValueError(f"Missing or invalid DTPOSTED: {posted}")
+        date_digits = posted[:14] if posted[8:14].isdigit() else posted[:8]
+        parsed_date = datetime.strptime(date_digits, '%Y%m%d%H%M%S' if len(date_digits) == 14 else '%Y%m%d')
+
+        amount_str = record.get('TRNAMT')
+        if not amount_str:
+            raise ValueError("Missing TRNAMT")
+        amount = float(amount_str.replace(',', '.'))
+
+        name = html.unescape(record['NAME']) if 'NAME' in record else None
+        memo = html.unescape(record['MEMO']) if 'MEMO' in record else None
+        description = name or memo or record.get('TRNTYPE', '')
+        if not description:
+            raise ValueError("Description is required")
+
+        return {
+            'date': parsed_date,
+            'amount': amount,
+            'description': description,
+            'import_row': index,
+            'currency': record.get('CURSYM', currency),
+            'merchant_name': name,
+            'account_name': account_id,
+            'reference': record.get('FITID'),
+            'metadata': {
+                'trntype': record.get('TRNTYPE'),
+                'memo': memo,
+                'checknum': record.get('CHECKNUM'),
+            }
+        }
+
+def iter_file_lines(file_path: Path, encoding: str = 'utf-8') -> Iterator[Tuple[str, int]]:
+    """Yield decoded lines with the running count of bytes consumed"""
+    bytes_read = 0
+    with open(file_path, 'rb') as f:
+        for raw_line in f:
+            bytes_read += len(raw_line)
+            yield raw_line.decode(encoding, errors='replace').rstrip('\r\n'), bytes_read
+
+def parse_decimal_amount(value: str) -> float:
+    """Parse 1,234.56 / 1.234,56 / 1234,56 style amounts"""
+    value = value.strip().replace(' ', '')
+    if re.search(r',\d{1,2}$', value):
+        value = value.replace('.', '').replace(',', '.')
+    else:
+        value = value.replace(',', '')
+    return float(value)
 
 class QIFImporter:
+    # Account types whose records are cash transactions
+    TRANSACTION_TYPES = {'bank', 'cash', 'ccard', 'oth a', 'oth l'}
+    DATE_FORMATS = ['%m/%d/%Y', '%m/%d/%y', '%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y']
+
     def __init__(self):
         self.supported_formats = ['.qif']
     
     def parse_qif(self, file_path: Path) -> ImportResult:
         """Parse QIF file"""
-        # TODO: Implement QIF parsing
-        # This would typically:
-        # 1. Parse QIF format
-        # 2. Extract transaction data
-        # 3. Convert to ImportedTransaction format
-        
-        logger.warning("QIF parsing not yet implemented")
-        return ImportResult(
-            transactions=[],
-            errors=["QIF parsing not yet implemented"],
-            total_rows=0,
-            successful_rows=0
-        )
+        return collect_chunks(self.iter_qif_chunks(file_path))
+
+    def iter_qif_chunks(self, file_path: Path, chunk_size: int = 5000,
+                        encoding: str = 'utf-8') -> Iterator[ImportChunk]:
+        """Stream QIF records line by line, yielding fixed-size chunks
+
+        Split lines (S/E/$) are attached to their parent record as
+        ``metadata['splits']``; non-transaction sections such as
+        investment or category lists are skipped. Between
+        ``!Option:AutoSwitch`` and ``!Clear:AutoSwitch`` (or the next
+        ``!Type:`` header) the file lists accounts, several records long,
+        which do not select the current account.
+        """
+        builder = ChunkBuilder(chunk_size, file_path.stat().st_size)
+        bytes_read = 0
+        section = 'bank'
+        account_name: Optional[str] = None
+        in_account_block = False
+        in_account_list = False
+        record: Dict[str, Any] = {}
+
+        try:
+            for line, bytes_read in iter_file_lines(file_path, encoding):
+                if not line.strip():
+                    continue
+
+                if line.startswith('!'):
+                    header = line[1:].strip().lower()
+                    if header == 'option:autoswitch':
+                        in_account_list = True
+                    elif header == 'clear:autoswitch':
+                        in_account_list = False
+                    elif header == 'account':
+                        in_account_block = True
+                    elif header.startswith('type:'):
+                        section = header[5:].strip()
+                        in_account_block = in_account_list = False
+                    record = {}
+                    continue
+
+                code, value = line[0], line[1:].strip()
+
+                if in_account_list:
+                    continue
+
+                if in_account_block:
+                    if code == 'N':
+                        account_name = value
+                    elif code == '^':
+                        in_account_block = False
+                    continue
+
+                if section not in self.TRANSACTION_TYPES:
+                    continue
+
+                if code == '^':
+                    if record:
+                        builder.rows_read += 1
+                        try:
+                            builder.add(self._build_transaction(record, account_name, builder.rows_read))
+                        except Exception as e:
+                            builder.errors.append(f"Record {builder.rows_read}: {str(e)}")
+                    record = {}
+                    if builder.full:
+                        yield builder.take(bytes_read)
+                elif code == 'S':
+                    record.setdefault('splits', []).append({'category': value})
+                elif code == 'E' and record.get('splits'):
+                    record['splits'][-1]['memo'] = value
+                elif code == '$' and record.get('splits'):
+                    record['splits'][-1]['amount'] = parse_decimal_amount(value)
+                elif code in 'DTUPMNLC':
+                    record[code] = value
+
+        except Exception as e:
+            builder.errors.append(f"File parsing error: {str(e)}")
+
+        yield builder.take(bytes_read)
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _parse_qif_date(value: str) -> datetime:
+        # Statements repeat the same few dates, so parsed values are cached.
+        # Quicken writes 1/ 5'24 for 2024-01-05; normalize before strptime
+        normalized = value.replace("'", '/').replace(' ', '')
+        for fmt in QIFImporter.DATE_FORMATS:
+            try:
+                return datetime.strptime(normalized, fmt)
+            except ValueError:
+                continue
+        raise ValueError(f"Could not parse date: {value}")
+
+    def _build_transaction(self, record: Dict[str, Any], account_name: Optional[str],
+                           index: int) -> Dict[str, Any]:
+        if 'D' not in record:
+            raise ValueError("Date is required")
+        amount_str = record.get('T') or record.get('U')
+        if not amount_str:
+            raise ValueError("Amount is required")
+
+        payee = record.get('P')
+        description = payee or record.get('M') or ''
+        if not description:
+            raise ValueError("Description is required")
+
+        metadata: Dict[str, Any] = {}
+        if record.get('M'):
+            metadata['memo'] = record['M']
+        if record.get('C'):
+            metadata['cleared'] = record['C']
+        if record.get('splits'):
+            metadata['splits'] = record['splits']
+
+        return {
+            'date': self._parse_qif_date(record['D']),
+            'amount': parse_decimal_amount(amount_str),
+            'description': description,
+            'import_row': index,
+            'merchant_name': payee,
+            'category': record.get('L'),
+            'account_name': account_name,
+            'reference': record.get('N'),
+            'metadata': metadata
+        }
 
 class MT940Importer:
+    _FIELD_RE = re.compile(r'^:(\d{2}[A-Z]?):(.*)$')
+    _STATEMENT_LINE_RE = re.compile(
+        r'^(?P<value_date>\d{6})(?P<entry_date>\d{4})?(?P<mark>R?[DC])(?P<funds>[A-Z])?'
+        r'(?P<amount>\d+,\d*)(?P<type>[NFS][A-Z0-9]{3})(?P<customer_ref>[^/]*)(?://(?P<bank_ref>.*))?$'
+    )
+    _SUBFIELD_RE = re.compile(r'\?(\d{2})')
+
     def __init__(self):
         self.supported_formats = ['.sta', '.mt940']
     
     def parse_mt940(self, file_path: Path) -> ImportResult:
         """Parse MT940 file"""
-        # TODO: Implement MT940 parsing
-        # This would typically:
-        # 1. Parse SWIFT MT940 format
-        # 2. Extract transaction data
-        # 3. Convert to ImportedTransaction format
-        
-        logger.warning("MT940 parsing not yet implemented")
-        return ImportResult(
-            transactions=[],
-            errors=["MT940 parsing not yet implemented"],
-            total_rows=0,
-            successful_rows=0
+        return collect_chunks(self.iter_mt940_chunks(file_path))
+
+    def iter_mt940_chunks(self, file_path: Path, chunk_size: int = 5000,
+                          encoding: str = 'latin-1') -> Iterator[ImportChunk]:
+        """Stream :61:/:86: records from an MT940 file in fixed-size chunks
+
+        Fields may continue over several lines; a :61: statement line is
+        completed by the :86: narrative that follows it, if any.
+        """
+        builder = ChunkBuilder(chunk_size, file_path.stat().st_size)
+        bytes_read = 0
+        account: Optional[str] = None
+        currency = 'USD'
+        field_tag: Optional[str] = None
+        field_lines: List[str] = []
+        pending: Optional[Dict[str, Any]] = None
+
+        def emit_pending():
+            nonlocal pending
+            if pending is None:
+                return
+            builder.rows_read += 1
+            try:
+                builder.add(self._build_transaction(pending, account, currency, builder.rows_read))
+            except Exception as e:
+                builder.errors.append(f"Statement line {builder.rows_read}: {str(e)}")
+            pending = None
+
+        def close_field():
+            nonlocal account, currency, pending
+            if field_tag is None:
+                return
+            if field_tag == '25':
+                account = field_lines[0].strip()
+            elif field_tag in ('60F', '60M') and len(field_lines[0]) >= 10:
+                currency = field_lines[0][7:10]
+            elif field_tag == '61':
+                emit_pending()
+                pending = {'line': field_lines[0].strip(), 'supplementary': ' '.join(field_lines[1:]).strip()}
+            elif field_tag == '86' and pending is not None:
+                pending['narrative'] = field_lines
+                emit_pending()
+            elif field_tag.startswith('62'):
+                emit_pending()
+
+        try:
+            for line, bytes_read in iter_file_lines(file_path, encoding):
+                match = self._FIELD_RE.match(line)
+                if match:
+                    close_field()
+                    field_tag, field_lines = match.group(1), [match.group(2)]
+                elif line.strip() in ('-', '-}', '}') or line.startswith('{'):
+                    # End of message or SWIFT block wrapper
+                    close_field()
+                    emit_pending()
+                    field_tag, field_lines = None, []
+                elif field_tag is not None:
+                    field_lines.append(line)
+
+                if builder.full:
+                    yield builder.take(bytes_read)
+
+            close_field()
+            emit_pending()
+
+        except Exception as e:
+            builder.errors.append(f"File parsing error: {str(e)}")
+
+        yield builder.take(bytes_read)
+
+    def _parse_narrative(self, lines: List[str]) -> Tuple[str, Optional[str]]:
+        """Return (description, counterparty) from a :86: narrative
+
+        Structured narratives (?20-?29 purpose, ?32/?33 counterparty) are
+        decoded; free-text ones are joined as-is.
+        """
+        text = ''.join(lines) if any('?' in line for line in lines) else ' '.join(lines)
+        if not self._SUBFIELD_RE.search(text):
+            return ' '.join(text.split()), None
+
+        parts = self._SUBFIELD_RE.split(text)
+        subfields: Dict[str, str] = {}
+        for code, value in zip(parts[1::2], parts[2::2]):
+            subfields[code] = subfields.get(code, '') + value
+
+        purpose = ' '.join(
+            subfields[code].strip() for code in sorted(subfields)
+            if code.startswith('2') or code in ('60', '61', '62', '63')
         )
+        counterparty = ' '.join(subfields.get(code, '').strip() for code in ('32', '33')).strip() or None
+        description = purpose or counterparty or subfields.get('00', '').strip()
+        return description, counterparty
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _parse_value_date(value: str) -> datetime:
+        return datetime.strptime(value, '%y%m%d')
+
+    def _build_transaction(self, pending: Dict[str, Any], account: Optional[str],
+                           currency: str, index: int) -> Dict[str, Any]:
+        match = self._STATEMENT_LINE_RE.match(pending['line'])
+        if not match:
+            raise ValueError(f"Invalid :61: statement line: {pending['line']}")
+
+        amount = float(match.group('amount').replace(',', '.'))
+        mark = match.group('mark')
+        if mark in ('D', 'RC'):
+            amount = -amount
+
+        description, counterparty = self._parse_narrative(pending.get('narrative', []))
+        if not description:
+            description = pending['supplementary'] or match.group('customer_ref').strip()
+        if not description:
+            raise ValueError("Description is required")
+
+        return {
+            'date': self._parse_value_date(match.group('value_date')),
+            'amount': amount,
+            'description': description,
+            'import_row': index,
+            'currency': currency,
+            'merchant_name': counterparty,
+            'account_name': account,
+            'reference': (match.group('bank_ref') or match.group('customer_ref') or '').strip() or None,
+            'metadata': {
+                'transaction_type': match.group('type'),
+                'reversal': mark.startswith('R'),
+            }
+        }
+
+class FileImportTiming(BaseModel):
+    file_name: str
+    queued_seconds: float
+    parse_seconds: float
+    total_rows: int
+    successful_rows: int
+    duplicates_removed: int = 0
+
+class FileImportResult(BaseModel):
+    index: int  # position of the file in the caller's list
+    timing: FileImportTiming
+    result: ImportResult
+
+class BatchImportResult(BaseModel):
+    transactions: List[ImportedTransaction]
+    errors: List[str]
+    timings: List[FileImportTiming]
+    duplicates_removed: int
+    wall_seconds: float
+
+def _parse_file_in_worker(index: int, file_path: str, column_mapping: Optional[Dict[str, str]],
+                          submitted_at: float) -> FileImportResult:
+    """Process-pool entry point: parse one file and time it"""
+    started = time.time()
+    path = Path(file_path)
+    try:
+        # Files are already spread over the pool, so PDFs parse their pages serially
+        result = ImportManager(pdf_workers=1).parse_file(path, column_mapping)
+    except Exception as e:
+        result = ImportResult(transactions=[], errors=[f"{path.name}: {str(e)}"], total_rows=0, successful_rows=0)
+
+    return FileImportResult(
+        index=index,
+        timing=FileImportTiming(
+            file_name=path.name,
+            queued_seconds=max(0.0, started - submitted_at),
+            parse_seconds=time.time() - started,
+            total_rows=result.total_rows,
+            successful_rows=result.successful_rows,
+        ),
+        result=result
+    )
+
+def _transaction_key(transaction: ImportedTransaction) -> Tuple:
+    return (
+        transaction.account_name,
+        transaction.currency,
+        transaction.date.date(),
+        round(transaction.amount, 2),
+    )
+
+def _same_transaction(a: ImportedTransaction, b: ImportedTransaction) -> bool:
+    """Whether two rows with the same key are one transaction
+
+    Rows that both carry a reference (e.g. an OFX FITID) are compared on
+    it; otherwise on the normalized description.
+    """
+    if a.reference and b.reference:
+        return a.reference == b.reference
+    return ' '.join(a.description.lower().split()) == ' '.join(b.description.lower().split())
 
 class ImportManager:
-    def __init__(self):
-        self.csv_importer = CSVImporter()
+    def __init__(self, mapping_registry: Optional[ColumnMappingRegistry] = None,
+                 pdf_workers: Optional[int] = None, household_id: Optional[str] = None):
+        self.csv_importer = CSVImporter(mapping_registry, household_id)
+        self.pdf_workers = pdf_workers
         self.ofx_importer = OFXImporter()
         self.qif_importer = QIFImporter()
         self.mt940_importer = MT940Importer()
@@ -263,6 +1194,7 @@ class ImportManager:
         formats.extend(self.ofx_importer.supported_formats)
         formats.extend(self.qif_importer.supported_formats)
         formats.extend(self.mt940_importer.supported_formats)
+        formats.append('.pdf')
         return formats
     
     def parse_file(self, file_path: Path, column_mapping: Optional[Dict[str, str]] = None) -> ImportResult:
@@ -270,8 +1202,6 @@ class ImportManager:
         file_extension = file_path.suffix.lower()
         
         if file_extension in self.csv_importer.supported_formats:
-            if not column_mapping:
-                raise ValueError("Column mapping is required for CSV files")
             return self.csv_importer.parse_csv(file_path, column_mapping)
         
         elif file_extension in self.ofx_importer.supported_formats:
@@ -282,6 +1212,9 @@ class ImportManager:
         
         elif file_extension in self.mt940_importer.supported_formats:
             return self.mt940_importer.parse_mt940(file_path)
+
+        elif file_extension == '.pdf':
+            return self._parse_pdf(file_path)
         
         else:
             return ImportResult(
@@ -291,6 +1224,180 @@ class ImportManager:
                 successful_rows=0
             )
     
+    def _parse_pdf(self, file_path: Path) -> ImportResult:
+        """Parse a PDF statement into imported transactions"""
+        # Imported lazily: OCR and PDF dependencies are only needed for PDFs
+        from pdf_parser import PDFParser
+
+        parsed = PDFParser(max_workers=self.pdf_workers).parse_pdf(file_path)
+        builder = ImportBatchBuilder()
+        errors = list(parsed.errors)
+        for i, extracted in enumerate(parsed.transactions, start=1):
+            if extracted.date is None or extracted.amount is None:
+                errors.append(f"Line {i}: Missing date or amount: {extracted.description}")
+                continue
+            builder.append(
+                date=extracted.date,
+                amount=extracted.amount,
+                description=extracted.description,
+                import_row=i,
+                reference=extracted.reference,
+                metadata={**extracted.metadata, 'confidence': parsed.confidence}
+            )
+
+        transactions = builder.build().to_transactions()
+        return ImportResult(
+            transactions=transactions,
+            errors=errors,
+            total_rows=len(parsed.transactions),
+            successful_rows=len(transactions)
+        )
+
+    def expand_archive(self, archive_path: Path, target_dir: Path) -> List[Path]:
+        """Extract supported statement files from a ZIP upload"""
+        supported = set(self.get_supported_formats())
+        extracted = []
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                # Flatten paths so entries cannot escape target_dir
+                name = Path(info.filename).name
+                if info.is_dir() or not name or Path(name).suffix.lower() not in supported:
+                    continue
+                target = target_dir / f"{len(extracted):03d}_{name}"
+                with archive.open(info) as source, open(target, 'wb') as dest:
+                    while True:
+                        block = source.read(1024 * 1024)
+                        if not block:
+                            break
+                        dest.write(block)
+                extracted.append(target)
+        return extracted
+
+    def iter_parse_many(self, file_paths: List[Path],
+                        column_mapping: Optional[Dict[str, str]] = None,
+                        column_mappings: Optional[Dict[str, Dict[str, str]]] = None,
+                        max_workers: Optional[int] = None) -> Iterator[FileImportResult]:
+        """Parse files on a process pool, yielding each result as it finishes
+
+        ``column_mappings`` overrides ``column_mapping`` per file path for
+        CSV files; a bare file name matches any file with that name. CSV
+        files with neither get the mapping remembered for their layout,
+        looked up here since pool workers have no registry. Results carry
+        the file's index in ``file_paths``, since names may repeat.
+        """
+        if not file_paths:
+            return
+
+        overrides = column_mappings or {}
+        mappings: List[Optional[Dict[str, str]]] = []
+        for path in file_paths:
+            mapping = overrides.get(str(path), overrides.get(path.name, column_mapping))
+            if (mapping is None and self.csv_importer.mapping_registry
+                    and path.suffix.lower() in self.csv_importer.supported_formats):
+                try:
+                    mapping = self.csv_importer.resolve_mapping(path)[1]
+                except Exception:
+                    pass  # Reported by the worker as a missing mapping
+            mappings.append(mapping)
+        if max_workers is None:
+            max_workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        max_workers = max(1, min(max_workers, len(file_paths)))
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_parse_file_in_worker, index, str(path), mapping, time.time())
+                for index, (path, mapping) in enumerate(zip(file_paths, mappings))
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def parse_many(self, file_paths: List[Path],
+                   column_mapping: Optional[Dict[str, str]] = None,
+                   column_mappings: Optional[Dict[str, Dict[str, str]]] = None,
+                   max_workers: Optional[int] = None) -> BatchImportResult:
+        """Parse a set of statements in parallel and merge them
+
+        Overlapping statements repeat transactions, so a row is dropped when
+        an earlier file already contributed as many copies of the same
+        transaction: same account, currency, date and amount, and the same
+        reference when both rows have one, else the same description.
+        Repeats within one file are kept.
+        """
+        started = time.time()
+        results = list(self.iter_parse_many(file_paths, column_mapping, column_mappings, max_workers))
+
+        # Merge in the caller's file order so dedupe is deterministic
+        results.sort(key=lambda r: r.index)
+
+        # Rows kept from earlier files; each row of a later file can stand
+        # in for at most one of them
+        kept: Dict[Tuple, List[ImportedTransaction]] = {}
+        transactions: List[ImportedTransaction] = []
+        errors: List[str] = []
+        duplicates_removed = 0
+
+        for file_result in results:
+            errors.extend(f"{file_result.timing.file_name}: {error}" for error in file_result.result.errors)
+            unmatched: Dict[Tuple, List[ImportedTransaction]] = {}
+            added: List[Tuple[Tuple, ImportedTransaction]] = []
+            for transaction in file_result.result.transactions:
+                key = _transaction_key(transaction)
+                if key not in unmatched:
+                    unmatched[key] = list(kept.get(key, ()))
+                candidates = unmatched[key]
+                match = next((i for i, other in enumerate(candidates)
+                              if _same_transaction(transaction, other)), None)
+                if match is not None:
+                    del candidates[match]
+                    file_result.timing.duplicates_removed += 1
+                    continue
+                transactions.append(transaction)
+                added.append((key, transaction))
+            for key, transaction in added:
+                kept.setdefault(key, []).append(transaction)
+            duplicates_removed += file_result.timing.duplicates_removed
+
+        transactions.sort(key=lambda t: t.date)
+        return BatchImportResult(
+            transactions=transactions,
+            errors=errors,
+            timings=[r.timing for r in results],
+            duplicates_removed=duplicates_removed,
+            wall_seconds=time.time() - started
+        )
+
+    def iter_file_chunks(self, file_path: Path, column_mapping: Optional[Dict[str, str]] = None,
+                         chunk_size: int = 5000) -> Iterator[ImportChunk]:
+        """Parse a file as a stream of chunks that can be committed one by one"""
+        file_extension = file_path.suffix.lower()
+
+        if file_extension in self.csv_importer.supported_formats:
+            yield from self.csv_importer.iter_csv_batches(file_path, column_mapping, chunk_size)
+            return
+
+        if file_extension in self.ofx_importer.supported_formats:
+            yield from self.ofx_importer.iter_ofx_chunks(file_path, chunk_size)
+            return
+
+        if file_extension in self.qif_importer.supported_formats:
+            yield from self.qif_importer.iter_qif_chunks(file_path, chunk_size)
+            return
+
+        if file_extension in self.mt940_importer.supported_formats:
+            yield from self.mt940_importer.iter_mt940_chunks(file_path, chunk_size)
+            return
+
+        # Formats without a streaming parser are returned as a single chunk
+        result = self.parse_file(file_path, column_mapping)
+        total_bytes = file_path.stat().st_size if file_path.exists() else 0
+        yield ImportChunk(
+            batch=ImportBatch.from_transactions(result.transactions),
+            errors=result.errors,
+            rows_read=result.total_rows,
+            bytes_read=total_bytes,
+            total_bytes=total_bytes
+        )
+
     def get_file_preview(self, file_path: Path) -> Dict[str, Any]:
         """Get preview of file contents"""
         file_extension = file_path.suffix.lower()
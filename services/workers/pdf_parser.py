@@ -1,9 +1,14 @@
 # Created automatically by Cursor AI (2024-08-27)
 
+import asyncio
+import hashlib
 import logging
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple, Union
 from pathlib import Path
 import pytesseract
 from PIL import Image
@@ -11,6 +16,8 @@ import pdfplumber
 import pandas as pd
 from pydantic import BaseModel
 
+from pdf_templates import PageLayout, StatementTemplate, TemplateStore, detect_header_columns
+
 logger = logging.getLogger(__name__)
 
 class ExtractedTransaction(BaseModel):
@@ -30,26 +37,236 @@ class StatementInfo(BaseModel):
     closing_balance: Optional[float] = None
     institution_name: Optional[str] = None
 
+class OCRStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    seconds: float = 0.0  # Rendering, hashing and Tesseract time
+
+    def add(self, other: 'OCRStats'):
+        self.hits += other.hits
+        self.misses += other.misses
+        self.seconds += other.seconds
+
 class ParseResult(BaseModel):
     transactions: List[ExtractedTransaction]
     statement_info: StatementInfo
     errors: List[str]
     confidence: float
+    ocr_stats: OCRStats = OCRStats()
 
-class PDFParser:
-    def __init__(self):
-        self.date_patterns = [
-            r'\d{1,2}/\d{1,2}/\d{2,4}',
-            r'\d{4}-\d{2}-\d{2}',
-            r'\d{1,2}-\d{1,2}-\d{2,4}',
-            r'\d{1,2}\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{2,4}',
-        ]
-        
-        self.amount_patterns = [
-            r'[\$£€]?\s*[\d,]+\.?\d*',
-            r'[\d,]+\.?\d*\s*[\$£€]?',
+class OCRCache:
+    """OCR text keyed by a hash of the rendered page image
+
+    A re-uploaded statement, or an overlapping one that repeats a page,
+    renders to the same pixels, so Tesseract runs once per distinct page.
+    Entries live in memory and, when ``cache_dir`` is set, on disk so they
+    are shared by pool workers and survive restarts.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_memory_entries: int = 256):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self._memory: Dict[str, str] = {}
+
+    @staticmethod
+    def key(image: Any) -> str:
+        digest = hashlib.sha256(f"{image.mode}:{image.size}:".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        text = self._memory.get(key)
+        if text is None and self.cache_dir:
+            try:
+                path = self._path(key)
+                if path.exists():
+                    text = path.read_text(encoding='utf-8')
+                    self._remember(key, text)
+            except Exception as e:
+                logger.warning(f"Could not read OCR cache entry {key}: {e}")
+        return text
+
+    def put(self, key: str, text: str):
+        self._remember(key, text)
+        if self.cache_dir:
+            try:
+                path = self._path(key)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_text(text, encoding='utf-8')
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"Could not write OCR cache entry {key}: {e}")
+
+    def _remember(self, key: str, text: str):
+        if len(self._memory) >= self.max_memory_entries:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = text
+
+# Confidence of transactions by the extraction stage that produced them
+PAGE_SOURCE_CONFIDENCE = {'table': 0.9, 'text': 0.7, 'ocr': 0.3}
+
+class PageResult(BaseModel):
+    page_number: int
+    text: str = ""
+    has_tables: bool = False
+    transactions: List[ExtractedTransaction] = []
+    source: Optional[str] = None  # 'table', 'text' or 'ocr'
+    template: Optional[str] = None  # Fingerprint of the layout template used
+    ocr: Optional[OCRStats] = None  # Set only for OCR'd pages
+
+def _split_pages(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous [start, stop) ranges of near-equal size"""
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for part in range(parts):
+        stop = start + size + (1 if part < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def _extract_page_range(file_path: str, start: int, stop: int,
+                        ocr_cache_dir: Optional[str] = None,
+                        template_dir: Optional[str] = None) -> List[PageResult]:
+    """Process-pool entry point: open the document once and extract a page range"""
+    parser = PDFParser(max_workers=1, ocr_cache_dir=ocr_cache_dir, template_dir=template_dir)
+    with pdfplumber.open(file_path) as pdf:
+        return [
+            parser._extract_page(pdf.pages[index], index + 1)
+            for index in range(start, min(stop, len(pdf.pages)))
         ]
-        
+
+class StatementLineScanner:
+    """Single-pass tokenizer for statement text lines
+
+    One compiled pattern finds dates, money amounts and line breaks, so a
+    whole page is scanned with one ``finditer``. On each line the first
+    date is the transaction date; with two or more amounts the last is
+    the running balance and the one before it the transaction amount.
+    The description is what remains once those spans are cut out.
+    """
+
+    _TOKEN_RE = re.compile(r"""
+        (?=[\n\d(+\-$£€])  # cheap first-character filter before the alternatives
+        (?:
+        (?P<newline>\n)
+      | (?<![\d/\-.])(?P<date>
+            \d{4}-\d{2}-\d{2}
+          | \d{1,2}/\d{1,2}/\d{2,4}
+          | \d{1,2}-\d{1,2}-\d{2,4}
+          | \d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4}
+        )(?![\d/])
+      | (?<![\w.,/])(?P<amount>
+            \(?[-+]?\s?
+            (?: [$£€]\s?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{2})?
+              | (?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2}
+            )
+            (?:\)|-|\s?(?:CR|DR)\b)?
+        )(?![\d.,]\d)
+        )
+    """, re.VERBOSE)
+
+    _NON_DIGITS_RE = re.compile(r'[^\d.]')
+
+    def __init__(self, parse_date: Callable[[str], Optional[datetime]]):
+        self._parse_date = parse_date
+        self._dates: Dict[str, Optional[datetime]] = {}  # statements repeat few distinct dates
+
+    def scan(self, text: str) -> Iterator[ExtractedTransaction]:
+        """Yield one transaction per line that has a date or an amount"""
+        line_start = 0
+        date_match = None
+        amounts: List[re.Match] = []
+
+        for match in self._TOKEN_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == 'newline':
+                transaction = self._build(text, line_start, match.start(), date_match, amounts)
+                if transaction:
+                    yield transaction
+                line_start, date_match, amounts = match.end(), None, []
+            elif kind == 'date':
+                if date_match is None:
+                    date_match = match
+            else:
+                amounts.append(match)
+
+        transaction = self._build(text, line_start, len(text), date_match, amounts)
+        if transaction:
+            yield transaction
+
+    def scan_line(self, line: str) -> Optional[ExtractedTransaction]:
+        return next(self.scan(line), None)
+
+    def _build(self, text: str, start: int, end: int, date_match: Optional[re.Match],
+               amounts: List[re.Match]) -> Optional[ExtractedTransaction]:
+        if date_match is None and not amounts:
+            return None
+
+        amount_match = amounts[-2] if len(amounts) >= 2 else (amounts[0] if amounts else None)
+        balance_match = amounts[-1] if len(amounts) >= 2 else None
+
+        spans = [match.span() for match in (date_match, amount_match, balance_match) if match is not None]
+        spans.sort()
+        pieces, position = [], start
+        for span_start, span_end in spans:
+            pieces.append(text[position:span_start])
+            position = span_end
+        pieces.append(text[position:end])
+        description = ' '.join(' '.join(pieces).split())
+        if not description:
+            return None
+
+        date = self._date(date_match.group('date')) if date_match else None
+        amount = self.parse_amount(amount_match.group('amount')) if amount_match else None
+        if not date and amount is None:
+            return None
+
+        return ExtractedTransaction(
+            date=date,
+            description=description,
+            amount=amount,
+            balance=self.parse_amount(balance_match.group('amount')) if balance_match else None,
+            metadata={'source': 'text'}
+        )
+
+    def _date(self, value: str) -> Optional[datetime]:
+        if value not in self._dates:
+            self._dates[value] = self._parse_date(' '.join(value.split()))
+        return self._dates[value]
+
+    @staticmethod
+    def parse_amount(token: str) -> Optional[float]:
+        """Parse an amount token; (x), leading/trailing minus and DR are negative"""
+        try:
+            return float(token.replace(',', ''))  # plain 1,234.56 or -12.50
+        except ValueError:
+            pass
+        token = token.strip()
+        negative = token.startswith(('-', '(')) or token.endswith(('-', 'DR'))
+        try:
+            amount = float(StatementLineScanner._NON_DIGITS_RE.sub('', token))
+        except ValueError:
+            return None
+        return -amount if negative else amount
+
+class PDFParser:
+    def __init__(self, max_workers: Optional[int] = None, min_pages_per_worker: int = 4,
+                 ocr_cache_dir: Optional[Union[str, Path]] = None,
+                 template_dir: Optional[Union[str, Path]] = None):
+        self.max_workers = max_workers
+        self.min_pages_per_worker = max(1, min_pages_per_worker)
+        self.ocr_cache_dir = ocr_cache_dir or os.getenv('PDF_OCR_CACHE_DIR') or None
+        self.ocr_cache = OCRCache(self.ocr_cache_dir)
+        self.template_dir = template_dir or os.getenv('PDF_TEMPLATE_DIR') or None
+        self.template_store = TemplateStore(self.template_dir)
+        self.ocr_stats = OCRStats()  # Cumulative over every document parsed
+
+        self.line_scanner = StatementLineScanner(self._parse_date)
+
         self.account_patterns = [
             r'Account[:\s]*(\d{4}[\s*-]*\d{4}[\s*-]*\d{4}[\s*-]*\d{4})',
             r'Account[:\s]*(\d{10,16})',
@@ -62,83 +279,226 @@ class PDFParser:
         errors = []
         statement_info = StatementInfo()
         confidence = 0.0
+        ocr_stats = OCRStats()
         
         try:
-            # Try to extract text from PDF
-            text_content = self._extract_text_from_pdf(file_path)
-            
+            pages = self.extract_pages(file_path)
+
+            # Statement details can sit on any page, so scan the joined text
+            text_content = "".join(page.text + "\n" for page in pages if page.text)
             if text_content:
-                # Parse statement information
                 statement_info = self._extract_statement_info(text_content)
-                
-                # Try to extract transactions from tables
-                table_transactions = self._extract_from_tables(file_path)
-                if table_transactions:
-                    transactions.extend(table_transactions)
-                    confidence = 0.9
-                
-                # If no table data, try text parsing
-                if not transactions:
-                    text_transactions = self._extract_from_text(text_content)
-                    transactions.extend(text_transactions)
-                    confidence = 0.7
-                
-                # If still no transactions, try OCR
-                if not transactions:
-                    ocr_transactions = self._extract_with_ocr(file_path)
-                    transactions.extend(ocr_transactions)
-                    confidence = 0.5
-                    
-            else:
-                # Fallback to OCR
-                ocr_transactions = self._extract_with_ocr(file_path)
-                transactions.extend(ocr_transactions)
-                confidence = 0.3
+
+            page_confidences = []
+            for page in pages:
+                if page.ocr:
+                    ocr_stats.add(page.ocr)
+                if page.transactions:
+                    transactions.extend(page.transactions)
+                    page_confidences.append(self._page_confidence(page))
+
+            # A document is only as trustworthy as its weakest page
+            if page_confidences:
+                confidence = min(page_confidences)
                 
         except Exception as e:
             errors.append(f"PDF parsing error: {str(e)}")
             logger.error(f"Error parsing PDF {file_path}: {e}")
-        
+
+        self.ocr_stats.add(ocr_stats)
         return ParseResult(
             transactions=transactions,
             statement_info=statement_info,
             errors=errors,
-            confidence=confidence
+            confidence=confidence,
+            ocr_stats=ocr_stats
         )
 
-    def _extract_text_from_pdf(self, file_path: Path) -> str:
-        """Extract text content from PDF"""
-        text_content = ""
-        
+    def extract_pages(self, file_path: Path) -> List[PageResult]:
+        """Extract every page, fanning page ranges out to a process pool
+
+        Each worker opens the document once and handles one contiguous
+        range of pages; results come back in page order. Short documents
+        are handled in process on a single open.
+        """
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+            workers = self._worker_count(page_count)
+            if workers <= 1:
+                return [self._extract_page(page, number) for number, page in enumerate(pdf.pages, start=1)]
+
+        ranges = _split_pages(page_count, workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_extract_page_range, str(file_path), start, stop,
+                            str(self.ocr_cache_dir) if self.ocr_cache_dir else None,
+                            str(self.template_dir) if self.template_dir else None)
+                for start, stop in ranges
+            ]
+            return [page for future in futures for page in future.result()]
+
+    async def iter_parse_pdf(self, file_path: Path) -> AsyncIterator[Union[StatementInfo, PageResult]]:
+        """Stream a statement: StatementInfo once page 1 is done, then each page
+
+        Page 1 is extracted right away on a thread so a caller can show the
+        statement header and first transactions while the rest (including
+        any OCR) is still running. Remaining pages go through the process
+        pool in short ranges and are yielded in page order.
+        """
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(None, pdfplumber.open, file_path)
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_content += text + "\n"
-                        
+            page_count = len(pdf.pages)
+            if not page_count:
+                yield StatementInfo()
+                return
+
+            first = await loop.run_in_executor(None, self._extract_page, pdf.pages[0], 1)
+            yield self._extract_statement_info(first.text)
+            yield first
+
+            remaining = page_count - 1
+            workers = self._worker_count(remaining)
+            if workers <= 1:
+                for index in range(1, page_count):
+                    yield await loop.run_in_executor(None, self._extract_page, pdf.pages[index], index + 1)
+                return
+
+            # More ranges than workers so early pages arrive without waiting on late ones
+            ranges = [
+                (start + 1, stop + 1)
+                for start, stop in _split_pages(remaining, max(workers, remaining // self.min_pages_per_worker))
+            ]
+            # Not a context manager: its exit waits for running ranges and
+            # would block the event loop when the caller stops early
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = []
+            try:
+                futures = [
+                    loop.run_in_executor(
+                        pool, _extract_page_range, str(file_path), start, stop,
+                        str(self.ocr_cache_dir) if self.ocr_cache_dir else None,
+                        str(self.template_dir) if self.template_dir else None
+                    )
+                    for start, stop in ranges
+                ]
+                for future in futures:
+                    for page in await future:
+                        yield page
+            finally:
+                for future in futures:
+                    future.cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+        finally:
+            pdf.close()
+
+    def _worker_count(self, page_count: int) -> int:
+        max_workers = self.max_workers
+        if max_workers is None:
+            max_workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        return max(1, min(max_workers, page_count // self.min_pages_per_worker))
+
+    def _extract_page(self, page: Any, page_number: int, allow_ocr: bool = True) -> PageResult:
+        """Extract one page from its tables, else its text layer, else OCR
+
+        Tables of a layout seen before are read straight from the page's
+        words with the cached template; the generic table finder is the
+        fallback and teaches new templates. Only pages with neither a text
+        layer nor tables are OCR'd; a page whose text simply holds no
+        transactions (a cover or summary page) is not rasterized.
+        """
+        result = PageResult(page_number=page_number)
+
+        try:
+            result.text = page.extract_text() or ""
         except Exception as e:
-            logger.warning(f"Could not extract text from PDF: {e}")
-            
-        return text_content
+            logger.warning(f"Could not extract text from page {page_number}: {e}")
 
-    def _extract_from_tables(self, file_path: Path) -> List[ExtractedTransaction]:
-        """Extract transactions from PDF tables"""
-        transactions = []
-        
+        layout = self._page_layout(page, page_number) if result.text.strip() else None
+        template = self.template_store.get(layout.fingerprint) if layout else None
+        if template:
+            result.transactions = self._extract_with_template(layout, template)
+            if result.transactions:
+                result.source = 'table'
+                result.template = template.fingerprint
+                return result
+
+        tables = self._find_page_tables(page, page_number)
+        result.has_tables = bool(tables)
+        result.transactions = [transaction for _, rows in tables for transaction in self._parse_table(rows)]
+        if result.transactions:
+            result.source = 'table'
+            if layout and template is None:
+                self._learn_template(layout, tables)
+            return result
+
+        if result.text.strip():
+            result.transactions = self._extract_from_text(result.text)
+            if result.transactions:
+                result.source = 'text'
+            return result
+
+        if allow_ocr and not result.has_tables:
+            self._ocr_page(page, result)
+            if result.transactions:
+                result.source = 'ocr'
+        return result
+
+    @staticmethod
+    def _page_confidence(page: PageResult) -> float:
+        return PAGE_SOURCE_CONFIDENCE.get(page.source, 0.0)
+
+    def _find_page_tables(self, page: Any, page_number: int) -> List[Tuple[Any, List[List[str]]]]:
+        """Tables on one page with at least a header and one row, with their cell text"""
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    tables = page.extract_tables()
-                    
-                    for table in tables:
-                        if table and len(table) > 1:  # At least header + one row
-                            table_transactions = self._parse_table(table)
-                            transactions.extend(table_transactions)
-                            
+            tables = [(table, table.extract()) for table in page.find_tables()]
+            return [(table, rows) for table, rows in tables if rows and len(rows) > 1]
         except Exception as e:
-            logger.warning(f"Could not extract tables from PDF: {e}")
-            
+            logger.warning(f"Could not extract tables from page {page_number}: {e}")
+            return []
+
+    def _page_layout(self, page: Any, page_number: int) -> Optional[PageLayout]:
+        try:
+            return PageLayout.from_words(page.extract_words(), page.width, page.height)
+        except Exception as e:
+            logger.warning(f"Could not read the layout of page {page_number}: {e}")
+            return None
+
+    def _learn_template(self, layout: PageLayout, tables: List[Tuple[Any, List[List[str]]]]):
+        """Remember the column geometry of the first table that names its columns"""
+        for table, rows in tables:
+            template = StatementTemplate.learn(
+                layout.fingerprint,
+                header_cells=table.rows[0].cells,
+                headers=rows[0],
+                row_tops=[row.bbox[1] for row in table.rows],
+            )
+            if template:
+                self.template_store.put(template)
+                return
+
+    def _extract_with_template(self, layout: PageLayout, template: StatementTemplate) -> List[ExtractedTransaction]:
+        """Read table rows by the template's column x-ranges
+
+        A row without date or amount continues the previous description.
+        """
+        transactions: List[ExtractedTransaction] = []
+        for cells in template.iter_rows(layout):
+            date = self._parse_date(cells['date']) if cells.get('date') else None
+            amount = self._parse_amount(cells['amount']) if cells.get('amount') else None
+            description = cells.get('description', '')
+
+            if date or amount:
+                if description:
+                    transactions.append(ExtractedTransaction(
+                        date=date,
+                        description=description,
+                        amount=amount,
+                        balance=self._parse_amount(cells['balance']) if cells.get('balance') else None,
+                        metadata={'source': 'table'}
+                    ))
+            elif description and transactions:
+                transactions[-1].description += ' ' + description
         return transactions
 
     def _parse_table(self, table: List[List[str]]) -> List[ExtractedTransaction]:
@@ -149,26 +509,15 @@ class PDFParser:
             return transactions
         
         # Try to identify column headers
-        headers = table[0]
-        date_col = None
-        desc_col = None
-        amount_col = None
-        balance_col = None
-        
-        for i, header in enumerate(headers):
-            header_lower = header.lower() if header else ""
-            if any(word in header_lower for word in ['date', 'posted']):
-                date_col = i
-            elif any(word in header_lower for word in ['description', 'memo', 'payee', 'details']):
-                desc_col = i
-            elif any(word in header_lower for word in ['amount', 'debit', 'credit', 'withdrawal', 'deposit']):
-                amount_col = i
-            elif any(word in header_lower for word in ['balance', 'running']):
-                balance_col = i
+        columns = detect_header_columns(table[0])
+        date_col = columns.get('date')
+        desc_col = columns.get('description')
+        amount_col = columns.get('amount')
+        balance_col = columns.get('balance')
         
         # Process data rows
         for row in table[1:]:
-            if len(row) < max(filter(None, [date_col, desc_col, amount_col])):
+            if len(row) < max(filter(None, [date_col, desc_col, amount_col]), default=0):
                 continue
                 
             try:
@@ -228,91 +577,38 @@ class PDFParser:
         return None
 
     def _extract_from_text(self, text_content: str) -> List[ExtractedTransaction]:
-        """Extract transactions from text content"""
-        transactions = []
-        
-        # Split text into lines
-        lines = text_content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            try:
-                transaction = self._parse_text_line(line)
-                if transaction:
-                    transactions.append(transaction)
-            except Exception as e:
-                logger.debug(f"Error parsing text line: {e}")
-                continue
-                
-        return transactions
+        """Extract transactions from text content, a whole page at a time"""
+        try:
+            return list(self.line_scanner.scan(text_content))
+        except Exception as e:
+            logger.debug(f"Error parsing text: {e}")
+            return []
 
     def _parse_text_line(self, line: str) -> Optional[ExtractedTransaction]:
         """Parse a single text line for transaction data"""
-        try:
-            # Look for date patterns
-            date = None
-            for pattern in self.date_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    date = self._parse_date(match.group())
-                    break
-            
-            # Look for amount patterns
-            amount = None
-            for pattern in self.amount_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    amount = self._parse_amount(match.group())
-                    break
-            
-            # Extract description (everything except date and amount)
-            description = line
-            if date:
-                description = re.sub(self.date_patterns[0], '', description)
-            if amount:
-                description = re.sub(self.amount_patterns[0], '', description)
-            
-            description = re.sub(r'\s+', ' ', description).strip()
-            
-            # Only create transaction if we have essential data
-            if description and (date or amount):
-                return ExtractedTransaction(
-                    date=date,
-                    description=description,
-                    amount=amount,
-                    metadata={'source': 'text'}
-                )
-                
-        except Exception as e:
-            logger.debug(f"Error parsing text line: {e}")
-            
-        return None
+        return self.line_scanner.scan_line(line)
 
-    def _extract_with_ocr(self, file_path: Path) -> List[ExtractedTransaction]:
-        """Extract transactions using OCR"""
-        transactions = []
-        
+    def _ocr_page(self, page: Any, result: PageResult):
+        """Extract transactions from one page using OCR, through the OCR cache"""
+        started = time.perf_counter()
+        result.ocr = OCRStats()
         try:
-            # Convert PDF pages to images
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    # Convert page to image
-                    img = page.to_image()
-                    
-                    # Extract text using OCR
-                    ocr_text = pytesseract.image_to_string(img.original)
-                    
-                    # Parse OCR text
-                    ocr_transactions = self._extract_from_text(ocr_text)
-                    transactions.extend(ocr_transactions)
+            # Convert page to image; identical renders share one OCR run
+            image = page.to_image().original
+            key = self.ocr_cache.key(image)
+            ocr_text = self.ocr_cache.get(key)
+            if ocr_text is None:
+                result.ocr.misses = 1
+                ocr_text = pytesseract.image_to_string(image)
+                self.ocr_cache.put(key, ocr_text)
+            else:
+                result.ocr.hits = 1
+            result.transactions = self._extract_from_text(ocr_text)
                     
         except Exception as e:
-            logger.warning(f"OCR extraction failed: {e}")
-            
-        return transactions
+            logger.warning(f"OCR extraction failed on page {result.page_number}: {e}")
+
+        result.ocr.seconds = time.perf_counter() - started
 
     def _extract_statement_info(self, text_content: str) -> StatementInfo:
         """Extract statement information from text"""
@@ -386,20 +682,31 @@ class PDFParser:
         except ValueError:
             return None
 
-    def get_statement_preview(self, file_path: Path) -> Dict[str, Any]:
-        """Get preview of statement content"""
+    def get_statement_preview(self, file_path: Path, max_pages: int = 2) -> Dict[str, Any]:
+        """Get preview of statement content from its first pages only
+
+        No OCR is run, so the preview stays fast even for scanned statements.
+        """
         try:
-            # Extract first page text
             with pdfplumber.open(file_path) as pdf:
                 if pdf.pages:
-                    first_page = pdf.pages[0]
-                    text = first_page.extract_text()
+                    pages = [
+                        self._extract_page(page, number, allow_ocr=False)
+                        for number, page in enumerate(pdf.pages[:max_pages], start=1)
+                    ]
+                    text = pages[0].text
                     
                     # Get basic info
                     info = {
                         'page_count': len(pdf.pages),
                         'first_page_text': text[:1000] if text else "",  # First 1000 chars
-                        'has_tables': len(first_page.extract_tables()) > 0,
+                        'has_tables': pages[0].has_tables or pages[0].template is not None,
+                        'statement_info': self._extract_statement_info(
+                            "".join(page.text + "\n" for page in pages)
+                        ).model_dump(),
+                        'sample_transactions': [
+                            transaction.model_dump() for page in pages for transaction in page.transactions
+                        ][:10],
                     }
                     
                     return info
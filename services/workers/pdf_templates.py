@@ -0,0 +1,169 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Header words identifying each statement column, checked in this order
+HEADER_KEYWORDS = {
+    'date': ['date', 'posted'],
+    'description': ['description', 'memo', 'payee', 'details'],
+    'amount': ['amount', 'debit', 'credit', 'withdrawal', 'deposit'],
+    'balance': ['balance', 'running'],
+}
+
+def classify_header(text: Optional[str]) -> Optional[str]:
+    """Column a header cell or word names, if any"""
+    lower = text.lower() if text else ""
+    for column, words in HEADER_KEYWORDS.items():
+        if any(word in lower for word in words):
+            return column
+    return None
+
+def detect_header_columns(headers: List[Optional[str]]) -> Dict[str, int]:
+    """Map column names to header cell indexes; a later cell wins"""
+    columns = {}
+    for index, header in enumerate(headers):
+        column = classify_header(header)
+        if column:
+            columns[column] = index
+    return columns
+
+def group_lines(words: List[Dict[str, Any]], tolerance: float) -> List[List[Dict[str, Any]]]:
+    """Cluster pdfplumber words into visual lines by their top coordinate"""
+    lines: List[List[Dict[str, Any]]] = []
+    line_top = None
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if line_top is None or word['top'] - line_top > tolerance:
+            lines.append([])
+            line_top = word['top']
+        lines[-1].append(word)
+    return [sorted(line, key=lambda w: w['x0']) for line in lines]
+
+class PageLayout:
+    """A page's words grouped into lines, with the table header located"""
+
+    def __init__(self, lines: List[List[Dict[str, Any]]], header_index: int, fingerprint: str):
+        self.lines = lines
+        self.header_index = header_index
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_words(cls, words: List[Dict[str, Any]], width: float, height: float,
+                   tolerance: float = 3.0) -> Optional['PageLayout']:
+        """Fingerprint a page by issuer text, geometry and header tokens
+
+        Returns None when no line names at least two statement columns.
+        """
+        lines = group_lines(words, tolerance)
+        header_index = next(
+            (index for index, line in enumerate(lines)
+             if len({classify_header(word['text']) for word in line} - {None}) >= 2),
+            None
+        )
+        if header_index is None:
+            return None
+
+        # The issuer is the first line above the header; digits (dates,
+        # page numbers, account numbers) vary between statements
+        issuer = ' '.join(word['text'] for word in lines[0]) if header_index else ''
+        issuer = ' '.join(re.sub(r'[^a-z ]', ' ', issuer.lower()).split())
+        header = ' '.join(word['text'].lower() for word in lines[header_index])
+        key = f"{issuer}|{round(width)}x{round(height)}|{header}"
+        return cls(lines, header_index, hashlib.sha256(key.encode()).hexdigest()[:32])
+
+class StatementTemplate(BaseModel):
+    """Learned column x-ranges and row spacing for one statement layout"""
+    fingerprint: str
+    columns: Dict[str, Tuple[float, float]]
+    row_gap: float
+
+    def column_for(self, word: Dict[str, Any], slack: float = 2.0) -> Optional[str]:
+        center = (word['x0'] + word['x1']) / 2
+        for name, (x0, x1) in self.columns.items():
+            if x0 - slack <= center <= x1 + slack:
+                return name
+        return None
+
+    def iter_rows(self, layout: PageLayout) -> Iterator[Dict[str, str]]:
+        """Yield the text of each column for the lines below the header
+
+        The table is taken to end at the first vertical gap much larger
+        than the learned row spacing, which keeps footers out.
+        """
+        last_top = layout.lines[layout.header_index][0]['top']
+        for line in layout.lines[layout.header_index + 1:]:
+            top = line[0]['top']
+            if top - last_top > self.row_gap * 2.5:
+                break
+            last_top = top
+
+            cells: Dict[str, List[str]] = {name: [] for name in self.columns}
+            for word in line:
+                column = self.column_for(word)
+                if column:
+                    cells[column].append(word['text'])
+            yield {name: ' '.join(parts) for name, parts in cells.items()}
+
+    @classmethod
+    def learn(cls, fingerprint: str, header_cells: List[Optional[Tuple[float, float, float, float]]],
+              headers: List[Optional[str]], row_tops: List[float]) -> Optional['StatementTemplate']:
+        """Build a template from a table the generic extractor parsed
+
+        ``header_cells`` are the header row's cell bboxes and ``row_tops``
+        the top coordinate of every table row.
+        """
+        indexes = detect_header_columns(headers)
+        if 'date' not in indexes or 'amount' not in indexes or len(row_tops) < 2:
+            return None
+
+        columns = {
+            name: (header_cells[index][0], header_cells[index][2])
+            for name, index in indexes.items()
+            if index < len(header_cells) and header_cells[index]
+        }
+        gaps = [below - above for above, below in zip(row_tops, row_tops[1:]) if below > above]
+        if not gaps:
+            return None
+        return cls(fingerprint=fingerprint, columns=columns, row_gap=median(gaps))
+
+class TemplateStore:
+    """Statement templates by layout fingerprint
+
+    Held in memory and, when ``store_dir`` is set, as JSON files so pool
+    workers and later imports of the same bank's statements share them.
+    """
+
+    def __init__(self, store_dir: Optional[Path] = None):
+        self.store_dir = Path(store_dir) if store_dir else None
+        self._templates: Dict[str, StatementTemplate] = {}
+
+    def get(self, fingerprint: str) -> Optional[StatementTemplate]:
+        template = self._templates.get(fingerprint)
+        if template is None and self.store_dir:
+            path = self.store_dir / f"{fingerprint}.json"
+            try:
+                if path.exists():
+                    template = StatementTemplate.model_validate_json(path.read_text())
+                    self._templates[fingerprint] = template
+            except Exception as e:
+                logger.warning(f"Could not load statement template {fingerprint}: {e}")
+        return template
+
+    def put(self, template: StatementTemplate):
+        self._templates[template.fingerprint] = template
+        if self.store_dir:
+            try:
+                self.store_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.store_dir / f"{template.fingerprint}.{os.getpid()}.tmp"
+                tmp_path.write_text(template.model_dump_json())
+                os.replace(tmp_path, self.store_dir / f"{template.fingerprint}.json")
+            except Exception as e:
+                logger.warning(f"Could not save statement template {template.fingerprint}: {e}")
@@ -0,0 +1,147 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Async token bucket limiting how often a provider may be called"""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+@dataclass
+class SyncStats:
+    """Point-in-time view of the scheduler"""
+    queue_depth: int
+    in_flight: int
+    completed: int
+    failed: int
+    coalesced: int
+    queue_depth_by_provider: Dict[str, int] = field(default_factory=dict)
+
+class SyncScheduler:
+    """Runs connection syncs concurrently with per-provider rate limits
+
+    At most ``max_concurrency`` syncs run at once and each provider is
+    throttled by its own token bucket, so a slow or rate-limited provider
+    never holds up connections at other providers. A sync requested while
+    one for the same connection is already queued joins the queued run;
+    one requested while it is running queues exactly one follow-up run.
+    """
+
+    def __init__(self, sync_fn: Callable[[str], Awaitable[None]],
+                 max_concurrency: int = 10,
+                 provider_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 default_limit: Tuple[float, int] = (2.0, 5)):
+        self.sync_fn = sync_fn
+        self.max_concurrency = max_concurrency
+        self.provider_limits = provider_limits or {}
+        self.default_limit = default_limit
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._pending: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._running: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            rate, capacity = self.provider_limits.get(provider, self.default_limit)
+            bucket = TokenBucket(rate, capacity)
+            self._buckets[provider] = bucket
+        return bucket
+
+    def submit(self, connection_id: str, provider: str = 'default') -> asyncio.Future:
+        """Queue a sync and return a future resolved when it completes"""
+        queued = self._pending.get(connection_id)
+        if queued is not None:
+            self.coalesced += 1
+            return queued[1]
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[connection_id] = (provider, future)
+
+        task = asyncio.create_task(self._run(connection_id, provider, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return future
+
+    async def _run(self, connection_id: str, provider: str, future: asyncio.Future):
+        # Never run two syncs of the same connection at once
+        previous = self._running.get(connection_id)
+        if previous is not None:
+            await asyncio.wait({previous})
+
+        await self._bucket(provider).acquire()
+        async with self._semaphore:
+            # From here on new requests queue a follow-up run instead of joining
+            self._pending.pop(connection_id, None)
+            self._running[connection_id] = future
+            try:
+                await self.sync_fn(connection_id)
+                self.completed += 1
+                future.set_result(None)
+            except Exception as e:
+                logger.error(f"Sync failed for connection {connection_id}: {e}")
+                self.failed += 1
+                future.set_exception(e)
+            finally:
+                if self._running.get(connection_id) is future:
+                    del self._running[connection_id]
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    def get_stats(self) -> SyncStats:
+        by_provider: Dict[str, int] = {}
+        for provider, _ in self._pending.values():
+            by_provider[provider] = by_provider.get(provider, 0) + 1
+
+        return SyncStats(
+            queue_depth=self.queue_depth,
+            in_flight=self.in_flight,
+            completed=self.completed,
+            failed=self.failed,
+            coalesced=self.coalesced,
+            queue_depth_by_provider=by_provider,
+        )
+
+    async def drain(self):
+        """Wait for every queued and running sync to finish"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
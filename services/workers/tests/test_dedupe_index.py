@@ -0,0 +1,47 @@
+# Created automatically by Cursor AI (2026-10-16)
+import asyncio
+import os
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+def test_bloom_filter_has_no_false_negatives():
+    from dedupe_index import BloomFilter
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"hash-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+def test_dedupe_index_snapshot_roundtrip(tmp_path):
+    from dedupe_index import DedupeIndex
+    index = DedupeIndex(snapshot_dir=tmp_path, capacity_per_day=10)
+    for i in range(25):  # overflows into several filters for the day
+        index.add("acct-1", f"hash-{i}")
+    asyncio.run(index.save_snapshots())
+
+    restored = DedupeIndex(snapshot_dir=tmp_path, capacity_per_day=10)
+    asyncio.run(restored.load_accounts(["acct-1", "acct-2"]))
+    assert all(restored.might_contain("acct-1", f"hash-{i}") for i in range(25))
+    assert not restored.might_contain("acct-2", "hash-0")
+
+def test_dedupe_index_evicts_saved_filters_beyond_max_accounts(tmp_path):
+    from dedupe_index import DedupeIndex
+    index = DedupeIndex(snapshot_dir=tmp_path, max_accounts=2)
+    for account in ("acct-1", "acct-2", "acct-3"):
+        index.add(account, f"{account}-hash")
+    assert len(index.filters) == 3  # nothing is dropped before it is saved
+
+    asyncio.run(index.save_snapshots())
+    assert list(index.filters) == ["acct-2", "acct-3"]
+
+    # A dropped account is reloaded from its snapshot on next use
+    asyncio.run(index.load_accounts(["acct-1"]))
+    assert index.might_contain("acct-1", "acct-1-hash")
+    index.add("acct-1", "acct-1-more")
+    asyncio.run(index.save_snapshots())
+    assert list(index.filters) == ["acct-3", "acct-1"]
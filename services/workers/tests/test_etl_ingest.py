@@ -0,0 +1,163 @@
+# Created automatically by Cursor AI (2026-10-16)
+import asyncio
+import os
+from datetime import datetime, timedelta
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+class FakeConnection:
+    """Stand-in for an asyncpg connection with a session-private staging table
+
+    ``table`` is the shared transactions table keyed by ``key``; COPY fills
+    the session's staging rows and the merging INSERT skips conflicting keys
+    the way ``ON CONFLICT DO NOTHING`` does.
+    """
+
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+        self.staging = None
+        self.executed = []
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.staging is not None:
+            self.staging.clear()  # ON COMMIT DELETE ROWS
+
+    async def execute(self, query, *args):
+        self.executed.append(query)
+        if 'CREATE TEMP TABLE' in query:
+            self.staging = []
+
+    async def copy_records_to_table(self, table, records, columns):
+        assert table == 'transactions_ingest_staging' and self.staging is not None
+        self.staging.extend(dict(zip(columns, record)) for record in records)
+
+    async def fetchval(self, query, *args):
+        assert 'ON CONFLICT (account_id, external_id, date)' in query
+        row = dict(zip(['id', 'account_id', 'external_id', 'amount', 'currency',
+                        'description', 'merchant_name', 'date', 'metadata'], args))
+        key = tuple(row[column] for column in self.key)
+        if key in self.table:
+            return None
+        self.table[key] = row
+        return row['id']
+
+    async def fetch(self, query, *args):
+        if query.strip().startswith('SELECT account_id, external_id, date'):
+            accounts, external_ids, dates = args
+            return [row for row in self.table.values()
+                    if row['account_id'] in accounts and row['external_id'] in external_ids
+                    and row['date'] in dates]
+        assert 'ON CONFLICT (account_id, external_id, date)' in query and 'RETURNING id' in query
+        inserted = []
+        for row in self.staging:
+            key = tuple(row[column] for column in self.key)
+            if key not in self.table:
+                self.table[key] = row
+                inserted.append({'id': row['id']})
+        return inserted
+
+class FakePool:
+    def __init__(self, worker, key=('account_id', 'external_id', 'date'), table=None):
+        self.table = {} if table is None else table
+        self.connection = FakeConnection(self.table, key)
+        asyncio.run(worker._init_connection(self.connection))
+
+    def acquire(self):
+        return self.connection
+
+class FakeNats:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, subject, data):
+        self.published.append(subject)
+
+    async def flush(self):
+        pass
+
+def transaction(i, external_id=None):
+    from etl_worker import TransactionData
+    return TransactionData(
+        id=f"tx-{i}", account_id="acct-1", external_id=external_id or f"ext-{i}", amount=-10.0 - i,
+        currency="USD", description="Card purchase", date=datetime(2024, 3, 1) + timedelta(minutes=i),
+    )
+
+def ingest_worker(table=None):
+    from dedupe_index import DedupeIndex
+    from etl_worker import ETLWorker
+    worker = ETLWorker()
+    worker.dedupe_index = DedupeIndex()
+    worker.nats_client = FakeNats()
+    worker.db_pool = FakePool(worker, table=table)
+    return worker
+
+def test_ingest_batch_copies_and_returns_inserted_ids():
+    worker = ingest_worker()
+    batch = [transaction(i) for i in range(5)]
+    stats = asyncio.run(worker.ingest_batch(batch))
+
+    assert (stats.batch_size, stats.inserted, stats.duplicates, stats.failed) == (5, 5, 0, 0)
+    assert sorted(row['id'] for row in worker.db_pool.table.values()) == [tx.id for tx in batch]
+    assert worker.nats_client.published == ['tx.upsert'] * 5
+    # The staging table comes from the connection's init, not from every batch
+    assert sum('CREATE TEMP TABLE' in query for query in worker.db_pool.connection.executed) == 1
+
+def test_ingest_batch_counts_partial_duplicates():
+    worker = ingest_worker()
+    asyncio.run(worker.ingest_batch([transaction(i) for i in range(3)]))
+
+    # Already stored by another worker: unknown to this index, caught by ON CONFLICT
+    other = transaction(3)
+    worker.db_pool.table[(other.account_id, other.external_id, other.date)] = {
+        'id': other.id, 'account_id': other.account_id, 'external_id': other.external_id,
+    }
+    worker.nats_client.published.clear()
+
+    batch = [transaction(0), transaction(1), other, transaction(4), transaction(4), transaction(5)]
+    stats = asyncio.run(worker.ingest_batch(batch))
+
+    # tx-0/tx-1 are known to the index, tx-4 repeats within the batch,
+    # tx-3 conflicts on insert; only tx-4 and tx-5 are new
+    assert (stats.batch_size, stats.inserted, stats.duplicates, stats.failed) == (6, 2, 4, 0)
+    assert stats.inserted + stats.duplicates + stats.failed == stats.batch_size
+    assert worker.nats_client.published == ['tx.upsert'] * 2
+
+def test_replicas_do_not_insert_rows_stored_by_each_other():
+    from etl_worker import TransactionData
+    table = {}
+    first, second = ingest_worker(table), ingest_worker(table)
+    asyncio.run(first.ingest_batch([transaction(i) for i in range(4)]))
+
+    # Same provider rows under fresh ids; the second replica's index has
+    # never seen them and answers "new"
+    redelivered = [transaction(i).model_copy(update={'id': f"retry-{i}"}) for i in range(4)]
+    stats = asyncio.run(second.ingest_batch(redelivered))
+    assert (stats.inserted, stats.duplicates) == (0, 4)
+    assert len(table) == 4 and not second.nats_client.published
+
+    # A re-sent id with a corrected date is a new row even when the index
+    # answers "maybe" for it
+    corrected = transaction(0).model_copy(update={'id': "corrected-0",
+                                                   'date': transaction(0).date + timedelta(days=1)})
+    batch = [corrected, redelivered[1]]
+    hashes = [second.generate_transaction_hash(tx) for tx in batch]
+    for tx, transaction_hash in zip(batch, hashes):
+        second.dedupe_index.add(tx.account_id, transaction_hash)
+    assert asyncio.run(second.find_duplicates(batch, hashes)) == [False, True]
+
+    # The per-row path skips them as well
+    second.dedupe_index = type(second.dedupe_index)()
+    asyncio.run(second.process_transactions([
+        TransactionData(**dict(redelivered[0].model_dump(), id="retry-again")), transaction(9)
+    ]))
+    assert len(table) == 5 and second.nats_client.published == ['tx.upsert']
@@ -0,0 +1,227 @@
+# Created automatically by Cursor AI (2026-10-16)
+import asyncio
+import json
+import os
+from decimal import Decimal
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+QUOTES = [
+    ('EUR', 'USD', 1.1),
+    ('EUR', 'JPY', 160.0),   # only quoted against EUR
+    ('USD', 'GBP', 0.8),     # only quoted against USD
+]
+
+def test_matrix_triangulates_missing_pairs_through_pivots():
+    from fx_rates import FXRateMatrix
+    matrix = FXRateMatrix.from_quotes(QUOTES)
+    assert matrix.rate('USD', 'EUR') == pytest.approx(1 / 1.1)
+    assert matrix.rate('GBP', 'EUR') == pytest.approx(1 / 0.8 / 1.1)
+    # GBP -> USD -> EUR -> JPY needs both pivots
+    assert matrix.rate('GBP', 'JPY') == pytest.approx(1 / 0.8 / 1.1 * 160.0)
+    assert matrix.convert(100.0, 'JPY', 'GBP') == pytest.approx(100 / 160.0 * 1.1 * 0.8)
+    assert matrix.rate('USD', 'XYZ') is None
+
+def test_engine_swaps_matrix_on_fx_update():
+    from fx_rates import FXRateEngine
+
+    class Msg:
+        data = json.dumps({"quotes": [['EUR', 'USD', 1.25]], "as_of": "2026-10-16T00:00:00"}).encode()
+
+    engine = FXRateEngine()
+    engine.update(QUOTES)
+    before = engine.matrix
+    asyncio.run(engine.handle_update_message(Msg()))
+    assert engine.rate('EUR', 'USD') == 1.25
+    assert engine.rate('EUR', 'JPY') is None
+    assert before.rate('EUR', 'USD') == 1.1  # readers holding the old snapshot are unaffected
+
+def test_engine_seeds_from_stored_rates_when_the_cache_has_expired():
+    from datetime import date, datetime
+    from fx_rates import FXRateEngine
+
+    class StoredRates:
+        async def fetch(self, query):
+            assert 'DISTINCT ON (base_currency, target_currency)' in query
+            return [
+                {'base_currency': 'EUR', 'target_currency': 'USD', 'rate': Decimal('1.1'), 'rate_date': date(2024, 1, 8)},
+                {'base_currency': 'USD', 'target_currency': 'GBP', 'rate': Decimal('0.8'), 'rate_date': date(2024, 1, 5)},
+            ]
+
+    class CachedRates:
+        def __init__(self, rates):
+            self.rates = {f"fx:rate:{base}:{target}": json.dumps({'rate': rate}) for base, target, rate in rates}
+
+        async def scan_iter(self, match):
+            for key in self.rates:
+                yield key
+
+        async def mget(self, keys):
+            return [self.rates[key] for key in keys]
+
+    # Worker started long after the daily update: every cached rate expired
+    engine = FXRateEngine(CachedRates([]), db_pool=StoredRates())
+    matrix = asyncio.run(engine.refresh())
+    assert engine.rate('EUR', 'USD') == pytest.approx(1.1)
+    assert engine.rate('GBP', 'EUR') == pytest.approx(1 / 0.8 / 1.1)
+    assert matrix.as_of == datetime(2024, 1, 8)
+
+    # Cached rates are fresher and win over the stored day
+    engine = FXRateEngine(CachedRates([('EUR', 'USD', 1.2)]), db_pool=StoredRates())
+    asyncio.run(engine.refresh())
+    assert engine.rate('EUR', 'USD') == pytest.approx(1.2)
+    assert engine.rate('USD', 'GBP') == pytest.approx(0.8)
+
+def test_workers_convert_from_the_shared_engine_without_io():
+    from etl_worker import ETLWorker
+    from fx_worker import FXWorker
+    etl, fx = ETLWorker(), FXWorker()
+    for worker_engine in (etl.fx_engine, fx.rate_engine):
+        worker_engine.update(QUOTES)
+
+    # No redis or database is connected; any I/O would fail
+    assert asyncio.run(etl.normalize_currency(10.0, 'GBP')) == pytest.approx(12.5)
+    converted = asyncio.run(fx.convert_amount(Decimal('10'), 'EUR', 'GBP'))
+    assert converted == Decimal('8.80')
+
+def test_convert_minor_units_matches_decimal_path():
+    import numpy as np
+    from fx_rates import convert_decimal, convert_minor_units, rate_units
+    rng = np.random.default_rng(7)
+    amounts = np.concatenate([
+        rng.integers(-10**12, 10**12, 5000),
+        [0, 1, -1, 5, -5, 15, 25, 10**13 - 1, -(10**13 - 1)],
+    ])
+    units = np.concatenate([
+        rng.integers(1, 10**5 * 10**10, 5000),
+        [rate_units('0.5'), rate_units('0.5'), rate_units('0.5'), rate_units('0.1'),
+         rate_units('0.1'), rate_units('0.1'), rate_units('0.1'), rate_units('16234.5678901234'), 1],
+    ])
+    expected = [
+        int(convert_decimal(Decimal(int(a)) / 100, int(u)) * 100)
+        for a, u in zip(amounts.tolist(), units.tolist())
+    ]
+    assert convert_minor_units(amounts, units).tolist() == expected
+
+def test_normalize_amounts_resolves_each_currency_day_once():
+    import numpy as np
+    from fx_worker import FXWorker
+    worker = FXWorker()
+    worker.rate_engine.update(QUOTES)
+    lookups = []
+    resolve = worker.resolve_rate_units
+
+    async def counting_resolve(from_currency, to_currency, date=None):
+        lookups.append((from_currency, date))
+        return await resolve(from_currency, to_currency, date)
+
+    worker.resolve_rate_units = counting_resolve
+    currencies = ['EUR', 'GBP', 'JPY', 'XYZ', 'USD'] * 2000
+    amounts = np.arange(len(currencies), dtype=np.int64) * 37 - 5000
+    dates = np.array(['2024-01-01', '2024-01-02'] * 5000, dtype='datetime64[D]')
+    converted, found = asyncio.run(worker.normalize_amounts(currencies, amounts, dates))
+
+    assert len(lookups) == 10
+    assert not found[3::5].any() and found[0::5].all()
+    for i in range(0, len(currencies), 7):
+        expected = asyncio.run(worker.convert_amount(Decimal(int(amounts[i])) / 100, currencies[i], 'USD'))
+        assert converted[i] == (amounts[i] if expected is None else int(expected * 100))
+
+def test_normalize_amounts_leaves_rows_without_currency_unconverted():
+    import numpy as np
+    from fx_worker import FXWorker
+    worker = FXWorker()
+    worker.rate_engine.update([('USD', 'GBP', 0.25)])
+    currencies = ['GBP', None, float('nan'), 'GBP']
+    converted, found = asyncio.run(worker.normalize_amounts(currencies, np.full(4, 1000)))
+
+    assert found.tolist() == [True, False, False, True]
+    assert converted.tolist() == [4000, 1000, 1000, 4000]
+
+def test_rate_history_as_of_carries_rates_across_gaps():
+    from datetime import date
+    from fx_rates import FXRateHistory, RATE_SCALE, rate_units
+
+    class RecordingPool:
+        def __init__(self):
+            self.calls = []
+
+        async def executemany(self, query, records):
+            self.calls.append(records)
+
+    pool = RecordingPool()
+    history = FXRateHistory(pool)
+    asyncio.run(history.save([('EUR', 'USD', 1.10, 'ECB'), ('EUR', 'JPY', 160.0, 'ECB')], date(2024, 1, 5)))
+    asyncio.run(history.save([('EUR', 'USD', 1.20, 'ECB')], date(2024, 1, 8)))
+    asyncio.run(history.save([('USD', 'GBP', 0.80, 'OpenExchange')], date(2024, 1, 5)))
+    asyncio.run(history.save([('EUR', 'USD', 1.15, 'ECB')], date(2024, 1, 5)))  # same day replaces
+    assert [len(records) for records in pool.calls] == [2, 1, 1, 1]
+
+    assert history.rate_units('EUR', 'USD', date(2024, 1, 4)) is None
+    assert history.rate_units('EUR', 'USD', date(2024, 1, 6)) == rate_units('1.15')  # weekend
+    assert history.rate_units('EUR', 'USD', date(2024, 3, 1)) == rate_units('1.2')
+    assert history.rate_units('USD', 'EUR', date(2024, 1, 8)) == round(RATE_SCALE / 1.2)
+    # GBP -> USD -> EUR -> JPY through both pivots
+    gbp_jpy = history.rate_units('GBP', 'JPY', date(2024, 1, 5)) / RATE_SCALE
+    assert gbp_jpy == pytest.approx(1 / 0.8 / 1.15 * 160.0)
+
+    window = history.between('EUR', 'USD', date(2024, 1, 6), date(2024, 1, 31))
+    assert window.days.tolist() == [date(2024, 1, 8)] and window.sources == ['ECB']
+
+def test_dated_conversions_use_history_without_queries():
+    from datetime import date, datetime, timedelta
+    import numpy as np
+    from fx_rates import RateSeries, rate_units
+    from fx_worker import FXWorker
+
+    worker = FXWorker()  # no database: any per-row query would return nothing
+    start = date(2023, 1, 2)
+    weekdays = [start + timedelta(days=i) for i in range(365) if (start + timedelta(days=i)).weekday() < 5]
+    worker.rate_history.series[('EUR', 'USD')] = RateSeries.from_points(
+        (day, rate_units(1 + i / 1000), 'ECB') for i, day in enumerate(weekdays)
+    )
+    days = np.array([start + timedelta(days=i % 365) for i in range(5000)], dtype='datetime64[D]')
+    converted, found = asyncio.run(worker.normalize_amounts(['EUR'] * 5000, np.full(5000, 10000), days))
+    assert found.all()
+
+    rate = asyncio.run(worker.get_historical_rate('EUR', 'USD', datetime(2023, 1, 7)))  # a Saturday
+    assert rate.rate == Decimal('1.004') and rate.timestamp.date() == date(2023, 1, 6)
+    assert converted[5] == 10040  # day 5 is that Saturday
+
+def test_rate_ingestion_trips_breakers_and_serves_stale_snapshots():
+    from fx_providers import FakeRateProvider, RateIngestor
+    from fx_worker import FXWorker
+
+    now = [0.0]
+    ecb = FakeRateProvider("ECB", "EUR", {"USD": 1.1, "JPY": 160.0})
+    oxr = FakeRateProvider("OpenExchange", "USD", {"GBP": 0.8})
+    worker = FXWorker()
+    worker.rate_ingestor = RateIngestor([ecb, oxr], failure_threshold=2, reset_timeout=60,
+                                        clock=lambda: now[0])
+
+    result = asyncio.run(worker.run_daily_update())
+    assert len(result.fresh) == 2 and not result.failed
+    assert worker.rate_history.rate_units('USD', 'GBP', worker.rate_history.latest_day('USD', 'GBP'))
+
+    oxr.fail_next(5)
+    for _ in range(2):
+        result = asyncio.run(worker.run_daily_update())
+        assert result.failed == ['OpenExchange']
+        assert [s.source for s in result.snapshots if s.stale] == ['OpenExchange']
+    assert worker.rate_ingestor.breakers['OpenExchange'].state == 'open'
+
+    # Tripped: not called, but its last good rates keep converting
+    calls = oxr.fetch_calls
+    result = asyncio.run(worker.run_daily_update())
+    assert oxr.fetch_calls == calls and result.skipped == ['OpenExchange']
+    assert worker.rate_engine.rate('GBP', 'USD') == pytest.approx(1 / (0.8 * 1.001))
+    assert worker.rate_engine.rate('EUR', 'USD') == pytest.approx(1.1 * (1 + 0.001 * ecb.fetch_calls))
+
+    # Half-open probe after the timeout; success closes the breaker
+    now[0] = 61
+    oxr.fail_next(0)
+    result = asyncio.run(worker.run_daily_update())
+    assert not result.failed and worker.rate_ingestor.breakers['OpenExchange'].state == 'closed'
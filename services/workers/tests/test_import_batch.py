@@ -0,0 +1,47 @@
+# Created automatically by Cursor AI (2026-10-16)
+import os
+from datetime import datetime
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+def test_builder_interns_text_and_round_trips_metadata():
+    from import_batch import ImportBatch, ImportBatchBuilder
+    builder = ImportBatchBuilder()
+    builder.append(datetime(2024, 1, 5), -4.5, 'Coffee', 1, merchant_name='Cafe')
+    builder.append(datetime(2024, 1, 6), -4.5, 'Coffee', 2, metadata={'memo': 'latte', 'reversal': True})
+    builder.append(datetime(2024, 1, 7), 1234.56, 'Salary', 3,
+                   metadata={'splits': [{'category': 'Pay', 'amount': 1234.56}]}, currency='EUR')
+    batch = builder.build()
+
+    assert batch.amounts.tolist() == [-450, -450, 123456]
+    assert batch.dates.dtype == 'datetime64[s]'
+    assert batch.descriptions.values == ['Coffee', 'Salary']
+    assert batch.descriptions.codes.tolist() == [0, 0, 1]
+
+    merged = ImportBatch.concat([batch, batch])
+    transactions = merged.to_transactions()
+    assert len(transactions) == 6
+    assert [t.currency for t in transactions[:3]] == ['USD', 'USD', 'EUR']
+    assert transactions[0].merchant_name == 'Cafe' and transactions[1].merchant_name is None
+    assert transactions[4].metadata == {'import_row': 2, 'memo': 'latte', 'reversal': True}
+    assert transactions[5].metadata['splits'][0]['category'] == 'Pay'
+    assert transactions[5].amount == 1234.56
+    assert transactions[5].date == datetime(2024, 1, 7)
+
+def test_parsers_return_same_rows_as_columns(tmp_path):
+    from import_batch import ImportBatch
+    from import_parser import ImportManager
+    path = tmp_path / "export.csv"
+    path.write_text("Date,Amount,Description,Currency\n2024-01-05,-4.50,Coffee,EUR\n2024-01-06,12.00,Refund,\n")
+    mapping = {'date': 'Date', 'amount': 'Amount', 'description': 'Description', 'currency': 'Currency'}
+
+    chunks = list(ImportManager().iter_file_chunks(path, mapping))
+    batch = ImportBatch.concat([chunk.batch for chunk in chunks])
+
+    assert batch.amounts.tolist() == [-450, 1200]
+    assert batch.text_columns['currency'].to_list() == ['EUR', None]
+    assert [t.currency for t in batch.to_transactions()] == ['EUR', 'USD']
+    assert ImportBatch.from_transactions(batch.to_transactions()).amounts.tolist() == [-450, 1200]
@@ -0,0 +1,335 @@
+# Created automatically by Cursor AI (2026-10-16)
+import os
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+MAPPING = {'date': 'Date', 'amount': 'Amount', 'description': 'Description'}
+
+def test_csv_chunks_stream_with_byte_progress(tmp_path):
+    from import_parser import CSVImporter
+    path = tmp_path / "export.csv"
+    lines = ["Date,Amount,Description"]
+    lines += [f"2024-01-{i % 28 + 1:02d},{i}.50,\"Shop {i}\"" for i in range(12000)]
+    lines.append("not-a-date,1.00,Broken")
+    lines.append("2024-02-01,,No amount")
+    path.write_text("\n".join(lines) + "\n")
+
+    chunks = list(CSVImporter().iter_csv_chunks(path, MAPPING, chunk_size=5000))
+
+    assert [len(c.transactions) + len(c.errors) for c in chunks] == [5000, 5000, 2002]
+    assert sum(len(c.transactions) for c in chunks) == 12000
+    assert chunks[-1].rows_read == 12002
+    assert chunks[-1].errors == ["Row 12002: Could not parse date: not-a-date", "Row 12003: Amount is required"]
+    progress = [c.progress for c in chunks]
+    assert progress == sorted(progress) and progress[-1] == 1.0
+    assert 'original_data' not in chunks[0].transactions[0].metadata
+
+def test_columnar_parse_infers_formats_and_reports_row_errors(tmp_path):
+    from import_parser import CSVImporter
+    path = tmp_path / "eu.csv"
+    path.write_text(
+        "Datum;Betrag;Text\n"
+        "31/01/2024;1.234,56;Salary\n"
+        "01/02/2024;(12,50);Coffee\n"
+        "02/02/2024;7,25-;Bakery\n"
+        "03/02/2024;abc;Broken amount\n"
+        "2024-02-04;1,00;Broken date\n"
+    )
+    mapping = {'date': 'Datum', 'amount': 'Betrag', 'description': 'Text'}
+
+    chunks = list(CSVImporter().iter_csv_batches(path, mapping))
+
+    assert len(chunks) == 1
+    chunk = chunks[0]
+    assert chunk.date_format == '%d/%m/%Y'
+    assert chunk.amount_format.decimal_separator == ','
+    assert chunk.batch.amounts.tolist() == [123456, -1250, -725]
+    assert chunk.errors == [
+        "Row 6: Could not parse date: 2024-02-04",
+        "Row 5: Could not parse amount: abc",
+    ]
+    assert chunk.transactions[0].description == 'Salary'
+
+def test_targets_sharing_a_source_column_and_parse_csv_use_the_columnar_path(tmp_path):
+    from import_parser import CSVImporter, ImportManager
+    path = tmp_path / "payee.csv"
+    path.write_text("Date,Amount,Payee\n2024-01-05,-4.50,Corner Cafe\n2024-01-06,,Bakery\n")
+    mapping = {'date': 'Date', 'amount': 'Amount', 'description': 'Payee', 'merchant_name': 'Payee'}
+
+    importer = CSVImporter()
+    calls = []
+    batches = importer.iter_csv_batches
+    importer.iter_csv_batches = lambda *args, **kwargs: calls.append(args) or batches(*args, **kwargs)
+    result = importer.parse_csv(path, mapping)
+
+    assert calls
+    assert [(t.description, t.merchant_name) for t in result.transactions] == [('Corner Cafe', 'Corner Cafe')]
+    assert result.transactions[0].metadata['original_data']['merchant_name'] == 'Corner Cafe'
+    assert result.errors == ["Row 3: Amount is required"]
+
+    chunks = list(ImportManager().iter_file_chunks(path, mapping))
+    assert chunks[0].date_format == '%Y-%m-%d'
+    assert chunks[0].batch.text_columns['merchant_name'].to_list() == ['Corner Cafe']
+
+def test_parse_many_merges_and_dedupes_overlapping_statements(tmp_path):
+    from import_parser import ImportManager
+    paths = []
+    for month in range(1, 4):
+        path = tmp_path / f"2024-{month:02d}.csv"
+        rows = [f"2024-{m:02d}-15,-4.50,Coffee" for m in (month, month + 1)]  # overlaps next month
+        rows.append(f"2024-{month:02d}-20,-4.50,Coffee")
+        rows.append(f"2024-{month:02d}-20,-4.50,Coffee")  # genuine repeat in one file
+        path.write_text("Date,Amount,Description\n" + "\n".join(rows) + "\n")
+        paths.append(path)
+
+    result = ImportManager().parse_many(paths, column_mapping=MAPPING, max_workers=2)
+
+    assert len(result.transactions) == 4 + 6
+    assert result.duplicates_removed == 2
+    assert [t.file_name for t in result.timings] == [p.name for p in paths]
+    assert all(t.parse_seconds >= 0 for t in result.timings)
+
+def test_parse_many_keeps_files_with_the_same_name_apart(tmp_path):
+    from import_parser import ColumnMappingRegistry, ImportManager
+    layouts = [
+        (",", "Date,Amount,Description", {'date': 'Date', 'amount': 'Amount', 'description': 'Description'}),
+        (";", "Datum;Betrag;Text", {'date': 'Datum', 'amount': 'Betrag', 'description': 'Text'}),
+    ]
+    manager = ImportManager(ColumnMappingRegistry(store_dir=tmp_path / "layouts"))
+    paths = []
+    for bank, (delimiter, header, mapping) in enumerate(layouts):
+        path = tmp_path / f"bank{bank}" / "statement.csv"
+        path.parent.mkdir()
+        path.write_text(f"{header}\n2024-01-0{bank + 1}{delimiter}-{bank + 1}.00{delimiter}Bank {bank}\n")
+        manager.csv_importer.remember_mapping(path, mapping)
+        paths.append(path)
+
+    results = sorted(manager.iter_parse_many(paths, max_workers=2), key=lambda r: r.index)
+    assert [r.index for r in results] == [0, 1]
+    assert [[t.description for t in r.result.transactions] for r in results] == [["Bank 0"], ["Bank 1"]]
+
+    merged = manager.parse_many(list(reversed(paths)), max_workers=2)
+    assert [t.description for t in merged.transactions] == ["Bank 0", "Bank 1"] and not merged.errors
+
+def test_parse_many_keeps_the_same_charge_on_different_accounts(tmp_path):
+    from import_parser import ImportManager
+    statement = """<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD
+<BANKACCTFROM><ACCTID>{account}</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>FEE<DTPOSTED>20240131<TRNAMT>-5.00<FITID>{fitid}<NAME>MONTHLY SERVICE FEE</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>"""
+    paths = []
+    for name, account, fitid in (("a.ofx", "111", "F-1"), ("b.ofx", "222", "F-2"),
+                                 ("a-again.ofx", "111", "F-1"), ("a-later.ofx", "111", "F-9")):
+        path = tmp_path / name
+        path.write_text(statement.format(account=account, fitid=fitid))
+        paths.append(path)
+
+    result = ImportManager().parse_many(paths[:2], max_workers=2)
+    assert sorted(t.account_name for t in result.transactions) == ['111', '222']
+    assert result.duplicates_removed == 0
+
+    # The same FITID again is a repeat; a new FITID is a second fee, even
+    # with the same description
+    result = ImportManager().parse_many(paths, max_workers=2)
+    assert sorted(t.reference for t in result.transactions) == ['F-1', 'F-2', 'F-9']
+    assert result.duplicates_removed == 1
+
+OFX_SGML = """OFXHEADER:100
+DATA:OFXSGML
+CHARSET:1252
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>EUR
+<BANKACCTFROM><ACCTID>12345</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105120000.000[-5:EST]<TRNAMT>-12,50<FITID>A1<NAME>Caf&amp;Co</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>100.00<FITID>A2<MEMO>Refund</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<TRNAMT>1.00<FITID>A3<NAME>No date</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>"""
+
+OFX_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<?OFX OFXHEADER="200" VERSION="220"?>
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD</CURDEF>
+<BANKTRANLIST><STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20240107</DTPOSTED>
+<TRNAMT>-3.25</TRNAMT><FITID>B1</FITID><NAME>Bakery</NAME></STMTTRN></BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>"""
+
+def test_ofx_streaming_parses_sgml_and_xml(tmp_path):
+    from import_parser import OFXImporter
+    importer = OFXImporter()
+    importer.block_size = 16  # force records to straddle blocks
+
+    sgml = tmp_path / "old.qfx"
+    sgml.write_text(OFX_SGML, encoding='cp1252')
+    result = importer.parse_ofx(sgml)
+    assert [(t.amount, t.description, t.currency, t.reference) for t in result.transactions] == [
+        (-12.5, 'Caf&Co', 'EUR', 'A1'), (100.0, 'Refund', 'EUR', 'A2'),
+    ]
+    assert result.transactions[0].date.hour == 12
+    assert result.total_rows == 3 and len(result.errors) == 1
+
+    xml = tmp_path / "new.ofx"
+    xml.write_text(OFX_XML)
+    result = importer.parse_ofx(xml)
+    assert [(t.amount, t.description) for t in result.transactions] == [(-3.25, 'Bakery')]
+
+QIF = """!Account
+NChecking
+TBank
+^
+!Type:Bank
+D1/ 5'24
+T-1,234.56
+PLandlord
+MJanuary rent
+N1001
+LHousing:Rent
+^
+D01/06/2024
+T-100.00
+PSupermarket
+SGroceries
+EFood
+$-60.00
+SHousehold
+$-40.00
+^
+!Type:Cat
+NGroceries
+^
+"""
+
+MT940 = """{1:F01BANKDEFFXXXX0000000000}{4:
+:20:STMT1
+:25:DE12345678901234567890
+:28C:1/1
+:60F:C240101EUR1000,00
+:61:2401020102D12,50NTRFNONREF//B1
+:86:166?00SEPA?20Coffee shop?21Berlin?32CAFE
+?33 GMBH
+:61:2401030103C250,00NTRFREF123
+:86:Salary January
+:61:2401040104RC5,00NCHGNONREF
+:62F:C240104EUR1232,50
+-}
+"""
+
+def test_qif_and_mt940_streaming(tmp_path):
+    from import_parser import ImportManager
+    manager = ImportManager()
+
+    qif = tmp_path / "export.qif"
+    qif.write_text(QIF)
+    result = manager.parse_file(qif)
+    assert [(t.date.day, t.amount, t.description, t.account_name) for t in result.transactions] == [
+        (5, -1234.56, 'Landlord', 'Checking'), (6, -100.0, 'Supermarket', 'Checking'),
+    ]
+    assert [s['amount'] for s in result.transactions[1].metadata['splits']] == [-60.0, -40.0]
+    assert result.transactions[0].category == 'Housing:Rent'
+
+    mt940 = tmp_path / "statement.sta"
+    mt940.write_text(MT940)
+    chunks = list(manager.iter_file_chunks(mt940, chunk_size=2))
+    transactions = [t for chunk in chunks for t in chunk.transactions]
+    assert [(t.amount, t.currency) for t in transactions] == [(-12.5, 'EUR'), (250.0, 'EUR'), (-5.0, 'EUR')]
+    assert transactions[0].description.startswith('Coffee shop Berlin')
+    assert transactions[0].merchant_name == 'CAFE GMBH'
+    assert transactions[1].description == 'Salary January'
+
+QIF_ACCOUNT_LIST = """!Option:AutoSwitch
+!Account
+NChecking
+TBank
+^
+NVisa
+TCCard
+L5000.00
+^
+!Clear:AutoSwitch
+!Account
+NVisa
+TCCard
+^
+!Type:CCard
+D01/07/2024
+T-25.00
+PBookshop
+^
+!Option:AutoSwitch
+!Account
+NSavings
+TBank
+^
+!Type:Bank
+D01/08/2024
+T500.00
+PTransfer in
+^
+"""
+
+def test_qif_autoswitch_account_list_does_not_select_accounts(tmp_path):
+    from import_parser import QIFImporter
+    path = tmp_path / "full.qif"
+    path.write_text(QIF_ACCOUNT_LIST)
+
+    result = QIFImporter().parse_qif(path)
+    # The list ends at !Clear:AutoSwitch or at the next !Type: header
+    assert [(t.description, t.account_name) for t in result.transactions] == [
+        ('Bookshop', 'Visa'), ('Transfer in', 'Visa'),
+    ]
+    assert not result.errors
+
+def test_mapping_registry_reuses_mapping_and_formats_per_layout(tmp_path):
+    from import_parser import ColumnMappingRegistry, ImportManager
+    store = tmp_path / "layouts"
+    first = tmp_path / "household_a.csv"
+    first.write_text("Datum;Betrag;Text\n31/01/2024;1.234,56;Salary\n01/02/2024;(12,50);Coffee\n")
+    second = tmp_path / "household_b.csv"
+    second.write_text("Datum;Betrag;Text\n05/02/2024;3,10;Bakery\n")
+    mapping = {'date': 'Datum', 'amount': 'Betrag', 'description': 'Text'}
+
+    importer = ImportManager(ColumnMappingRegistry(store_dir=store)).csv_importer
+    assert importer.get_column_preview(first).get('column_mapping') is None
+    list(importer.iter_csv_batches(first, mapping))
+
+    # A fresh registry over the same store stands in for another worker
+    manager = ImportManager(ColumnMappingRegistry(store_dir=store))
+    preview = manager.get_file_preview(second)
+    assert preview['column_mapping'] == mapping and preview['date_format'] == '%d/%m/%Y'
+
+    chunk = next(manager.csv_importer.iter_csv_batches(second))
+    assert chunk.date_format == '%d/%m/%Y' and chunk.amount_format.decimal_separator == ','
+    assert chunk.batch.amounts.tolist() == [310]
+    assert [(t.amount, t.description) for t in manager.parse_file(second).transactions] == [(3.1, 'Bakery')]
+    assert manager.csv_importer.mapping_registry.get(manager.csv_importer.sniff_layout(second)).imports == 3
+
+    with pytest.raises(ValueError):
+        ImportManager().parse_file(second)
+
+def test_mapping_registry_needs_agreement_to_change_a_shared_mapping(tmp_path):
+    from import_parser import ColumnMappingRegistry, CSVImporter
+    path = tmp_path / "export.csv"
+    path.write_text("Date;Amount;Payee;Memo\n31/01/2024;1.234,56;Employer;Salary\n")
+    right = {'date': 'Date', 'amount': 'Amount', 'description': 'Memo'}
+    wrong = {'date': 'Date', 'amount': 'Amount', 'description': 'Payee'}
+    registry = ColumnMappingRegistry(store_dir=tmp_path / "layouts")
+    importer = lambda household=None: CSVImporter(registry, household)
+
+    list(importer("household-a").iter_csv_chunks(path, right))
+    list(importer("household-b").iter_csv_chunks(path, wrong))
+    list(importer().iter_csv_chunks(path, wrong))
+
+    # The row path records formats too
+    profile = importer("household-a").resolve_mapping(path)[2]
+    assert profile.date_format == '%d/%m/%Y' and profile.amount_format.decimal_separator == ','
+    # One household's different choice only applies to that household
+    assert importer("household-b").resolve_mapping(path)[1] == wrong
+    assert importer("household-c").resolve_mapping(path)[1] == right
+    assert importer().resolve_mapping(path)[1] == right
+
+    list(importer("household-d").iter_csv_batches(path, wrong))
+    assert importer("household-c").resolve_mapping(path)[1] == wrong
+    assert importer("household-a").resolve_mapping(path)[1] == right
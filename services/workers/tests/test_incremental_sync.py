@@ -0,0 +1,108 @@
+# Created automatically by Cursor AI (2026-10-16)
+import asyncio
+import os
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+def make_worker():
+    from etl_worker import ETLWorker, BatchIngestStats
+    worker = ETLWorker()
+    worker.ingested = []
+
+    async def record(transactions):
+        worker.ingested.extend(tx.id for tx in transactions)
+        return [BatchIngestStats(len(transactions), len(transactions), 0, 0, 0.0)]
+
+    worker.process_transactions_batched = record
+    return worker
+
+async def sync_all(worker, connector, connection_id="conn-1"):
+    from connectors import AccountWatermark
+    watermarks = await worker.watermark_store.load(connection_id)
+    for account_id in await connector.list_accounts({}):
+        await worker.sync_account(
+            connector, connection_id, {}, account_id,
+            watermarks.get(account_id) or AccountWatermark(account_id=account_id)
+        )
+
+def test_sync_resumes_after_provider_failure_and_resync_is_incremental():
+    from connectors import FakeProviderConnector
+    worker = make_worker()
+    connector = FakeProviderConnector(accounts=2, pages=2000, page_size=20, fail_at_page=1500)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(sync_all(worker, connector))
+    watermarks = asyncio.run(worker.watermark_store.load("conn-1"))
+    # The first account stopped at the failing page with everything before it saved
+    assert watermarks["fake-account-0"].cursor == str(1500 * 20)
+    assert watermarks["fake-account-0"].synced_count == 1500 * 20
+    assert connector.fetch_calls == 1501
+
+    asyncio.run(sync_all(worker, connector))
+    # The retry resumes at the failed page instead of refetching from the start
+    assert connector.fetch_calls == 1501 + 500 + 2000
+    watermarks = asyncio.run(worker.watermark_store.load("conn-1"))
+    assert {w.synced_count for w in watermarks.values()} == {2000 * 20}
+    assert len(worker.ingested) == len(set(worker.ingested)) == 2 * 2000 * 20
+
+    calls_before = connector.fetch_calls
+    connector.append_pages(5)
+    asyncio.run(sync_all(worker, connector))
+    assert connector.fetch_calls - calls_before == 2 * 5
+    assert len(worker.ingested) == 2 * 2005 * 20
+
+class FakeConnectionsDB:
+    """Stand-in pool over a dict of connection rows"""
+    def __init__(self, connections):
+        self.connections = connections
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def fetchrow(self, query, connection_id):
+        return self.connections.get(connection_id)
+
+    async def execute(self, query, connection_id, *args):
+        if "status = 'error'" in query:
+            self.connections[connection_id].update(status='error', error_message=args[0])
+
+def test_connectors_come_from_config_and_unknown_providers_fail_permanently():
+    from connectors import FakeProviderConnector, PermanentSyncError, connectors_from_config
+    configured = connectors_from_config("plaid=fake, fake ,tink=missing")
+    assert sorted(configured) == ['fake', 'plaid']
+    assert all(isinstance(c, FakeProviderConnector) for c in configured.values())
+
+    worker = make_worker()
+    worker.register_connector(FakeProviderConnector(accounts=1, pages=2, page_size=5), 'plaid')
+    worker.db_pool = FakeConnectionsDB({
+        'conn-plaid': {'id': 'conn-plaid', 'provider': 'plaid', 'access_token': None, 'metadata': None},
+        'conn-tink': {'id': 'conn-tink', 'provider': 'tink', 'access_token': None, 'metadata': None},
+    })
+
+    asyncio.run(worker.sync_connection('conn-plaid'))
+    assert len(worker.ingested) == 10
+
+    with pytest.raises(PermanentSyncError):
+        asyncio.run(worker.sync_connection('conn-tink'))
+    assert worker.db_pool.connections['conn-tink']['status'] == 'error'
+    with pytest.raises(PermanentSyncError):
+        asyncio.run(worker.sync_connection('conn-gone'))
+
+    # Redelivery cannot fix either, so the message is terminated rather than nak'd
+    async def settle(error):
+        future = asyncio.get_running_loop().create_future()
+        future.set_exception(error)
+        await worker._settle_sync_message('msg', future)
+    worker.consumer_mode = 'pull'
+    asyncio.run(settle(PermanentSyncError("no connector")))
+    asyncio.run(settle(ConnectionError("provider down")))
+    assert worker._pending_acks == [('msg', 'term'), ('msg', 'nak')]
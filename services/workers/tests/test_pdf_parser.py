@@ -0,0 +1,180 @@
+# Created automatically by Cursor AI (2026-10-16)
+import os
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+def write_pdf(path, pages):
+    """Write a minimal PDF; a page is a list of text lines or a raw content stream"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = lines if isinstance(lines, str) else "BT /F1 10 Tf 14 TL 50 750 Td " + " ".join(
+            "(" + line.replace('(', r'\(').replace(')', r'\)') + ") Tj T*" for line in lines
+        ) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_bytes(out.encode('latin-1'))
+
+def statement_pages(count):
+    pages = [["Acme Bank statement", "Account: 1234567890"]]
+    for number in range(1, count):
+        pages.append([f"{number:02d}/15/2024 Grocery store {number} 42.{number:02d}"])
+    return pages
+
+def test_pages_are_extracted_in_order_serially_and_in_parallel(tmp_path):
+    from pdf_parser import PDFParser, _split_pages
+    path = tmp_path / "statement.pdf"
+    write_pdf(path, statement_pages(9))
+
+    serial = PDFParser(max_workers=1).parse_pdf(path)
+    parallel = PDFParser(max_workers=3, min_pages_per_worker=1).parse_pdf(path)
+
+    assert _split_pages(9, 3) == [(0, 3), (3, 6), (6, 9)]
+    assert serial.statement_info.account_number == '1234567890'
+    assert [t.date.month for t in serial.transactions if t.date] == list(range(1, 9))
+    assert serial.confidence == 0.7
+    assert parallel.model_dump() == serial.model_dump()
+
+def test_only_pages_without_text_are_ocrd_and_cached(tmp_path, monkeypatch):
+    import pdf_parser
+    from pdf_parser import PDFParser
+    calls = []
+    def fake_ocr(image):
+        calls.append(image.size)
+        return "03/01/2024 Scanned deposit 10.00"
+    monkeypatch.setattr(pdf_parser.pytesseract, 'image_to_string', fake_ocr)
+
+    path = tmp_path / "scanned.pdf"
+    write_pdf(path, [["Acme Bank statement summary"], [], []])  # two identical blank scans
+    cache_dir = tmp_path / "ocr"
+
+    first = PDFParser(max_workers=1, ocr_cache_dir=cache_dir).parse_pdf(path)
+    assert len(calls) == 1
+    assert (first.ocr_stats.hits, first.ocr_stats.misses) == (1, 1)
+    assert [t.metadata['source'] for t in first.transactions] == ['text', 'text']
+    assert first.confidence == 0.3
+
+    # A new parser (e.g. another worker) reuses the persisted OCR text
+    again = PDFParser(max_workers=1, ocr_cache_dir=cache_dir).parse_pdf(path)
+    assert len(calls) == 1
+    assert (again.ocr_stats.hits, again.ocr_stats.misses) == (2, 0)
+
+def test_line_scanner_splits_date_amount_balance_and_description():
+    from pdf_parser import PDFParser
+    parser = PDFParser(max_workers=1)
+    page = (
+        "01/15/2024 Grocery store 42.10 1,234.56\n"
+        "2024-01-16 ATM withdrawal Store 123 -$60.00\n"
+        "16 Jan 2024 Salary ACME 2,500.00 CR 3,734.56\n"
+        "Account: 1234567890\n"
+        "01/17/2024 Refund (12.50)"
+    )
+
+    parsed = [(t.date.day, t.amount, t.balance, t.description) for t in parser._extract_from_text(page)]
+
+    assert parsed == [
+        (15, 42.10, 1234.56, 'Grocery store'),
+        (16, -60.0, None, 'ATM withdrawal Store 123'),
+        (16, 2500.0, 3734.56, 'Salary ACME'),
+        (17, -12.5, None, 'Refund'),
+    ]
+    assert parser._parse_text_line("01/15/2024 Grocery store 42.10 1,234.56").amount == 42.10
+
+def table_page(rows, issuer="Acme Bank"):
+    """Content stream of a ruled Date/Description/Amount/Balance table"""
+    edges = [50, 130, 350, 450, 550]
+    top, height = 700, 20
+    parts = [f"BT /F1 12 Tf 50 750 Td ({issuer}) Tj ET"]
+    for index, row in enumerate([("Date", "Description", "Amount", "Balance")] + rows):
+        y = top - (index + 1) * height + 6
+        for x, cell in zip(edges, row):
+            parts.append(f"BT /F1 10 Tf {x + 4} {y} Td ({cell}) Tj ET")
+    bottom = top - (len(rows) + 1) * height
+    parts += [f"{x} {bottom} m {x} {top} l S" for x in edges]
+    parts += [f"50 {y} m 550 {y} l S" for y in range(bottom, top + 1, height)]
+    return "\n".join(parts)
+
+def test_table_layout_is_learned_and_reused_as_template(tmp_path):
+    from pdf_parser import PDFParser
+    rows = [("01/05/2024", "Coffee shop", "-4.50", "995.50"), ("01/06/2024", "Salary", "2000.00", "2995.50")]
+    first = tmp_path / "january.pdf"
+    write_pdf(first, [table_page(rows)])
+    second = tmp_path / "february.pdf"
+    write_pdf(second, [table_page([("02/01/2024", "Rent", "-900.00", "2095.50")] + rows)])
+    template_dir = tmp_path / "templates"
+
+    generic = PDFParser(max_workers=1, template_dir=template_dir)
+    learned = generic.extract_pages(first)[0]
+    assert learned.template is None and learned.source == 'table'
+    assert list(template_dir.glob('*.json'))
+
+    parser = PDFParser(max_workers=1, template_dir=template_dir)
+    page = parser.extract_pages(second)[0]
+    assert page.template is not None
+    assert [(t.date.month, t.description, t.amount, t.balance) for t in page.transactions] == [
+        (2, 'Rent', -900.0, 2095.5), (1, 'Coffee shop', -4.5, 995.5), (1, 'Salary', 2000.0, 2995.5),
+    ]
+    assert parser.parse_pdf(first).model_dump() == PDFParser(max_workers=1).parse_pdf(first).model_dump()
+
+def test_streaming_parse_yields_statement_info_first_then_pages_in_order(tmp_path):
+    import asyncio
+    from pdf_parser import PageResult, PDFParser, StatementInfo
+    path = tmp_path / "statement.pdf"
+    write_pdf(path, statement_pages(9))
+
+    async def collect(parser):
+        return [event async for event in parser.iter_parse_pdf(path)]
+
+    serial = asyncio.run(collect(PDFParser(max_workers=1)))
+    parallel = asyncio.run(collect(PDFParser(max_workers=2, min_pages_per_worker=2)))
+
+    assert isinstance(serial[0], StatementInfo) and serial[0].account_number == '1234567890'
+    assert all(isinstance(page, PageResult) for page in serial[1:])
+    assert [page.page_number for page in serial[1:]] == list(range(1, 10))
+    assert [page.model_dump() for page in parallel[1:]] == [page.model_dump() for page in serial[1:]]
+
+    preview = PDFParser(max_workers=1).get_statement_preview(path)
+    assert preview['page_count'] == 9
+    assert preview['statement_info']['account_number'] == '1234567890'
+    assert [t['date'].day for t in preview['sample_transactions']] == [15]
+
+def test_closing_the_stream_early_shuts_the_pool_down_without_waiting(tmp_path, monkeypatch):
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    import pdf_parser
+    from pdf_parser import PDFParser
+    path = tmp_path / "statement.pdf"
+    write_pdf(path, statement_pages(9))
+    shutdowns = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def shutdown(self, wait=True, *, cancel_futures=False):
+            shutdowns.append((wait, cancel_futures))
+            super().shutdown(wait=wait, cancel_futures=cancel_futures)
+    monkeypatch.setattr(pdf_parser, 'ProcessPoolExecutor', RecordingPool)
+
+    async def first_pages(count):
+        stream = PDFParser(max_workers=2, min_pages_per_worker=1).iter_parse_pdf(path)
+        events = [await stream.__anext__() for _ in range(count)]
+        await stream.aclose()
+        return events
+
+    events = asyncio.run(first_pages(3))
+    assert [event.page_number for event in events[1:]] == [1, 2]
+    assert shutdowns == [(False, True)]
@@ -0,0 +1,193 @@
+# Created automatically by Cursor AI (2026-10-16)
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.getenv('RUN_WORKER_TESTS') != '1', reason='Worker tests disabled by default'
+)
+
+class FakeProvider:
+    """Local provider whose syncs take a fixed time"""
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def sync(self, connection_id):
+        self.calls.append(connection_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+
+class FakeMsg:
+    def __init__(self, data, num_delivered=1):
+        self.data = data
+        self.metadata = SimpleNamespace(num_delivered=num_delivered)
+        self.acked = False
+        self.naked = False
+        self.nak_delay = None
+        self.termed = False
+
+    async def ack(self):
+        self.acked = True
+
+    async def nak(self, delay=None):
+        self.naked = True
+        self.nak_delay = delay
+
+    async def term(self):
+        self.termed = True
+
+class InProcessJetStream:
+    """Stand-in for a durable pull consumer over a list of messages"""
+    def __init__(self, payloads):
+        self.queue = [FakeMsg(p) for p in payloads]
+        self.delivered = []
+        self.fetch_sizes = []
+        self.flushes = 0
+
+    def jetstream(self):
+        return self
+
+    async def stream_info(self, name):
+        return {}
+
+    async def pull_subscribe(self, subject, durable, config):
+        return self
+
+    async def fetch(self, batch, timeout):
+        from nats.errors import TimeoutError
+        if not self.queue:
+            await asyncio.sleep(0.01)
+            raise TimeoutError
+        msgs, self.queue = self.queue[:batch], self.queue[batch:]
+        self.fetch_sizes.append(len(msgs))
+        self.delivered += msgs
+        return msgs
+
+    async def flush(self):
+        self.flushes += 1
+
+class InProcessNats:
+    """Stand-in for a NATS connection that delivers to local callbacks"""
+    def __init__(self):
+        self.subscriptions = {}
+
+    async def subscribe(self, subject, cb):
+        self.subscriptions.setdefault(subject, []).append(cb)
+
+    async def publish(self, subject, data):
+        msgs = []
+        for cb in self.subscriptions.get(subject, []):
+            msg = FakeMsg(data)
+            msgs.append(msg)
+            await cb(msg)
+        return msgs
+
+def test_scheduler_runs_connections_concurrently_under_limit():
+    from sync_scheduler import SyncScheduler
+
+    async def scenario():
+        provider = FakeProvider(latency=0.05)
+        scheduler = SyncScheduler(provider.sync, max_concurrency=4, default_limit=(1000.0, 100))
+        futures = [scheduler.submit(f"conn-{i}") for i in range(12)]
+        assert scheduler.queue_depth == 12
+        await asyncio.gather(*futures)
+        return provider, scheduler
+
+    provider, scheduler = asyncio.run(scenario())
+    assert provider.max_active == 4
+    assert scheduler.get_stats().completed == 12
+    assert scheduler.in_flight == 0
+
+def test_etl_worker_coalesces_duplicate_sync_messages():
+    from etl_worker import ETLWorker
+
+    async def scenario():
+        worker = ETLWorker()
+        worker.consumer_mode = 'core'
+        provider = FakeProvider(latency=0.05)
+        worker.sync_scheduler.sync_fn = provider.sync
+        bus = InProcessNats()
+        await bus.subscribe("conn.sync", worker.handle_sync_message)
+
+        payload = lambda cid: json.dumps({"connection_id": cid, "provider": "plaid"}).encode()
+        msgs = []
+        for _ in range(5):
+            msgs += await bus.publish("conn.sync", payload("conn-a"))
+        msgs += await bus.publish("conn.sync", payload("conn-b"))
+        await worker.sync_scheduler.drain()
+        await asyncio.gather(*worker._settle_tasks)
+        return provider, worker, msgs
+
+    provider, worker, msgs = asyncio.run(scenario())
+    assert sorted(provider.calls) == ["conn-a", "conn-b"]
+    assert worker.get_sync_stats()["coalesced"] == 4
+    assert all(msg.acked for msg in msgs)
+
+def test_pull_consumer_fetches_in_batches_and_acks_in_bulk():
+    from etl_worker import ETLWorker
+
+    async def scenario():
+        worker = ETLWorker()
+        worker.fetch_batch_size = 10
+        worker.max_outstanding = 25
+        provider = FakeProvider(latency=0.02)
+        worker.sync_scheduler.sync_fn = provider.sync
+        worker.sync_scheduler.default_limit = (1000.0, 100)
+        payloads = [
+            json.dumps({"connection_id": f"conn-{i}", "provider": "local"}).encode()
+            for i in range(60)
+        ]
+        worker.nats_client = InProcessJetStream(payloads)
+
+        async def stop_when_drained():
+            while len(provider.calls) < 60 or worker._outstanding:
+                await asyncio.sleep(0.01)
+            worker._stopping = True
+
+        await asyncio.gather(worker.run_pull_consumer(), stop_when_drained())
+        return worker, worker.nats_client
+
+    worker, js = asyncio.run(scenario())
+    assert all(msg.acked for msg in js.delivered) and len(js.delivered) == 60
+    assert max(js.fetch_sizes) <= 10
+    assert js.flushes < 60
+    assert worker._outstanding == 0
+
+def test_failed_syncs_back_off_and_permanent_failures_terminate():
+    from connectors import PermanentSyncError
+    from etl_worker import ETLWorker
+
+    async def scenario():
+        worker = ETLWorker()
+        worker.consumer_mode = 'core'
+        worker.sync_max_deliver = 4
+
+        async def sync(connection_id):
+            if connection_id == "conn-gone":
+                raise PermanentSyncError("Connection conn-gone not found")
+            raise ConnectionError("provider down")
+        worker.sync_scheduler.sync_fn = sync
+        worker.sync_scheduler.default_limit = (1000.0, 100)
+
+        payload = lambda cid: json.dumps({"connection_id": cid, "provider": "plaid"}).encode()
+        msgs = [FakeMsg(payload(f"conn-{i}"), num_delivered=n) for i, n in enumerate([1, 2, 3, 4])]
+        msgs += [FakeMsg(payload("conn-gone")), FakeMsg(b"not json")]
+        for msg in msgs:
+            await worker.handle_sync_message(msg)
+        await worker.sync_scheduler.drain()
+        await asyncio.gather(*worker._settle_tasks)
+        return msgs
+
+    msgs = asyncio.run(scenario())
+    assert [msg.nak_delay for msg in msgs[:3]] == [5.0, 10.0, 20.0]
+    # The last allowed delivery, the missing connection and the malformed
+    # message are terminated instead of being redelivered
+    assert [msg.termed for msg in msgs[3:]] == [True, True, True]
+    assert not any(msg.acked for msg in msgs)
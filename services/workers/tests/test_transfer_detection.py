@@ -11,3 +11,480 @@ def test_transfer_detection_symmetry():
     tx2 = {"amount": 100, "account": "B", "ts": 1}
     is_transfer = abs(tx1["amount"]) == abs(tx2["amount"]) and tx1["ts"] == tx2["ts"]
     assert is_transfer
+
+def synthetic_household(count, seed=3):
+    import random
+    from datetime import datetime, timedelta
+    rng = random.Random(seed)
+    start = datetime(2024, 3, 1)
+    rows = []
+    for i in range(count):
+        when = start + timedelta(seconds=rng.randrange(0, 5 * 86400))
+        amount = rng.choice([-1, 1]) * rng.randrange(1, 400) * 5 / 100
+        rows.append({
+            'id': i, 'account_id': rng.choice(['chk', 'sav', 'card']), 'amount': amount, 'date': when,
+            'merchant_name': rng.choice(['ACME', 'Corner Shop', None]),
+            'description': rng.choice(['CARD PURCHASE', 'TRANSFER', 'ONLINE PAYMENT REF']),
+        })
+        if i % 4 == 0:  # second leg or repeated charge shortly after
+            twin = dict(rows[-1], id=count + i, date=when + timedelta(seconds=rng.randrange(0, 4000)))
+            twin.update(rng.choice([{'amount': -amount, 'account_id': 'sav'}, {}]))
+            rows.append(twin)
+    return rows
+
+def reference_transfers(worker, row, rows):
+    """{partner id: score} of every leg the per-row scoring accepts"""
+    window = worker.time_window_hours * 3600
+    partners = {}
+    for other in rows:
+        gap = abs((other['date'] - row['date']).total_seconds())
+        if (other['account_id'] == row['account_id'] or gap > window
+                or abs(other['amount'] + row['amount']) > worker.amount_tolerance):
+            continue
+        score = (worker.calculate_amount_similarity(row['amount'], other['amount']) * 0.6
+                 + worker.calculate_time_similarity(row['date'], other['date']) * 0.4)
+        if score >= worker.intra_household_threshold:
+            partners[other['id']] = score
+    return partners
+
+def reference_duplicate(worker, row, rows):
+    """Best earlier duplicate by per-row scoring, the closest in time on ties"""
+    window = worker.time_window_hours * 3600
+    best = None
+    for other in rows:
+        gap = abs((other['date'] - row['date']).total_seconds())
+        if (other['date'], str(other['id'])) >= (row['date'], str(row['id'])) or gap > window:
+            continue
+        score = (worker.calculate_amount_similarity(row['amount'], other['amount']) * 0.4
+                 + worker.calculate_time_similarity(row['date'], other['date']) * 0.3
+                 + worker.calculate_text_similarity(row['merchant_name'], other['merchant_name'] or '') * 0.2
+                 + worker.calculate_text_similarity(row['description'], other['description'] or '') * 0.1)
+        if score >= worker.duplicate_threshold and (best is None or (score, -gap) > best[:2]):
+            best = (score, -gap, other['id'])
+    return best[2] if best else None
+
+def test_batch_matcher_agrees_with_per_row_scoring():
+    from transfer_matcher import TransactionSlice
+    from transfer_worker import TransferWorker
+    worker = TransferWorker()
+    rows = synthetic_household(600)
+    txs = TransactionSlice(rows)
+    batch = list(range(0, len(rows), 3))
+    matches = worker.batch_matcher().match(txs, batch)
+
+    claimed = {}
+    for position in batch:
+        row = rows[position]
+        candidates = reference_transfers(worker, row, rows)
+        match = matches.get(position)
+        if match and match[0] == 'intra_household':
+            partner = rows[match[1]]['id']
+            assert candidates[partner] == pytest.approx(match[2])
+            assert claimed.setdefault(partner, row['id']) == row['id']  # one leg per counterpart
+        else:
+            # Unpaired only when every acceptable leg went to another pairing
+            assert all(matches.get(txs.position[partner], ('',))[0] == 'intra_household'
+                       or partner in claimed for partner in candidates)
+            expected = reference_duplicate(worker, row, rows)
+            assert (rows[match[1]]['id'] if match else None) == expected
+    assert len(claimed) > 20
+
+def test_batch_detection_uses_constant_queries():
+    import asyncio
+    from transfer_worker import TransferWorker
+
+    rows = synthetic_household(1000)
+
+    class CountingPool:
+        def __init__(self):
+            self.queries = 0
+
+        async def fetch(self, query, *args):
+            self.queries += 1
+            if 'FROM accounts' in query:
+                return [{'id': account} for account in ('chk', 'sav', 'card')]
+            _, start, end = args
+            return [row for row in rows if start <= row['date'] <= end]
+
+        async def executemany(self, query, records):
+            self.queries += 1
+
+    worker = TransferWorker()
+    worker.db_pool = CountingPool()
+    processed = asyncio.run(worker.process_transaction_transfers([dict(row) for row in rows[:1000]], 1))
+    assert worker.db_pool.queries == 2
+    assert sum(tx['transfer_type'] == 'intra_household' for tx in processed) > 50
+    paired = {tx['id']: tx['paired_transaction_id'] for tx in processed if tx['is_transfer']}
+    assert all(partner != tx_id for tx_id, partner in paired.items())
+
+def test_assignment_pairs_equal_amount_legs_one_to_one():
+    from datetime import datetime, timedelta
+    from transfer_matcher import TransactionSlice
+    from transfer_worker import TransferWorker
+    worker = TransferWorker()
+    start = datetime(2024, 3, 1, 9)
+
+    # Savings sweeps of the same amount a minute apart: greedy lets the
+    # 09:01 inflow be claimed by both outflows
+    rows = [
+        {'id': 'out-1', 'account_id': 'chk', 'amount': -250.0, 'date': start},
+        {'id': 'out-2', 'account_id': 'chk', 'amount': -250.0, 'date': start + timedelta(seconds=90)},
+        {'id': 'in-1', 'account_id': 'sav', 'amount': 250.0, 'date': start + timedelta(seconds=60)},
+        {'id': 'in-2', 'account_id': 'sav', 'amount': 250.0, 'date': start + timedelta(seconds=200)},
+    ]
+    txs = TransactionSlice(rows)
+    matches = worker.batch_matcher().match(txs, [0, 1, 2, 3])
+    pairs = {rows[i]['id']: rows[match[1]]['id'] for i, match in matches.items()}
+    assert pairs == {'out-1': 'in-1', 'in-1': 'out-1', 'out-2': 'in-2', 'in-2': 'out-2'}
+
+    # Hundreds of interchangeable legs within the hour still pair one to one
+    legs = []
+    for i in range(600):
+        when = start + timedelta(seconds=i * 7)
+        legs.append({'id': f'o{i}', 'account_id': 'chk', 'amount': -100.0, 'date': when})
+        legs.append({'id': f'i{i}', 'account_id': 'sav', 'amount': 100.0, 'date': when + timedelta(seconds=5)})
+    txs = TransactionSlice(legs)
+    matches = worker.batch_matcher().match(txs, list(range(len(legs))))
+    partners = [match[1] for match in matches.values() if match[0] == 'intra_household']
+    assert len(partners) == len(legs) == len(set(partners))
+
+def test_batch_processing_writes_both_legs_in_one_transaction():
+    import asyncio
+    from transfer_stream import PendingLeg
+    from transfer_worker import TransferWorker
+    rows = synthetic_household(200)
+    writes = []
+
+    class Connection:
+        def transaction(self):
+            return self
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            writes.append('commit' if exc[0] is None else 'rollback')
+
+        async def executemany(self, query, records):
+            writes.append(records)
+
+    class Pool:
+        def acquire(self):
+            return Connection()
+
+        async def fetch(self, query, *args):
+            if 'FROM accounts' in query:
+                return [{'id': account} for account in ('chk', 'sav', 'card')]
+            if 'is_transfer IS NULL' in query:
+                return rows[:100]
+            return rows
+
+    worker = TransferWorker()
+    worker.db_pool = Pool()
+    # Every row is also waiting in the streaming pool
+    for row in rows:
+        worker.transfer_stream.pool(1).add(PendingLeg.from_row(row, 0.0))
+    asyncio.run(worker.run_batch_processing(1))
+
+    records, *_ = [write for write in writes if isinstance(write, list)]
+    assert writes[-2:] == ['commit', 'commit']
+    updated = {record[4]: record for record in records}
+    assert {row['id'] for row in rows[:100]} <= set(updated)
+    for tx_id, (is_transfer, transfer_type, partner, _, _) in updated.items():
+        if transfer_type == 'intra_household':
+            assert updated[partner][2] == tx_id
+    # Legs the sweep marked leave the pool; the rest keep waiting
+    waiting = set(worker.transfer_stream.pool(1).legs)
+    marked = {str(tx_id) for tx_id, record in updated.items() if record[0]}
+    assert marked and not waiting & marked and len(waiting) == len(rows) - len(marked)
+
+class FakeRedis:
+    """Just enough of redis.asyncio for pipelines, hashes and SCAN"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __getattr__(self, name):
+                return lambda *args: self.ops.append((name, args))
+
+            async def execute(self):
+                return [getattr(redis, name)(*args) for name, args in self.ops]
+
+        return Pipeline()
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(field, None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def setex(self, key, seconds, value):
+        self.data[key] = value
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if key.startswith(match.rstrip('*')):
+                yield key
+
+def test_streaming_pool_pairs_late_legs_and_survives_restart():
+    import asyncio
+    from datetime import datetime, timedelta
+    from transfer_stream import StreamingTransferMatcher
+    now = [1_000_000.0]
+    redis = FakeRedis()
+    start = datetime(2024, 3, 1, 9)
+
+    def matcher():
+        return StreamingTransferMatcher(redis, time_window=24 * 3600, clock=lambda: now[0])
+
+    stream = matcher()
+    offer = lambda row: asyncio.run(stream.offer(7, row))  # noqa: E731
+    assert offer({'id': 1, 'account_id': 'chk', 'amount': -250.0, 'date': start}) is None
+    assert offer({'id': 2, 'account_id': 'chk', 'amount': 250.0, 'date': start}) is None  # same account
+    assert offer({'id': 3, 'account_id': 'card', 'amount': -80.0, 'date': start}) is None
+    assert len(stream.pool(7)) == 3
+
+    # The worker restarts before the second leg arrives hours later
+    now[0] += 5 * 3600
+    stream = matcher()
+    assert asyncio.run(stream.restore()) == 3
+    partner, score = offer({'id': 4, 'account_id': 'sav', 'amount': 250.0, 'date': start + timedelta(seconds=30)})
+    assert partner.id == '1' and score == 1.0
+    assert len(stream.pool(7)) == 2 and set(redis.data['transfer:pending:7']) == {'2', '3'}
+
+    # Legs waiting longer than the window expire, in memory and in Redis
+    now[0] += 24 * 3600
+    assert offer({'id': 5, 'account_id': 'sav', 'amount': 80.0, 'date': start}) is None
+    assert set(stream.pool(7).legs) == {'5'} and set(redis.data['transfer:pending:7']) == {'5'}
+
+def test_restored_legs_match_rows_with_uuid_ids():
+    import asyncio
+    import uuid
+    from datetime import datetime
+    from transfer_stream import StreamingTransferMatcher
+    redis = FakeRedis()
+    household, outflow, inflow = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    start = datetime(2024, 3, 1, 9)
+
+    # asyncpg hands out uuid.UUID ids; Redis hands back strings after a restart
+    asyncio.run(StreamingTransferMatcher(redis).offer(
+        household, {'id': outflow, 'account_id': uuid.uuid4(), 'amount': -250.0, 'date': start}))
+    stream = StreamingTransferMatcher(redis)
+    assert asyncio.run(stream.restore()) == 1
+    partner, _ = asyncio.run(stream.offer(
+        household, {'id': inflow, 'account_id': uuid.uuid4(), 'amount': 250.0, 'date': start}))
+    assert partner.id == str(outflow)
+    assert not len(stream.pool(household)) and not redis.data[f'transfer:pending:{household}']
+
+def upsert_worker(rows):
+    """TransferWorker over in-memory rows whose UPDATEs honour the claim guard"""
+    from transfer_worker import TransferWorker
+    writes = []
+
+    class Transaction:
+        def __init__(self, conn):
+            self.conn = conn
+
+        async def __aenter__(self):
+            self.conn.pending = []
+
+        async def __aexit__(self, exc_type, *exc):
+            if exc_type is None:  # commit
+                for record in self.conn.pending:
+                    rows[record[4]].update(is_transfer=record[0], paired_transaction_id=record[2])
+                writes.append(self.conn.pending)
+            return False
+
+    class Connection:
+        def transaction(self):
+            return Transaction(self)
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def fetchval(self, query, *record):
+            assert 'AND is_transfer IS NOT TRUE' in query
+            if rows[record[4]]['is_transfer']:
+                return None
+            self.pending.append(record)
+            return record[4]
+
+        async def executemany(self, query, records):
+            self.pending.extend(records)
+
+    class Pool:
+        pause = None
+
+        def acquire(self):
+            return Connection()
+
+        async def fetchrow(self, query, transaction_id):
+            return dict(rows[transaction_id])
+
+        async def fetch(self, query, *args):
+            if 'FROM accounts' in query:
+                return [{'id': account} for account in ('chk', 'sav', 'card')]
+            if 'is_transfer IS NULL' in query:
+                return [dict(row) for row in rows.values() if row['is_transfer'] is None]
+            window = [dict(row) for row in rows.values() if not row['is_transfer']]
+            if self.pause:
+                await self.pause()
+            return window
+
+    worker = TransferWorker()
+    worker.db_pool, worker.redis_client = Pool(), FakeRedis()
+    worker.transfer_stream.redis_client = worker.redis_client
+    return worker, writes
+
+def upsert_rows():
+    from datetime import datetime, timedelta
+    start = datetime(2024, 3, 1, 9)
+    return {
+        'a': {'id': 'a', 'account_id': 'chk', 'amount': -120.0, 'date': start, 'household_id': 1,
+              'merchant_name': None, 'description': 'TRANSFER', 'is_transfer': None},
+        'b': {'id': 'b', 'account_id': 'sav', 'amount': 120.0, 'date': start + timedelta(minutes=40),
+              'household_id': 1, 'merchant_name': None, 'description': 'TRANSFER', 'is_transfer': None},
+        'c': {'id': 'c', 'account_id': 'card', 'amount': 120.0, 'date': start + timedelta(minutes=50),
+              'household_id': 1, 'merchant_name': None, 'description': 'TRANSFER', 'is_transfer': None},
+    }
+
+class UpsertMsg:
+    def __init__(self, transaction_id):
+        import json
+        self.data = json.dumps({'transaction_id': transaction_id}).encode()
+
+def test_upsert_event_flags_both_legs_on_arrival():
+    import asyncio
+    import json
+    worker, writes = upsert_worker(upsert_rows())
+    asyncio.run(worker.handle_upsert_message(UpsertMsg('a')))
+    assert not writes
+    asyncio.run(worker.handle_upsert_message(UpsertMsg('b')))
+
+    [records] = writes
+    assert sorted((record[4], record[2], record[1]) for record in records) == [
+        ('a', 'b', 'intra_household'), ('b', 'a', 'intra_household')
+    ]
+    cached = json.loads(worker.redis_client.data['transfer:a'])
+    assert cached['paired_transaction_id'] == 'b' and cached['confidence'] == pytest.approx(0.96)
+
+def test_stream_never_reclaims_legs_the_batch_sweep_settled():
+    import asyncio
+    rows = upsert_rows()
+    worker, writes = upsert_worker(rows)
+    asyncio.run(worker.handle_upsert_message(UpsertMsg('a')))
+
+    # The sweep paired 'a' with 'c' without the stream hearing of it: the
+    # guarded UPDATE refuses to overwrite it and nothing is written
+    rows['a'].update(is_transfer=True, paired_transaction_id='c')
+    assert asyncio.run(worker.match_arriving_leg(dict(rows['b']), 1)) is None
+    assert not writes and rows['b']['is_transfer'] is None
+    assert rows['a']['paired_transaction_id'] == 'c'
+
+    # Legs the sweep writes are evicted from the pool
+    asyncio.run(worker.handle_upsert_message(UpsertMsg('b')))
+    assert len(worker.transfer_stream.pool(1)) == 1
+    asyncio.run(worker.transfer_stream.discard(1, ['b', 'unknown']))
+    assert not len(worker.transfer_stream.pool(1))
+    assert not worker.redis_client.data['transfer:pending:1']
+
+def test_stream_claims_wait_for_a_running_sweep():
+    import asyncio
+    from datetime import timedelta
+    rows = upsert_rows()
+    rows['c']['date'] = rows['a']['date'] + timedelta(minutes=10)
+    worker, writes = upsert_worker(rows)
+    asyncio.run(worker.handle_upsert_message(UpsertMsg('a')))
+    late = rows.pop('b')
+
+    async def interleave():
+        started = asyncio.Event()
+
+        async def pause():
+            started.set()
+            for _ in range(10):
+                await asyncio.sleep(0)
+
+        # 'b' lands while the sweep is matching its snapshot of a and c
+        worker.db_pool.pause = pause
+        sweep = asyncio.ensure_future(worker.run_batch_processing(1))
+        await asyncio.wait_for(started.wait(), 5)
+        rows['b'] = late
+        await asyncio.gather(sweep, worker.handle_upsert_message(UpsertMsg('b')))
+
+    asyncio.run(interleave())
+    # The sweep's pair stands; 'b' waits for a counterpart of its own
+    assert (rows['a']['paired_transaction_id'], rows['c']['paired_transaction_id']) == ('c', 'a')
+    assert rows['b']['is_transfer'] is None and list(worker.transfer_stream.pool(1).legs) == ['b']
+    for row in rows.values():
+        if row['is_transfer']:
+            assert rows[row['paired_transaction_id']]['paired_transaction_id'] == row['id']
+    assert not worker.household_locks
+
+def test_batch_duplicates_see_past_busy_neighbours():
+    import asyncio
+    from datetime import datetime, timedelta
+    from transfer_worker import TransferWorker
+    start = datetime(2024, 3, 1, 12)
+    # 40 unrelated purchases land between a charge and its re-import
+    rows = [{'id': 'charge', 'account_id': 'chk', 'amount': -42.5, 'date': start,
+             'merchant_name': 'Blue Cafe', 'description': 'CARD PURCHASE'}]
+    rows += [{'id': f'other-{i}', 'account_id': 'chk', 'amount': -42.5, 'date': start + timedelta(seconds=30 + i),
+              'merchant_name': f'Shop {i}', 'description': 'CARD PURCHASE'} for i in range(40)]
+
+    class Pool:
+        async def fetch(self, query, *args):
+            if 'FROM accounts' in query:
+                return [{'id': 'chk'}]
+            return [row for row in rows if args[1] <= row['date'] <= args[2]]
+
+    worker = TransferWorker()
+    worker.db_pool = Pool()
+    reimport = {'id': 'reimport', 'account_id': 'chk', 'amount': -42.5, 'date': start + timedelta(minutes=2),
+                'merchant_name': 'Blue Cafe', 'description': 'CARD PURCHASE'}
+    detection = asyncio.run(worker.detect_transfers(reimport, 1))
+    assert detection.paired_transaction_id == 'charge' and detection.transfer_type == 'duplicate'
+    assert not asyncio.run(worker.detect_transfers(dict(rows[5]), 1)).is_transfer
+    assert asyncio.run(worker.find_duplicates(reimport, 1)) == detection
+    assert asyncio.run(worker.find_duplicates(dict(rows[5]), 1)) is None
+
+def test_pending_copies_flag_only_the_later_one():
+    from datetime import datetime, timedelta
+    from transfer_matcher import BatchTransferMatcher, TransactionSlice
+    start = datetime(2024, 3, 1, 12)
+    charge = {'id': 'b', 'account_id': 'chk', 'amount': -42.5, 'date': start,
+              'merchant_name': 'Blue Cafe', 'description': 'CARD PURCHASE'}
+    # Two unprocessed copies in one batch, and two with the same timestamp
+    rows = [dict(charge, id='a', date=start + timedelta(minutes=1)), charge,
+            dict(charge, id='d', date=start + timedelta(hours=3)), dict(charge, id='c', date=start + timedelta(hours=3))]
+    matches = BatchTransferMatcher().match(TransactionSlice(rows), [0, 1, 2, 3])
+
+    assert {rows[row]['id']: (kind, rows[partner]['id']) for row, (kind, partner, _) in matches.items()} == {
+        'a': ('duplicate', 'b'), 'd': ('duplicate', 'c'),
+    }
@@ -0,0 +1,295 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components, min_weight_full_bipartite_matching
+
+logger = logging.getLogger(__name__)
+
+# (max gap in seconds, similarity) steps of TransferWorker.calculate_time_similarity
+TIME_SIMILARITY_STEPS = ((60, 1.0), (3600, 0.9), (86400, 0.7), (604800, 0.3))
+
+# Score weights: transfers are amount/time, duplicates amount/time/merchant/description
+TRANSFER_WEIGHTS = {'amount': 0.6, 'time': 0.4}
+DUPLICATE_WEIGHTS = {'amount': 0.4, 'time': 0.3, 'merchant': 0.2, 'description': 0.1}
+
+def time_similarity(gaps: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_time_similarity over absolute gaps in seconds"""
+    gaps = np.abs(gaps)
+    return np.select(
+        [gaps <= limit for limit, _ in TIME_SIMILARITY_STEPS],
+        [similarity for _, similarity in TIME_SIMILARITY_STEPS],
+        default=0.0,
+    )
+
+def max_time_gap(time_weight: float, threshold: float) -> int:
+    """Largest gap at which a pair can still reach ``threshold``
+
+    Assumes every other score component is perfect, so pairs further apart
+    can be skipped without scoring them.
+    """
+    for limit, similarity in reversed(TIME_SIMILARITY_STEPS):
+        if 1.0 - time_weight * (1.0 - similarity) >= threshold - 1e-9:
+            return limit
+    return 0
+
+def amount_similarity(first: np.ndarray, second: np.ndarray, tolerance: int) -> np.ndarray:
+    """Vectorized calculate_amount_similarity over int64 cents"""
+    magnitude = np.maximum(np.abs(first), np.abs(second))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = 1.0 - np.abs(np.abs(first) - np.abs(second)) / magnitude
+    similarity = np.clip(np.nan_to_num(ratio), 0.0, None)
+    matched = (np.abs(first + second) <= tolerance) | (np.abs(first - second) <= tolerance)
+    similarity = np.where(matched, 1.0, similarity)
+    similarity = np.where((first == 0) != (second == 0), 0.0, similarity)
+    return np.where((first == 0) & (second == 0), 1.0, similarity)
+
+def tokenize(text: Optional[str]) -> Optional[frozenset]:
+    return frozenset(text.lower().split()) if text else None
+
+def jaccard(first: Optional[frozenset], second: Optional[frozenset]) -> float:
+    """calculate_text_similarity over pre-tokenized word sets"""
+    if first is None or second is None:
+        return 0.0
+    if not first and not second:
+        return 1.0
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+def to_seconds(value: Any) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, date):
+        return int(datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp())
+    return int(value)
+
+def expand_ranges(rows: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Every (row, position) with lo <= position < hi, as two flat arrays"""
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    starts = np.cumsum(counts) - counts
+    positions = np.arange(total, dtype=np.int64) + np.repeat(lo - starts, counts)
+    return np.repeat(rows, counts), positions
+
+def best_per_row(rows: np.ndarray, partners: np.ndarray, scores: np.ndarray,
+                 gaps: np.ndarray) -> Dict[int, Tuple[int, float]]:
+    """Highest-scoring partner per row, the closest in time on ties"""
+    if not len(rows):
+        return {}
+    order = np.lexsort((np.abs(gaps), -scores, rows))
+    rows, partners, scores = rows[order], partners[order], scores[order]
+    _, first = np.unique(rows, return_index=True)
+    return {int(rows[i]): (int(partners[i]), float(scores[i])) for i in first}
+
+def assign_pairs(amounts: np.ndarray, rows: np.ndarray, partners: np.ndarray, scores: np.ndarray,
+                 gaps: np.ndarray, time_window: int) -> Dict[int, Tuple[int, float]]:
+    """Globally optimal one-to-one pairing of transfer candidate edges
+
+    Every edge joins an outflow and an inflow, so the candidates form a
+    bipartite graph. Each connected component is solved as a sparse
+    min-weight full bipartite matching preferring, in order, the most pairs, the highest total
+    score and the smallest total time gap. Components with a single edge
+    are taken as they are. Returns {position: (partner, score)} for both
+    legs of every chosen pair.
+    """
+    if not len(rows):
+        return {}
+
+    outflows = np.where(amounts[rows] < 0, rows, partners)
+    inflows = np.where(amounts[rows] < 0, partners, rows)
+    spans = np.abs(gaps) / (time_window + 1)
+
+    # An edge found from both of its legs is kept once
+    size = len(amounts)
+    _, keep = np.unique(outflows * size + inflows, return_index=True)
+    outflows, inflows, scores, spans = outflows[keep], inflows[keep], scores[keep], spans[keep]
+
+    graph = coo_matrix((np.ones(len(outflows)), (outflows, inflows)), shape=(size, size))
+    _, labels = connected_components(graph, directed=False)
+    components = labels[outflows]
+    edge_counts = np.bincount(components)
+
+    chosen = [np.flatnonzero(edge_counts[components] == 1)]
+    contested = np.flatnonzero(edge_counts[components] > 1)
+    contested = contested[np.argsort(components[contested], kind='stable')]
+    if len(contested):
+        bounds = np.flatnonzero(np.diff(components[contested])) + 1
+        for block in np.split(contested, bounds):
+            out_nodes, out_index = np.unique(outflows[block], return_inverse=True)
+            in_nodes, in_index = np.unique(inflows[block], return_inverse=True)
+            n_out, n_in = len(out_nodes), len(in_nodes)
+            # Summed over the block, the gap term stays below one score step
+            costs = 2.0 - scores[block] + spans[block] * (0.01 / len(block))
+            # Each leg may fall back to its own dummy partner; dummies pair with
+            # each other along mirrored edges, so a perfect matching always
+            # exists and leaving a leg unpaired costs more than any score gain
+            unpaired = len(block) + 2.0
+            out_range, in_range = np.arange(n_out), np.arange(n_in)
+            graph = csr_matrix((
+                np.concatenate([costs, np.ones(len(block)),
+                                np.full(n_out, unpaired), np.full(n_in, unpaired)]),
+                (np.concatenate([out_index, n_out + in_index, out_range, n_out + in_range]),
+                 np.concatenate([in_index, n_in + out_index, n_in + out_range, in_range])),
+            ), shape=(n_out + n_in, n_in + n_out))
+            picked_out, picked_in = min_weight_full_bipartite_matching(graph)
+            real = (picked_out < n_out) & (picked_in < n_in)
+            keys = out_index * n_in + in_index
+            order = np.argsort(keys)
+            found = np.searchsorted(keys, picked_out[real] * n_in + picked_in[real], sorter=order)
+            chosen.append(block[order[found]])
+
+    chosen = np.concatenate(chosen)
+    pairs: Dict[int, Tuple[int, float]] = {}
+    for out_leg, in_leg, score in zip(outflows[chosen].tolist(), inflows[chosen].tolist(),
+                                      scores[chosen].tolist()):
+        pairs[out_leg] = (in_leg, score)
+        pairs[in_leg] = (out_leg, score)
+    return pairs
+
+class TransactionSlice:
+    """A household's transactions in one time window, held as columns
+
+    Amounts are int64 cents and times int64 epoch seconds; merchant and
+    description word sets are tokenized once per row.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.ids = [row['id'] for row in rows]
+        self.position = {transaction_id: i for i, transaction_id in enumerate(self.ids)}
+        account_codes: Dict[Any, int] = {}
+        self.accounts = np.array(
+            [account_codes.setdefault(row.get('account_id'), len(account_codes)) for row in rows],
+            dtype=np.int64,
+        )
+        self.amounts = np.array([round(float(row['amount']) * 100) for row in rows], dtype=np.int64)
+        self.times = np.array([to_seconds(row['date']) for row in rows], dtype=np.int64)
+        # Rank by (time, id): of two duplicates, the earlier is the original
+        self.sequence = np.empty(len(rows), dtype=np.int64)
+        self.sequence[sorted(range(len(rows)), key=lambda i: (self.times[i], str(self.ids[i])))] = np.arange(len(rows))
+        self.merchants = [tokenize(row.get('merchant_name')) for row in rows]
+        self.descriptions = [tokenize(row.get('description')) for row in rows]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def merge(cls, loaded: Iterable[Dict[str, Any]], batch: Iterable[Dict[str, Any]]) -> 'TransactionSlice':
+        """Loaded window rows plus batch rows, the batch version winning per id"""
+        rows = {row['id']: dict(row) for row in loaded}
+        rows.update((row['id'], row) for row in batch)
+        return cls(list(rows.values()))
+
+class BatchTransferMatcher:
+    """Scores a batch against a window slice in one vectorized pass
+
+    Transfer candidates come from an interval join on a slice sorted by
+    (absolute amount, time): for each batch row, every row with an
+    absolute amount within tolerance and time within reach is one
+    contiguous run found by binary search. Duplicate candidates come from
+    the same slice sorted by time. Transfer legs are then paired one to
+    one by assign_pairs; rows left without a leg fall through to duplicate
+    scoring, where each row takes its best partner, the closest in time on
+    ties.
+    """
+
+    def __init__(self, amount_tolerance: int = 1, time_window: int = 24 * 3600,
+                 transfer_threshold: float = 0.9, duplicate_threshold: float = 0.95):
+        self.amount_tolerance = amount_tolerance
+        self.time_window = time_window
+        self.transfer_threshold = transfer_threshold
+        self.duplicate_threshold = duplicate_threshold
+
+    def transfer_pairs(self, txs: TransactionSlice, batch: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """(row, partner, score, gap) for every scoring opposite-sign pair"""
+        gap = min(self.time_window, max_time_gap(TRANSFER_WEIGHTS['time'], self.transfer_threshold))
+        magnitude = np.abs(txs.amounts)
+        offset = txs.times - txs.times.min()
+        order = np.lexsort((offset, magnitude))
+        keys = (magnitude[order] << 32) | offset[order]
+
+        rows, positions = [], []
+        start = np.maximum(offset[batch] - gap, 0)
+        stop = offset[batch] + gap
+        for delta in range(-self.amount_tolerance, self.amount_tolerance + 1):
+            target = magnitude[batch] + delta
+            valid = target >= 0
+            lo = np.searchsorted(keys, (target << 32) | start, side='left')
+            hi = np.searchsorted(keys, (target << 32) | stop, side='right')
+            found_rows, found_positions = expand_ranges(batch[valid], lo[valid], hi[valid])
+            rows.append(found_rows)
+            positions.append(found_positions)
+
+        rows = np.concatenate(rows)
+        partners = order[np.concatenate(positions)]
+        keep = (
+            (np.sign(txs.amounts[rows]) * np.sign(txs.amounts[partners]) < 0)
+            & (np.abs(txs.amounts[rows] + txs.amounts[partners]) <= self.amount_tolerance)
+            & (txs.accounts[rows] != txs.accounts[partners])
+        )
+        rows, partners = rows[keep], partners[keep]
+        gaps = txs.times[partners] - txs.times[rows]
+        scores = TRANSFER_WEIGHTS['amount'] + TRANSFER_WEIGHTS['time'] * time_similarity(gaps)
+        keep = scores >= self.transfer_threshold
+        return rows[keep], partners[keep], scores[keep], gaps[keep]
+
+    def duplicate_pairs(self, txs: TransactionSlice, batch: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """(row, partner, score, gap) for every pair scoring as a duplicate
+
+        Only partners earlier by (time, id) count, so of two copies only the
+        later one is a duplicate and the earlier stays the original, even
+        when both are in the batch.
+        """
+        gap = min(self.time_window, max_time_gap(DUPLICATE_WEIGHTS['time'], self.duplicate_threshold))
+        order = np.argsort(txs.times, kind='stable')
+        times = txs.times[order]
+        lo = np.searchsorted(times, txs.times[batch] - gap, side='left')
+        hi = np.searchsorted(times, txs.times[batch] + gap, side='right')
+        rows, positions = expand_ranges(batch, lo, hi)
+        partners = order[positions]
+        keep = txs.sequence[partners] < txs.sequence[rows]
+        rows, partners = rows[keep], partners[keep]
+
+        gaps = txs.times[partners] - txs.times[rows]
+        partial = (
+            DUPLICATE_WEIGHTS['amount'] * amount_similarity(txs.amounts[rows], txs.amounts[partners],
+                                                            self.amount_tolerance)
+            + DUPLICATE_WEIGHTS['time'] * time_similarity(gaps)
+        )
+        # Text is only scored for pairs that could still reach the threshold
+        text_weight = DUPLICATE_WEIGHTS['merchant'] + DUPLICATE_WEIGHTS['description']
+        keep = partial + text_weight >= self.duplicate_threshold - 1e-9
+        rows, partners, partial, gaps = rows[keep], partners[keep], partial[keep], gaps[keep]
+
+        scores = partial + np.array([
+            DUPLICATE_WEIGHTS['merchant'] * jaccard(txs.merchants[row], txs.merchants[partner])
+            + DUPLICATE_WEIGHTS['description'] * jaccard(txs.descriptions[row], txs.descriptions[partner])
+            for row, partner in zip(rows.tolist(), partners.tolist())
+        ], dtype=np.float64)
+        keep = scores >= self.duplicate_threshold
+        return rows[keep], partners[keep], scores[keep], gaps[keep]
+
+    def match(self, txs: TransactionSlice, batch: np.ndarray,
+              allow_transfers: bool = True) -> Dict[int, Tuple[str, int, float]]:
+        """Best (transfer_type, partner position, score) per batch position with a match"""
+        batch = np.asarray(batch, dtype=np.int64)
+        if not len(batch) or not len(txs):
+            return {}
+
+        matches: Dict[int, Tuple[str, int, float]] = {}
+        if allow_transfers:
+            pairs = assign_pairs(txs.amounts, *self.transfer_pairs(txs, batch), self.time_window)
+            for row in batch.tolist():
+                if row in pairs:
+                    matches[row] = ('intra_household', *pairs[row])
+
+        remaining = np.array([row for row in batch.tolist() if row not in matches], dtype=np.int64)
+        if len(remaining):
+            for row, (partner, score) in best_per_row(*self.duplicate_pairs(txs, remaining)).items():
+                matches[row] = ('duplicate', partner, score)
+        return matches
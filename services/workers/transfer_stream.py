@@ -0,0 +1,203 @@
+# Created automatically by Cursor AI (2026-10-16)
+
+import heapq
+import itertools
+import json
+import logging
+import time
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from transfer_matcher import TRANSFER_WEIGHTS, max_time_gap, time_similarity, to_seconds
+
+logger = logging.getLogger(__name__)
+
+PENDING_POOL_PREFIX = "transfer:pending:"
+
+@dataclass
+class PendingLeg:
+    """An unmatched transfer leg waiting for its counterpart
+
+    Ids are kept as text: asyncpg returns uuid.UUID, while legs restored
+    from Redis come back as strings, and both must compare equal.
+    """
+    id: str
+    account_id: Optional[str]
+    cents: int
+    seconds: int
+    added_at: float
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], added_at: float) -> 'PendingLeg':
+        account_id = row.get('account_id')
+        return cls(str(row['id']), None if account_id is None else str(account_id),
+                   round(float(row['amount']) * 100), to_seconds(row['date']), added_at)
+
+class PendingTransferPool:
+    """One household's unmatched legs, ordered by (absolute cents, time)
+
+    A new leg finds its counterpart with one binary search per cent of
+    amount tolerance; the candidates are the contiguous run of legs with
+    that absolute amount inside the reachable time gap. Legs leave the pool
+    when paired or ``time_window`` seconds after they entered it.
+    """
+
+    def __init__(self, amount_tolerance: int = 1, time_window: int = 24 * 3600,
+                 threshold: float = 0.9):
+        self.amount_tolerance = amount_tolerance
+        self.time_window = time_window
+        self.threshold = threshold
+        self.max_gap = min(time_window, max_time_gap(TRANSFER_WEIGHTS['time'], threshold))
+        self.keys: List[Tuple[int, int, int]] = []
+        self.legs: Dict[Any, PendingLeg] = {}
+        self.sequence: Dict[Any, int] = {}
+        self.leg_ids: Dict[int, Any] = {}
+        self.expiry: List[Tuple[float, int, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.legs)
+
+    def _key(self, leg_id: Any) -> Tuple[int, int, int]:
+        leg = self.legs[leg_id]
+        return abs(leg.cents), leg.seconds, self.sequence[leg_id]
+
+    def add(self, leg: PendingLeg):
+        if leg.id in self.legs:
+            self.remove(leg.id)
+        seq = next(self._counter)
+        self.legs[leg.id] = leg
+        self.sequence[leg.id] = seq
+        insort(self.keys, (abs(leg.cents), leg.seconds, seq))
+        self.leg_ids[seq] = leg.id
+        heapq.heappush(self.expiry, (leg.added_at + self.time_window, seq, leg.id))
+
+    def remove(self, leg_id: Any) -> Optional[PendingLeg]:
+        if leg_id not in self.legs:
+            return None
+        key = self._key(leg_id)
+        del self.keys[bisect_left(self.keys, key)]
+        del self.leg_ids[key[2]]
+        del self.sequence[leg_id]
+        return self.legs.pop(leg_id)
+
+    def expire(self, now: float) -> List[PendingLeg]:
+        """Drop legs whose wait is over; returns them"""
+        expired = []
+        while self.expiry and self.expiry[0][0] <= now:
+            _, seq, leg_id = heapq.heappop(self.expiry)
+            if self.sequence.get(leg_id) == seq:
+                expired.append(self.remove(leg_id))
+        return expired
+
+    def find(self, leg: PendingLeg) -> Optional[Tuple[PendingLeg, float]]:
+        """Best waiting counterpart of ``leg``: highest score, then closest in time"""
+        magnitude = abs(leg.cents)
+        candidates = []
+        for delta in range(-self.amount_tolerance, self.amount_tolerance + 1):
+            lo = bisect_left(self.keys, (magnitude + delta, leg.seconds - self.max_gap))
+            hi = bisect_right(self.keys, (magnitude + delta, leg.seconds + self.max_gap, float('inf')))
+            for _, _, seq in self.keys[lo:hi]:
+                other = self.legs[self.leg_ids[seq]]
+                if (other.cents * leg.cents < 0 and other.account_id != leg.account_id
+                        and abs(other.cents + leg.cents) <= self.amount_tolerance):
+                    candidates.append(other)
+        if not candidates:
+            return None
+
+        gaps = np.array([other.seconds - leg.seconds for other in candidates], dtype=np.int64)
+        scores = TRANSFER_WEIGHTS['amount'] + TRANSFER_WEIGHTS['time'] * time_similarity(gaps)
+        best = int(np.lexsort((np.abs(gaps), -scores))[0])
+        if scores[best] < self.threshold:
+            return None
+        return candidates[best], float(scores[best])
+
+class StreamingTransferMatcher:
+    """Pairs transfer legs as they arrive, across restarts
+
+    Keeps a PendingTransferPool per household. Every offer is checkpointed
+    to a Redis hash per household (one pipeline per event) and ``restore``
+    rebuilds the pools from those hashes on startup.
+    """
+
+    def __init__(self, redis_client=None, amount_tolerance: int = 1,
+                 time_window: int = 24 * 3600, threshold: float = 0.9,
+                 clock: Callable[[], float] = time.time):
+        self.redis_client = redis_client
+        self.amount_tolerance = amount_tolerance
+        self.time_window = time_window
+        self.threshold = threshold
+        self.clock = clock
+        self.pools: Dict[str, PendingTransferPool] = {}
+
+    def pool(self, household_id: Any) -> PendingTransferPool:
+        """A household's pool; ids are keyed as text, like the Redis keys"""
+        household_id = str(household_id)
+        if household_id not in self.pools:
+            self.pools[household_id] = PendingTransferPool(
+                self.amount_tolerance, self.time_window, self.threshold
+            )
+        return self.pools[household_id]
+
+    async def offer(self, household_id: Any, row: Dict[str, Any]) -> Optional[Tuple[PendingLeg, float]]:
+        """Pair ``row`` with a waiting leg, or leave it waiting
+
+        Returns (counterpart, score) when paired; the counterpart leaves
+        the pool and ``row`` never enters it.
+        """
+        now = self.clock()
+        pool = self.pool(household_id)
+        leg = PendingLeg.from_row(row, now)
+        removed = [expired.id for expired in pool.expire(now)]
+        if pool.remove(leg.id):
+            removed.append(leg.id)
+
+        match = pool.find(leg) if leg.cents else None
+        if match:
+            pool.remove(match[0].id)
+            removed.append(match[0].id)
+        elif leg.cents:
+            pool.add(leg)
+
+        await self._checkpoint(household_id, removed, None if match or not leg.cents else leg)
+        return match
+
+    async def discard(self, household_id: Any, leg_ids: List[Any]) -> int:
+        """Evict legs settled elsewhere (e.g. by the batch sweep); returns how many waited"""
+        pool = self.pools.get(str(household_id))
+        if pool is None:
+            return 0
+        removed = [leg.id for leg in (pool.remove(str(leg_id)) for leg_id in leg_ids) if leg]
+        await self._checkpoint(household_id, removed, None)
+        return len(removed)
+
+    async def _checkpoint(self, household_id: Any, removed: List[Any], added: Optional[PendingLeg]):
+        if not self.redis_client or not (removed or added):
+            return
+        key = f"{PENDING_POOL_PREFIX}{household_id}"
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            if removed:
+                pipe.hdel(key, *removed)
+            if added:
+                pipe.hset(key, added.id, json.dumps(asdict(added)))
+                pipe.expire(key, self.time_window)
+            await pipe.execute()
+
+    async def restore(self) -> int:
+        """Rebuild the pools from Redis, skipping legs that expired meanwhile"""
+        if not self.redis_client:
+            return 0
+
+        now = self.clock()
+        restored = 0
+        async for key in self.redis_client.scan_iter(match=f"{PENDING_POOL_PREFIX}*"):
+            pool = self.pool(key[len(PENDING_POOL_PREFIX):])
+            for value in (await self.redis_client.hgetall(key)).values():
+                data = json.loads(value)
+                leg = PendingLeg(**dict(data, id=str(data['id'])))
+                if leg.added_at + self.time_window > now:
+                    pool.add(leg)
+                    restored += 1
+        logger.info(f"Restored {restored} pending transfer legs for {len(self.pools)} households")
+        return restored
@@ -3,14 +3,18 @@
 import asyncio
 import logging
 import os
-from typing import Dict, List, Optional, Tuple, Set
+import weakref
+from typing import Any, Dict, List, Optional, Tuple, Set
 import asyncpg
 import redis.asyncio as redis
+import nats
 import numpy as np
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import json
 import hashlib
+from transfer_matcher import BatchTransferMatcher, TransactionSlice
+from transfer_stream import StreamingTransferMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +28,9 @@ class TransferPair:
     transfer_type: str  # 'intra_household', 'duplicate', 'external'
     created_at: datetime
 
+class TransferLegClaimed(Exception):
+    """A streamed pair's leg was already marked by someone else"""
+
 @dataclass
 class TransferDetection:
     """Transfer detection result"""
@@ -40,6 +47,7 @@ class TransferWorker:
     def __init__(self):
         self.db_pool: Optional[asyncpg.Pool] = None
         self.redis_client: Optional[redis.Redis] = None
+        self.nats_client: Optional[nats.NatsClient] = None
         
         # Configuration
         self.amount_tolerance = 0.01  # 1 cent tolerance for amount matching
@@ -51,6 +59,12 @@ class TransferWorker:
         # Transfer detection settings
         self.duplicate_threshold = 0.95  # Similarity threshold for duplicates
         self.intra_household_threshold = 0.9  # Confidence threshold for intra-household transfers
+        
+        # Unmatched legs waiting for their counterpart on tx.upsert
+        self.transfer_stream = self.streaming_matcher()
+        # Serialize the stream and the batch sweep per household; a lock
+        # lives only while someone holds or waits on it
+        self.household_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
     
     async def connect(self):
         """Connect to database and Redis"""
@@ -75,7 +89,17 @@ class TransferWorker:
             socket_timeout=5
         )
         
-        logger.info("Transfer Worker connected to database and Redis")
+        # Pending legs survive restarts through their Redis checkpoint
+        self.transfer_stream.redis_client = self.redis_client
+        await self.transfer_stream.restore()
+        
+        # NATS connection for real-time matching
+        self.nats_client = await nats.connect(
+            os.getenv("NATS_URL", "nats://localhost:4222")
+        )
+        await self.nats_client.subscribe("tx.upsert", cb=self.handle_upsert_message)
+        
+        logger.info("Transfer Worker connected to database, Redis and NATS")
     
     async def disconnect(self):
         """Disconnect from services"""
@@ -83,6 +107,8 @@ class TransferWorker:
             await self.db_pool.close()
         if self.redis_client:
             await self.redis_client.close()
+        if self.nats_client:
+            await self.nats_client.close()
         logger.info("Transfer Worker disconnected")
     
     def calculate_amount_similarity(self, amount1: float, amount2: float) -> float:
@@ -235,195 +261,230 @@ class TransferWorker:
         
         return None
     
-    async def find_duplicates(self, transaction: Dict, household_id: int) -> Optional[TransferDetection]:
-        """Find duplicate transactions"""
+    def batch_matcher(self) -> BatchTransferMatcher:
+        """Vectorized matcher using the worker's current thresholds"""
+        return BatchTransferMatcher(
+            amount_tolerance=round(self.amount_tolerance * 100),
+            time_window=self.time_window_hours * 3600,
+            transfer_threshold=self.intra_household_threshold,
+            duplicate_threshold=self.duplicate_threshold,
+        )
+    
+    def streaming_matcher(self) -> StreamingTransferMatcher:
+        """Real-time leg matcher using the worker's current thresholds"""
+        return StreamingTransferMatcher(
+            redis_client=self.redis_client,
+            amount_tolerance=round(self.amount_tolerance * 100),
+            time_window=self.time_window_hours * 3600,
+            threshold=self.intra_household_threshold,
+        )
+    
+    async def load_transfer_window(self, household_id: int, time_start: datetime,
+                                   time_end: datetime) -> List[Dict]:
+        """Load every unmatched household transaction in a time window"""
         if not self.db_pool:
-            return None
-        
-        try:
-            transaction_id = transaction["id"]
-            amount = float(transaction["amount"])
-            date = transaction["date"]
-            merchant_name = transaction.get("merchant_name", "")
-            description = transaction.get("description", "")
-            
-            # Search for similar transactions within time window
-            time_start = date - timedelta(hours=self.time_window_hours)
-            time_end = date + timedelta(hours=self.time_window_hours)
-            
-            rows = await self.db_pool.fetch("""
-                SELECT id, amount, date, merchant_name, description, account_id
-                FROM transactions
-                WHERE household_id = $1 
-                AND id != $2
-                AND date BETWEEN $3 AND $4
-                AND is_transfer = false
-                ORDER BY ABS(date - $5) ASC
-                LIMIT 20
-            """, household_id, transaction_id, time_start, time_end, date)
-            
-            best_match = None
-            best_score = 0
-            
-            for row in rows:
-                # Calculate similarity scores
-                amount_similarity = self.calculate_amount_similarity(amount, row["amount"])
-                time_similarity = self.calculate_time_similarity(date, row["date"])
-                merchant_similarity = self.calculate_text_similarity(merchant_name, row["merchant_name"] or "")
-                description_similarity = self.calculate_text_similarity(description, row["description"] or "")
-                
-                # Combined score (weighted average)
-                score = (
-                    amount_similarity * 0.4 +
-                    time_similarity * 0.3 +
-                    merchant_similarity * 0.2 +
-                    description_similarity * 0.1
-                )
-                
-                if score > best_score and score >= self.duplicate_threshold:
-                    best_score = score
-                    best_match = row
-            
-            if best_match:
-                return TransferDetection(
-                    transaction_id=transaction_id,
-                    is_transfer=True,
-                    transfer_type="duplicate",
-                    paired_transaction_id=best_match["id"],
-                    confidence=best_score,
-                    explanation=f"Duplicate transaction (confidence: {best_score:.2f})"
-                )
-        
-        except Exception as e:
-            logger.error(f"Error finding duplicates: {e}")
+            return []
         
-        return None
+        rows = await self.db_pool.fetch("""
+            SELECT id, amount, date, merchant_name, description, account_id
+            FROM transactions
+            WHERE household_id = $1
+            AND date BETWEEN $2 AND $3
+            AND is_transfer IS NOT TRUE
+        """, household_id, time_start, time_end)
+        return [dict(row) for row in rows]
     
-    async def detect_transfers(self, transaction: Dict, household_id: int) -> TransferDetection:
-        """Detect transfers for a single transaction"""
-        # Check cache first
-        cache_key = f"{self.transfer_cache_prefix}{transaction['id']}"
-        if self.redis_client:
-            cached = await self.redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
-                return TransferDetection(**cached_data)
-        
-        # Try intra-household transfer detection first
-        intra_transfer = await self.find_intra_household_transfers(transaction, household_id)
-        if intra_transfer:
-            # Cache the result
-            if self.redis_client:
-                await self.redis_client.setex(
-                    cache_key,
-                    self.cache_ttl,
-                    json.dumps({
-                        "transaction_id": intra_transfer.transaction_id,
-                        "is_transfer": intra_transfer.is_transfer,
-                        "transfer_type": intra_transfer.transfer_type,
-                        "paired_transaction_id": intra_transfer.paired_transaction_id,
-                        "confidence": intra_transfer.confidence,
-                        "explanation": intra_transfer.explanation
-                    })
-                )
-            return intra_transfer
-        
-        # Try duplicate detection
-        duplicate = await self.find_duplicates(transaction, household_id)
-        if duplicate:
-            # Cache the result
-            if self.redis_client:
-                await self.redis_client.setex(
-                    cache_key,
-                    self.cache_ttl,
-                    json.dumps({
-                        "transaction_id": duplicate.transaction_id,
-                        "is_transfer": duplicate.is_transfer,
-                        "transfer_type": duplicate.transfer_type,
-                        "paired_transaction_id": duplicate.paired_transaction_id,
-                        "confidence": duplicate.confidence,
-                        "explanation": duplicate.explanation
-                    })
-                )
-            return duplicate
+    def _build_detection(self, transaction: Dict, txs: TransactionSlice,
+                         match: Optional[Tuple[str, int, float]]) -> TransferDetection:
+        if match is None:
+            return TransferDetection(
+                transaction_id=transaction["id"],
+                is_transfer=False,
+                transfer_type=None,
+                paired_transaction_id=None,
+                confidence=1.0,
+                explanation="No transfer detected"
+            )
         
-        # No transfer detected
-        no_transfer = TransferDetection(
+        transfer_type, partner, score = match
+        partner_row = txs.rows[partner]
+        if transfer_type == "intra_household":
+            explanation = f"Intra-household transfer to account {partner_row['account_id']} (confidence: {score:.2f})"
+        else:
+            explanation = f"Duplicate transaction (confidence: {score:.2f})"
+        return TransferDetection(
             transaction_id=transaction["id"],
-            is_transfer=False,
-            transfer_type=None,
-            paired_transaction_id=None,
-            confidence=1.0,
-            explanation="No transfer detected"
+            is_transfer=True,
+            transfer_type=transfer_type,
+            paired_transaction_id=partner_row["id"],
+            confidence=score,
+            explanation=explanation
         )
+    
+    async def cache_detections(self, detections: List[TransferDetection]):
+        """Cache detection results in one Redis round trip"""
+        if not self.redis_client or not detections:
+            return
         
-        # Cache the result
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for detection in detections:
+                pipe.setex(
+                    f"{self.transfer_cache_prefix}{detection.transaction_id}",
+                    self.cache_ttl,
+                    json.dumps(asdict(detection), default=str)
+                )
+            await pipe.execute()
+    
+    async def detect_transfers_batch(self, transactions: List[Dict], household_id: int) -> List[TransferDetection]:
+        """Detect transfers for a batch with a constant number of round trips
+        
+        Cached results come from one MGET. The rest are matched against a
+        single window slice of the household (one accounts query, one
+        transactions query): intra-household transfers first, then
+        duplicates, each transaction taking its best partner.
+        """
+        detections: Dict[Any, TransferDetection] = {}
         if self.redis_client:
-            await self.redis_client.setex(
-                cache_key,
-                self.cache_ttl,
-                json.dumps({
-                    "transaction_id": no_transfer.transaction_id,
-                    "is_transfer": no_transfer.is_transfer,
-                    "transfer_type": no_transfer.transfer_type,
-                    "paired_transaction_id": no_transfer.paired_transaction_id,
-                    "confidence": no_transfer.confidence,
-                    "explanation": no_transfer.explanation
-                })
+            cached = await self.redis_client.mget(
+                [f"{self.transfer_cache_prefix}{transaction['id']}" for transaction in transactions]
+            )
+            for transaction, value in zip(transactions, cached):
+                if value:
+                    detections[transaction["id"]] = TransferDetection(**json.loads(value))
+        
+        pending = [transaction for transaction in transactions if transaction["id"] not in detections]
+        if pending:
+            household_accounts = await self.get_household_accounts(household_id)
+            
+            window = timedelta(hours=self.time_window_hours)
+            dates = [transaction["date"] for transaction in pending]
+            loaded = await self.load_transfer_window(household_id, min(dates) - window, max(dates) + window)
+            
+            txs = TransactionSlice.merge(loaded, pending)
+            matches = self.batch_matcher().match(
+                txs,
+                [txs.position[transaction["id"]] for transaction in pending],
+                allow_transfers=len(household_accounts) >= 2
             )
+            fresh = [
+                self._build_detection(transaction, txs, matches.get(txs.position[transaction["id"]]))
+                for transaction in pending
+            ]
+            detections.update((detection.transaction_id, detection) for detection in fresh)
+            await self.cache_detections(fresh)
+        
+        return [detections[transaction["id"]] for transaction in transactions]
+    
+    async def detect_transfers(self, transaction: Dict, household_id: int) -> TransferDetection:
+        """Detect transfers for a single transaction"""
+        return (await self.detect_transfers_batch([transaction], household_id))[0]
+    
+    async def find_duplicates(self, transaction: Dict, household_id: int) -> Optional[TransferDetection]:
+        """The transaction's duplicate detection, if it is a duplicate
         
-        return no_transfer
+        A thin wrapper over detect_transfers: the transaction is scored
+        against every row in reach of its household's window slice.
+        """
+        detection = await self.detect_transfers(transaction, household_id)
+        return detection if detection.transfer_type == "duplicate" else None
     
     async def process_transaction_transfers(self, transactions: List[Dict], household_id: int) -> List[Dict]:
         """Process transfers for a batch of transactions"""
         if not transactions:
             return transactions
         
-        processed_transactions = []
-        
-        for transaction in transactions:
-            try:
-                # Detect transfers
-                transfer_detection = await self.detect_transfers(transaction, household_id)
-                
-                # Update transaction with transfer information
-                transaction["is_transfer"] = transfer_detection.is_transfer
-                transaction["transfer_type"] = transfer_detection.transfer_type
-                transaction["paired_transaction_id"] = transfer_detection.paired_transaction_id
-                transaction["transfer_confidence"] = transfer_detection.confidence
-                transaction["transfer_explanation"] = transfer_detection.explanation
-                
-            except Exception as e:
-                logger.error(f"Error detecting transfers for transaction {transaction.get('id')}: {e}")
+        try:
+            detections = await self.detect_transfers_batch(transactions, household_id)
+        except Exception as e:
+            logger.error(f"Error detecting transfers for batch of {len(transactions)} transactions: {e}")
+            for transaction in transactions:
                 # Keep original transfer status if detection fails
                 transaction["is_transfer"] = False
                 transaction["transfer_type"] = None
                 transaction["paired_transaction_id"] = None
                 transaction["transfer_confidence"] = 0.0
                 transaction["transfer_explanation"] = f"Transfer detection error: {str(e)}"
-            
-            processed_transactions.append(transaction)
+            return transactions
+        
+        for transaction, transfer_detection in zip(transactions, detections):
+            # Update transaction with transfer information
+            transaction["is_transfer"] = transfer_detection.is_transfer
+            transaction["transfer_type"] = transfer_detection.transfer_type
+            transaction["paired_transaction_id"] = transfer_detection.paired_transaction_id
+            transaction["transfer_confidence"] = transfer_detection.confidence
+            transaction["transfer_explanation"] = transfer_detection.explanation
         
-        return processed_transactions
+        return transactions
+    
+    def transfer_updates(self, detections: List[TransferDetection]) -> List[tuple]:
+        """UPDATE records for detections plus the other leg of each intra-household pair"""
+        records = {
+            detection.transaction_id: (
+                detection.is_transfer, detection.transfer_type, detection.paired_transaction_id,
+                detection.confidence, detection.transaction_id
+            )
+            for detection in detections
+        }
+        for detection in detections:
+            if detection.transfer_type == "intra_household" and detection.paired_transaction_id not in records:
+                records[detection.paired_transaction_id] = (
+                    True, "intra_household", detection.transaction_id,
+                    detection.confidence, detection.paired_transaction_id
+                )
+        return list(records.values())
+    
+    async def write_transfer_updates(self, records: List[tuple]):
+        """Apply transfer UPDATE records in a single transaction"""
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany("""
+                    UPDATE transactions 
+                    SET is_transfer = $1,
+                        transfer_type = $2,
+                        paired_transaction_id = $3,
+                        transfer_confidence = $4,
+                        updated_at = NOW()
+                    WHERE id = $5
+                """, records)
+    
+    async def claim_transfer_pair(self, records: List[tuple]) -> bool:
+        """Write both legs of a streamed pair unless either is already a transfer
+
+        A leg the batch sweep paired or flagged in the meantime is never
+        overwritten: each UPDATE must hit its row, otherwise the whole
+        pair is rolled back and False is returned.
+        """
+        async with self.db_pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    for record in records:
+                        updated = await conn.fetchval("""
+                            UPDATE transactions 
+                            SET is_transfer = $1,
+                                transfer_type = $2,
+                                paired_transaction_id = $3,
+                                transfer_confidence = $4,
+                                updated_at = NOW()
+                            WHERE id = $5
+                            AND is_transfer IS NOT TRUE
+                            RETURNING id
+                        """, *record)
+                        if updated is None:
+                            raise TransferLegClaimed(record[4])
+            except TransferLegClaimed as e:
+                logger.info(f"Transfer leg {e} was already claimed; leaving the pair to the batch sweep")
+                return False
+        return True
     
     async def mark_transfers_in_database(self, transfers: List[TransferDetection]) -> bool:
-        """Mark transactions as transfers in the database"""
+        """Mark transactions as transfers in the database, both legs of a pair at once"""
         if not self.db_pool or not transfers:
             return True
         
         try:
-            # Update transactions with transfer information
-            for transfer in transfers:
-                if transfer.is_transfer:
-                    await self.db_pool.execute("""
-                        UPDATE transactions 
-                        SET is_transfer = true, 
-                            transfer_type = $1,
-                            paired_transaction_id = $2,
-                            updated_at = NOW()
-                        WHERE id = $3
-                    """, transfer.transfer_type, transfer.paired_transaction_id, transfer.transaction_id)
-            
+            await self.write_transfer_updates(
+                self.transfer_updates([transfer for transfer in transfers if transfer.is_transfer])
+            )
             logger.info(f"Marked {len(transfers)} transactions as transfers")
             return True
         
@@ -524,11 +585,87 @@ class TransferWorker:
             logger.error(f"Error getting transfer statistics: {e}")
             return {}
     
+    def household_lock(self, household_id: Any) -> asyncio.Lock:
+        """Lock held while the stream or the batch sweep matches a household"""
+        key = str(household_id)
+        lock = self.household_locks.get(key)
+        if lock is None:
+            lock = self.household_locks[key] = asyncio.Lock()
+        return lock
+    
+    async def match_arriving_leg(self, transaction: Dict, household_id: int) -> Optional[TransferDetection]:
+        """Pair a newly upserted transaction with a waiting leg and write both legs
+        
+        Unpaired legs wait in the streaming pool; duplicates and anything the
+        stream misses are still picked up by the batch sweep, including a
+        pair whose other leg the sweep marked first. Runs under the
+        household lock, so it never lands between a sweep's snapshot and
+        its write.
+        """
+        async with self.household_lock(household_id):
+            return await self._match_arriving_leg(transaction, household_id)
+    
+    async def _match_arriving_leg(self, transaction: Dict, household_id: int) -> Optional[TransferDetection]:
+        match = await self.transfer_stream.offer(household_id, transaction)
+        if match is None:
+            return None
+        
+        partner, score = match
+        detection = TransferDetection(
+            transaction_id=transaction["id"],
+            is_transfer=True,
+            transfer_type="intra_household",
+            paired_transaction_id=partner.id,
+            confidence=score,
+            explanation=f"Intra-household transfer to account {partner.account_id} (confidence: {score:.2f})"
+        )
+        counterpart = TransferDetection(
+            transaction_id=partner.id,
+            is_transfer=True,
+            transfer_type="intra_household",
+            paired_transaction_id=transaction["id"],
+            confidence=score,
+            explanation=f"Intra-household transfer to account {transaction.get('account_id')} (confidence: {score:.2f})"
+        )
+        if self.db_pool and not await self.claim_transfer_pair(self.transfer_updates([detection])):
+            return None
+        await self.cache_detections([detection, counterpart])
+        return detection
+    
+    async def handle_upsert_message(self, msg):
+        """Match the transaction named by a tx.upsert event as soon as it lands"""
+        try:
+            data = json.loads(msg.data.decode())
+            row = await self.db_pool.fetchrow("""
+                SELECT id, amount, date, merchant_name, description, account_id, household_id, is_transfer
+                FROM transactions
+                WHERE id = $1
+            """, data["transaction_id"])
+            if row is None or row["is_transfer"]:
+                return
+            
+            transaction = dict(row)
+            detection = await self.match_arriving_leg(transaction, transaction["household_id"])
+            if detection:
+                logger.info(f"Paired transfer {detection.transaction_id} with {detection.paired_transaction_id} on arrival")
+        
+        except Exception as e:
+            # Rows left unmatched are retried by the batch sweep
+            logger.error(f"Error handling tx.upsert event: {e}")
+    
     async def run_batch_processing(self, household_id: int):
-        """Run batch processing for transfer detection"""
+        """Run batch processing for transfer detection
+        
+        Holds the household lock from the snapshot to the write, so a pair
+        the stream commits meanwhile cannot be overwritten by a stale match.
+        """
         if not self.db_pool:
             return
         
+        async with self.household_lock(household_id):
+            await self._run_batch_processing(household_id)
+    
+    async def _run_batch_processing(self, household_id: int):
         try:
             # Get unprocessed transactions
             rows = await self.db_pool.fetch("""
@@ -543,25 +680,17 @@ class TransferWorker:
             if not rows:
                 return
             
-            # Process transfers
+            # Detect transfers; on failure the rows stay unprocessed for the next run
             transactions = [dict(row) for row in rows]
-            processed_transactions = await self.process_transaction_transfers(transactions, household_id)
+            detections = await self.detect_transfers_batch(transactions, household_id)
             
-            # Update database
-            for transaction in processed_transactions:
-                await self.db_pool.execute("""
-                    UPDATE transactions 
-                    SET is_transfer = $1,
-                        transfer_type = $2,
-                        paired_transaction_id = $3,
-                        transfer_confidence = $4,
-                        updated_at = NOW()
-                    WHERE id = $5
-                """, transaction["is_transfer"], transaction["transfer_type"], 
-                     transaction["paired_transaction_id"], transaction["transfer_confidence"], 
-                     transaction["id"])
+            # Both legs of every pair are written together or not at all
+            records = self.transfer_updates(detections)
+            await self.write_transfer_updates(records)
+            # Legs settled here must not be claimed again by the stream
+            await self.transfer_stream.discard(household_id, [record[4] for record in records if record[0]])
             
-            logger.info(f"Processed {len(processed_transactions)} transactions for transfer detection")
+            logger.info(f"Processed {len(detections)} transactions for transfer detection")
         
         except Exception as e:
             logger.error(f"Error in batch processing: {e}")